@@ -0,0 +1,38 @@
+-- Change counter of the analytics matrix (repo-analyzer/analytics.py),
+-- bumped by statement triggers on primitive_analysis and repos.category.
+--
+-- The same statements ship as the Prisma migration
+-- server/prisma/migrations/20251208000000_analytics_version; keep the two
+-- identical. Use this file on databases that are not baselined (see
+-- README.md); `prisma db push` creates the table but not the triggers.
+-- Safe to re-run.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS "analytics_version" (
+    "id" INTEGER NOT NULL,
+    "version" BIGINT NOT NULL DEFAULT 0,
+
+    CONSTRAINT "analytics_version_pkey" PRIMARY KEY ("id")
+);
+
+INSERT INTO "analytics_version" ("id", "version") VALUES (1, 0) ON CONFLICT ("id") DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_analytics_version() RETURNS trigger AS $$
+BEGIN
+  UPDATE "analytics_version" SET "version" = "version" + 1 WHERE "id" = 1;
+  RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+-- Once per statement, so a bulk write bumps it once
+DROP TRIGGER IF EXISTS "primitive_analysis_analytics_version" ON "primitive_analysis";
+CREATE TRIGGER "primitive_analysis_analytics_version"
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "primitive_analysis"
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_analytics_version();
+
+DROP TRIGGER IF EXISTS "repos_analytics_version" ON "repos";
+CREATE TRIGGER "repos_analytics_version"
+  AFTER UPDATE OF "category" OR DELETE OR TRUNCATE ON "repos"
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_analytics_version();
+
+COMMIT;
@@ -0,0 +1,127 @@
+"""
+Streaming archive reader
+
+Yields the regular files of a tar archive (plain, gzip, bz2 or xz, e.g. the
+output of `git archive` or a GitHub tarball) or a zip archive straight from
+a file object, without extracting anything to disk. Tar archives are read
+strictly sequentially, so non-seekable sources such as stdin or an HTTP
+upload stream work. Zip keeps its directory at the end of the file, so a
+non-seekable zip stream is buffered in memory first.
+
+Members are filtered by path and size before their content is read;
+rejected members are never buffered. Input that is not a readable tar or
+zip archive (a plain file, a truncated or corrupt upload) raises
+ArchiveError.
+"""
+
+from __future__ import annotations
+
+import io
+import lzma
+import tarfile
+import zipfile
+import zlib
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple
+
+# (path, size, content); content is None for members over the size limit
+Member = Tuple[str, int, Optional[bytes]]
+
+ZIP_MAGIC = b'PK\x03\x04'
+EMPTY_ZIP_MAGIC = b'PK\x05\x06'
+
+# What tarfile, zipfile and the decompressors raise on malformed input
+# (gzip.BadGzipFile and bz2's "Invalid data stream" are OSErrors)
+FORMAT_ERRORS = (tarfile.TarError, zipfile.BadZipFile, EOFError, zlib.error, lzma.LZMAError, OSError)
+
+
+class ArchiveError(ValueError):
+    """Raised for input that is not a readable tar or zip archive."""
+
+
+class PrefixedStream(io.RawIOBase):
+    """A read-only stream that replays `prefix` before the rest of `stream`."""
+
+    def __init__(self, prefix: bytes, stream: BinaryIO):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._prefix:
+            n = min(len(b), len(self._prefix))
+            b[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def member_path(name: str) -> str:
+    """Normalizes an archive member name to a '/'-separated relative path."""
+    name = name.replace('\\', '/')
+    while name.startswith('./'):
+        name = name[2:]
+    return name.lstrip('/')
+
+
+def is_safe_path(path: str) -> bool:
+    return bool(path) and '..' not in path.split('/')
+
+
+def iter_tar(stream: BinaryIO, want: Callable[[str], bool],
+             max_bytes: Optional[int] = None) -> Iterator[Member]:
+    with tarfile.open(fileobj=stream, mode='r|*') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            path = member_path(member.name)
+            if not is_safe_path(path) or not want(path):
+                continue
+            if max_bytes and member.size > max_bytes:
+                yield path, member.size, None
+                continue
+            f = tar.extractfile(member)
+            if f is not None:
+                yield path, member.size, f.read()
+
+
+def iter_zip(stream: BinaryIO, want: Callable[[str], bool],
+             max_bytes: Optional[int] = None) -> Iterator[Member]:
+    with zipfile.ZipFile(stream) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            path = member_path(info.filename)
+            if not is_safe_path(path) or not want(path):
+                continue
+            if max_bytes and info.file_size > max_bytes:
+                yield path, info.file_size, None
+                continue
+            yield path, info.file_size, zf.read(info)
+
+
+def iter_archive(stream: BinaryIO, want: Callable[[str], bool],
+                 max_bytes: Optional[int] = None) -> Iterator[Member]:
+    """
+    Yields (relative path, size, content) for every regular file in the
+    archive whose path passes `want`, in archive order. Content is None,
+    and never read, for members larger than `max_bytes`. The format is
+    detected from the leading bytes; malformed input raises ArchiveError,
+    possibly after the members before the damage were yielded.
+    """
+    try:
+        head = stream.read(4)
+        if head in (ZIP_MAGIC, EMPTY_ZIP_MAGIC):
+            seekable = getattr(stream, 'seekable', lambda: False)()
+            if seekable:
+                stream.seek(0)
+                yield from iter_zip(stream, want, max_bytes)
+            else:
+                yield from iter_zip(io.BytesIO(head + stream.read()), want, max_bytes)
+            return
+        yield from iter_tar(io.BufferedReader(PrefixedStream(head, stream)), want, max_bytes)
+    except FORMAT_ERRORS as e:
+        raise ArchiveError(f"not a readable tar or zip archive: {e}") from e
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Corpus batch analyzer
+
+Clones and analyzes many repositories with bounded concurrency and streams
+one JSON line per repository to the output as soon as it finishes:
+
+  {"source": ..., "results": {...parse_repo output...}, "timings": {...}, "seconds": 1.23}
+  {"source": ..., "error": "git clone failed: ..."}
+
+Successfully analyzed sources are appended to a checkpoint file, and a
+re-run with the same checkpoint skips them. An interrupted or crashed run
+therefore resumes where it stopped. A repo whose output line was written
+just before a crash may be analyzed (and emitted) again. Failed sources
+are not checkpointed and are retried on the next run.
+
+Input is a text file with one git URL, local directory or local tar/zip
+archive per line, or a CSV with a `repo_slug` column (e.g.
+server/seed/final_categories.csv), whose slugs are expanded to GitHub URLs.
+Use `-` to read from stdin.
+
+Usage:
+  python batch.py --input <file|-> [--output results.jsonl]
+                  [--checkpoint results.jsonl.done] [--concurrency N]
+                  [--workers N] [--features <path>] [--clone-base <dir>]
+                  [--file-cache <db> | --no-file-cache]
+                  [--clone-timeout S] [--scan-timeout S]
+                  [--token-index-dir <dir>]
+
+With --token-index-dir every analyzed repo also leaves a token index
+(see token_index.py) in that directory, and recount.py can later
+recompute all results under a changed feature YAML without re-cloning.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Dict, Iterable, List, Optional, Set, TextIO
+
+import main as analyzer
+import repo_fetch
+from file_cache import default_cache_path
+from token_index import index_filename
+from workers import AnalyzerPool, default_worker_count
+
+GITHUB_BASE = "https://github.com"
+
+
+# ----------------------------
+# Inputs and checkpoint
+# ----------------------------
+
+def read_sources(lines: Iterable[str]) -> List[str]:
+    """Parses a list file or a repo_slug CSV into de-duplicated sources."""
+    lines = list(lines)
+    if lines and lines[0].strip().split(',')[0] == 'repo_slug':
+        rows = csv.DictReader(lines)
+        raw = [f"{GITHUB_BASE}/{row['repo_slug'].strip()}" for row in rows if row.get('repo_slug')]
+    else:
+        raw = [ln.strip() for ln in lines]
+        raw = [ln for ln in raw if ln and not ln.startswith('#')]
+
+    seen: Set[str] = set()
+    out: List[str] = []
+    for src in raw:
+        if src not in seen:
+            seen.add(src)
+            out.append(src)
+    return out
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {ln.rstrip('\n') for ln in f if ln.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def append_line(f: TextIO, line: str) -> None:
+    f.write(line + '\n')
+    f.flush()
+    os.fsync(f.fileno())
+
+
+# ----------------------------
+# Per-repo work
+# ----------------------------
+
+def analyze_source(source: str, pool: AnalyzerPool, clone_base: str,
+                   clone_timeout: Optional[float] = None, scan_timeout: Optional[float] = None,
+                   token_index_dir: Optional[str] = None) -> Dict:
+    start = time.perf_counter()
+    record: Dict = {'source': source}
+    repo_path = None
+    cloned = False
+    try:
+        if os.path.exists(source):
+            # local directory or tar/zip archive
+            repo_path = os.path.abspath(source)
+        else:
+            repo_path, _ = repo_fetch.clone_repo(source, clone_base, timeout=clone_timeout)
+            cloned = True
+        index_path = os.path.join(token_index_dir, index_filename(source)) if token_index_dir else None
+        record['results'] = pool.analyze(repo_path, timeout=scan_timeout,
+                                         token_index_path=index_path, source=source)
+        record['timings'] = record['results'].pop('timings', None)
+    except FutureTimeout:
+        record['error'] = f"scan phase exceeded its {scan_timeout:g}s deadline"
+    except Exception as e:
+        record['error'] = str(e)
+    finally:
+        if cloned and repo_path:
+            shutil.rmtree(repo_path, ignore_errors=True)
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_batch(sources: List[str], out: TextIO, checkpoint: TextIO, pool: AnalyzerPool,
+              clone_base: str, concurrency: int, clone_timeout: Optional[float] = None,
+              scan_timeout: Optional[float] = None,
+              token_index_dir: Optional[str] = None) -> Dict[str, int]:
+    """
+    Analyzes `sources` with at most `concurrency` repos in flight (cloning
+    or scanning) and writes each record as it completes.
+    """
+    stats = {'ok': 0, 'failed': 0}
+    pending_iter = iter(sources)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = set()
+
+        def refill() -> None:
+            while len(in_flight) < concurrency:
+                src = next(pending_iter, None)
+                if src is None:
+                    return
+                in_flight.add(executor.submit(analyze_source, src, pool, clone_base,
+                                              clone_timeout, scan_timeout, token_index_dir))
+
+        try:
+            refill()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    in_flight.discard(fut)
+                    record = fut.result()
+                    append_line(out, json.dumps(record))
+                    if 'error' in record:
+                        stats['failed'] += 1
+                    else:
+                        append_line(checkpoint, record['source'])
+                        stats['ok'] += 1
+                    print(f"[{stats['ok'] + stats['failed']}/{len(sources)}] "
+                          f"{'FAIL' if 'error' in record else 'ok  '} {record['source']}",
+                          file=sys.stderr)
+                refill()
+        except KeyboardInterrupt:
+            for fut in in_flight:
+                fut.cancel()
+            raise
+
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Analyze many eBPF repositories.")
+    ap.add_argument('--input', required=True, help="list of URLs/paths, repo_slug CSV, or - for stdin")
+    ap.add_argument('--output', default='results.jsonl')
+    ap.add_argument('--checkpoint', default=None, help="defaults to <output>.done")
+    ap.add_argument('--concurrency', type=int, default=4, help="repos cloned/analyzed at once")
+    ap.add_argument('--workers', type=int, default=0, help="analyzer processes (default: min(4, CPUs))")
+    ap.add_argument('--features', default=None)
+    ap.add_argument('--clone-base', default=os.environ.get("CLONE_BASE", "/tmp/repos"))
+    ap.add_argument('--file-cache', default=None, help="per-file result cache database")
+    ap.add_argument('--no-file-cache', action='store_true')
+    ap.add_argument('--clone-timeout', type=float, default=0, help="seconds per clone (0 = none)")
+    ap.add_argument('--scan-timeout', type=float, default=0, help="seconds per scan (0 = none)")
+    ap.add_argument('--token-index-dir', default=None,
+                    help="write each repo's token index here, for recount.py")
+    args = ap.parse_args(argv)
+
+    if args.input == '-':
+        sources = read_sources(sys.stdin)
+    else:
+        with open(args.input, 'r', encoding='utf-8', newline='') as f:
+            sources = read_sources(f)
+
+    features_path = args.features or analyzer.default_features_path(__file__)
+    if not os.path.isfile(features_path):
+        print(f"feature-versions.yaml not found at {features_path}", file=sys.stderr)
+        return 2
+
+    checkpoint_path = args.checkpoint or f"{args.output}.done"
+    done = load_checkpoint(checkpoint_path)
+    todo = [s for s in sources if s not in done]
+    print(f"{len(sources)} sources, {len(sources) - len(todo)} already done, {len(todo)} to analyze",
+          file=sys.stderr)
+    if not todo:
+        return 0
+
+    if args.token_index_dir:
+        os.makedirs(args.token_index_dir, exist_ok=True)
+    file_cache = None if args.no_file_cache else (args.file_cache or default_cache_path())
+    pool = AnalyzerPool(features_path, workers=args.workers or default_worker_count(),
+                        file_cache=file_cache)
+    try:
+        with open(args.output, 'a', encoding='utf-8') as out, \
+                open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+            stats = run_batch(todo, out, checkpoint, pool, args.clone_base, max(1, args.concurrency),
+                              args.clone_timeout or None, args.scan_timeout or None,
+                              args.token_index_dir)
+    except KeyboardInterrupt:
+        print("interrupted; re-run with the same --checkpoint to resume", file=sys.stderr)
+        return 130
+    finally:
+        pool.shutdown()
+
+    print(f"done: {stats['ok']} ok, {stats['failed']} failed", file=sys.stderr)
+    return 0 if stats['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
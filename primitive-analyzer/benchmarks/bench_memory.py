@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Peak memory benchmark
+
+Runs the analyzer CLI and the previous whole-file reader (read_text plus
+scan_text on the full string) in separate child processes over the same
+tree and reports each one's peak RSS from wait4() in a fresh launcher
+process (see LAUNCHER_SCRIPT). Large generated headers are where the two
+differ most. With --max-rss-mb the run fails when the CLI peak exceeds the
+given budget.
+
+Usage:
+  python benchmarks/bench_memory.py --repo <path> [--features <path>] [--max-rss-mb N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+sys.path.insert(0, APP_DIR)
+
+import main as analyzer  # noqa: E402
+
+# Whole-file reading as parse_repo did it before the chunked reader.
+LEGACY_SCRIPT = """
+import sys
+sys.path.insert(0, {app_dir!r})
+import main as analyzer
+gt = analyzer.load_feature_sets({features!r})
+totals = analyzer.new_totals()
+for path in analyzer.iter_files({repo!r}):
+    text = analyzer.read_text(path)
+    if text:
+        analyzer.merge_file_counts(totals, analyzer.scan_text(text, gt))
+"""
+
+
+# Runs the measured command and prints "<exit code> <wall seconds> <ru_maxrss>".
+# Linux carries ru_maxrss over fork and exec: a child of this process starts
+# at the harness's own peak (its generated trees and imports). This small
+# launcher is the parent instead.
+LAUNCHER_SCRIPT = """
+import os, subprocess, sys, time
+start = time.perf_counter()
+proc = subprocess.Popen(sys.argv[1:], stdout=subprocess.DEVNULL)
+_, status, usage = os.wait4(proc.pid, 0)
+print(os.waitstatus_to_exitcode(status), time.perf_counter() - start, usage.ru_maxrss)
+"""
+
+
+def run_measured(cmd: List[str]) -> Tuple[float, float]:
+    """Runs `cmd` and returns (wall seconds, its own peak RSS in MB)."""
+    out = subprocess.run([sys.executable, '-c', LAUNCHER_SCRIPT, *cmd], cwd=APP_DIR,
+                         stdout=subprocess.PIPE, text=True, check=True).stdout.split()
+    returncode, seconds, maxrss = int(out[0]), float(out[1]), int(out[2])
+    if returncode != 0:
+        raise RuntimeError(f"{cmd[1]} exited with {returncode}")
+    # ru_maxrss is in kilobytes on Linux
+    return seconds, maxrss / 1024
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark analyzer peak memory.")
+    ap.add_argument('--repo', required=True)
+    ap.add_argument('--features', default=None)
+    ap.add_argument('--max-rss-mb', type=float, default=0, help="fail if the CLI peak RSS exceeds this")
+    args = ap.parse_args(argv)
+
+    repo_root = os.path.abspath(args.repo)
+    features_path = args.features or analyzer.default_features_path(HERE)
+
+    files = list(analyzer.iter_files(repo_root))
+    sizes = [analyzer.file_size(p) for p in files]
+    print(f"Tree: {repo_root} ({len(files)} files, {sum(sizes) / 1e6:.1f} MB, "
+          f"largest {max(sizes, default=0) / 1e6:.1f} MB)")
+
+    cli = [sys.executable, os.path.join(APP_DIR, 'main.py'), '--repo', repo_root,
+           '--features', features_path, '--json', '--no-file-cache', '--max-file-mb', '0']
+    legacy = [sys.executable, '-c', LEGACY_SCRIPT.format(
+        app_dir=APP_DIR, features=features_path, repo=repo_root)]
+
+    legacy_s, legacy_rss = run_measured(legacy)
+    cli_s, cli_rss = run_measured(cli)
+    print(f"  whole-file reader   : {legacy_rss:8.1f} MB peak RSS  ({legacy_s:.2f} s)")
+    print(f"  chunked reader (CLI): {cli_rss:8.1f} MB peak RSS  ({cli_s:.2f} s)")
+
+    if args.max_rss_mb and cli_rss > args.max_rss_mb:
+        print(f"FAIL: peak RSS {cli_rss:.1f} MB exceeds budget {args.max_rss_mb:.1f} MB")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
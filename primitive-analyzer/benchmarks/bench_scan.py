@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Scan engine benchmark
+
+Times parse_repo against the previous multi-regex implementation on the
+same tree and checks that both produce byte-identical JSON. With --jobs the
+parallel scan is timed and checked against the serial one as well.
+
+Usage:
+  python benchmarks/bench_scan.py --repo <path> [--features <path>] [--repeat N] [--jobs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import main as analyzer  # noqa: E402
+from feature_index import CALL_KINDS  # noqa: E402
+
+
+def legacy_infer_program_type(sec: str, program_types: Dict[str, Set[str]]) -> Optional[str]:
+    first, first_two = analyzer.sec_prefix_candidates(sec)
+    candidates = {first}
+    if first_two:
+        candidates.add(first_two)
+    for kernel_type, literal_set in program_types.items():
+        if any(c in literal_set for c in candidates):
+            return kernel_type
+    return None
+
+
+def legacy_parse_repo(repo_root: str, features_path: str) -> Dict[str, Dict[str, int]]:
+    """The regex-sweep parse_repo this benchmark compares against."""
+    gt = analyzer.load_feature_sets(features_path)
+    helpers_set = gt['helpers']
+    program_types_dict = gt['program_types']
+
+    helper_counts: Counter[str] = Counter()
+    map_type_counts: Counter[str] = Counter()
+    attach_type_counts: Counter[str] = Counter()
+    program_type_counts: Counter[str] = Counter()
+    sec_full_counts: Counter[str] = Counter()
+    prog_type_token_counts: Counter[str] = Counter()
+
+    helpers_alt = '|'.join(sorted(re.escape(h) for h in helpers_set))
+    re_helper_exact = re.compile(rf'\b({helpers_alt})\s*\(')
+    re_map_token = re.compile(rf"\b({'|'.join(sorted(re.escape(m) for m in gt['map_types']))})\b")
+    re_attach_token = re.compile(rf"\b({'|'.join(sorted(re.escape(a) for a in gt['attach_types']))})\b")
+    re_prog_token = re.compile(rf"\b({'|'.join(sorted(re.escape(p) for p in program_types_dict))})\b")
+    # One more sweep per additional section: calls for kfuncs, tokens otherwise
+    extra_res = {}
+    for kind in analyzer.EXTRA_TOKEN_KINDS:
+        alt = '|'.join(sorted(re.escape(name) for name in gt[kind]))
+        extra_res[kind] = re.compile(rf'\b({alt})\s*\(' if kind in CALL_KINDS else rf'\b({alt})\b')
+    extra_counts: Dict[str, Counter[str]] = {kind: Counter() for kind in analyzer.EXTRA_TOKEN_KINDS}
+
+    for path in analyzer.iter_files(repo_root):
+        text = analyzer.read_text(path)
+        if not text:
+            continue
+
+        for sec_match in list(analyzer.RE_SEC.finditer(text)) + list(analyzer.RE_SECTION_ATTR.finditer(text)):
+            sec = sec_match.group(1)
+            sec_full_counts[sec] += 1
+            kernel_type = legacy_infer_program_type(sec, program_types_dict)
+            if kernel_type:
+                program_type_counts[kernel_type] += 1
+            attach_type_counts[analyzer.extract_attach_from_sec(sec)] += 1
+
+        for m in re_helper_exact.finditer(text):
+            helper_counts[m.group(1)] += 1
+        for m in re_map_token.finditer(text):
+            map_type_counts[m.group(1)] += 1
+        for m in re_attach_token.finditer(text):
+            attach_type_counts[m.group(1)] += 1
+        for m in re_prog_token.finditer(text):
+            prog_type_token_counts[m.group(1)] += 1
+        for kind, pattern in extra_res.items():
+            for m in pattern.finditer(text):
+                extra_counts[kind][m.group(1)] += 1
+
+    return {
+        'map_types': dict(map_type_counts),
+        'attach_types': dict(attach_type_counts),
+        'helpers': dict(helper_counts),
+        'program_sections': {
+            'sec_full': dict(sec_full_counts),
+        },
+        'program_types_inferred': dict(program_type_counts),
+        'program_types_tokens': dict(prog_type_token_counts),
+        **{kind: dict(extra_counts[kind]) for kind in analyzer.EXTRA_TOKEN_KINDS},
+    }
+
+
+def time_call(fn, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the parse_repo scan engine.")
+    ap.add_argument('--repo', required=True)
+    ap.add_argument('--features', default=None)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--jobs', type=int, default=1)
+    args = ap.parse_args(argv)
+
+    repo_root = os.path.abspath(args.repo)
+    features_path = args.features or analyzer.default_features_path(HERE)
+
+    files = list(analyzer.iter_files(repo_root))
+    total_bytes = sum(os.path.getsize(p) for p in files)
+    print(f"Tree: {repo_root} ({len(files)} files, {total_bytes / 1e6:.1f} MB)")
+
+    legacy_s, legacy = time_call(lambda: legacy_parse_repo(repo_root, features_path), args.repeat)
+    current_s, current = time_call(lambda: analyzer.parse_repo(repo_root, features_path), args.repeat)
+
+    identical = json.dumps(legacy, indent=2) == json.dumps(current, indent=2)
+    print(f"  legacy regex sweeps : {legacy_s:8.3f} s  ({total_bytes / 1e6 / legacy_s:7.1f} MB/s)")
+    print(f"  single-pass scanner : {current_s:8.3f} s  ({total_bytes / 1e6 / current_s:7.1f} MB/s)")
+    print(f"  speedup             : {legacy_s / current_s:8.2f}x")
+    print(f"  identical output    : {identical}")
+
+    if args.jobs != 1:
+        jobs = analyzer.resolve_jobs(args.jobs)
+        parallel_s, parallel = time_call(
+            lambda: analyzer.parse_repo(repo_root, features_path, jobs=jobs), args.repeat)
+        same = json.dumps(parallel, indent=2) == json.dumps(current, indent=2)
+        print(f"  parallel (jobs={jobs:<3}) : {parallel_s:8.3f} s  ({total_bytes / 1e6 / parallel_s:7.1f} MB/s)")
+        print(f"  vs serial           : {current_s / parallel_s:8.2f}x")
+        print(f"  identical to serial : {same}")
+        identical = identical and same
+
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
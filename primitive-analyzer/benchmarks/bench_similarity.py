@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Similar-repository search benchmark
+
+Builds a SimilarityIndex over a synthetic corpus and measures:
+
+  build      add_many() over the whole corpus (signatures + sorted bands)
+  query      top-k of a random indexed repo through LSH + exact rescoring
+  exact      the same query by scoring every repo (the linear baseline)
+  update     re-analysis of single repos through update()
+
+Recall@k is the share of the exact top k (by score, so ties count as
+found) that the LSH query returned, averaged over the exact queries.
+
+The corpus mimics real feature sets: repos are drawn from --families
+templates of 5-40 helpers and a few map, attach and program types from
+the feature YAML (popular helpers more likely), each repo dropping 15% of
+its template's features and adding up to 4 random ones.
+
+Usage:
+  python benchmarks/bench_similarity.py [--repos 100000] [--families 5000] [--queries 500]
+                                        [--exact-queries 50] [--updates 2000] [-k 10]
+                                        [--num-perm 128] [--bands 32]
+                                        [--features <path>] [--seed 1] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import main as analyzer  # noqa: E402
+from similarity import BANDS, FEATURE_SECTIONS, NUM_PERM, SimilarityIndex, feature_set  # noqa: E402
+
+# Features per template: (section, min, max)
+TEMPLATE_SIZES = (('helpers', 5, 40), ('map_types', 1, 6), ('attach_types', 1, 4),
+                  ('program_types_inferred', 1, 3))
+
+
+def feature_names(features_path: str) -> Dict[str, List[str]]:
+    gt = analyzer.load_feature_sets(features_path)
+    return {
+        'helpers': sorted(gt['helpers']),
+        'map_types': sorted(gt['map_types']),
+        'attach_types': sorted(gt['attach_types']),
+        'program_types_inferred': sorted(gt['program_types']),
+    }
+
+
+def pick(rng: random.Random, names: List[str], n: int) -> List[str]:
+    # Zipf-like popularity: low ranks (after a fixed shuffle) are picked far more often
+    out = set()
+    while len(out) < min(n, len(names)):
+        out.add(names[min(int(rng.paretovariate(1.2)) - 1, len(names) - 1)])
+    return list(out)
+
+
+def synth_corpus(names: Dict[str, List[str]], repos: int, families: int, seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    for section in names:
+        rng.shuffle(names[section])
+    templates = [
+        {section: pick(rng, names[section], rng.randint(lo, hi)) for section, lo, hi in TEMPLATE_SIZES}
+        for _ in range(families)
+    ]
+    sections = [s for s, _ in FEATURE_SECTIONS]
+    corpus = []
+    for _ in range(repos):
+        results = mutate(rng, templates[rng.randrange(families)], names, sections)
+        corpus.append(results)
+    return corpus
+
+
+def mutate(rng: random.Random, template: Dict[str, List[str]], names: Dict[str, List[str]],
+           sections: List[str]) -> Dict:
+    results = {s: {name: 1 for name in template[s] if rng.random() >= 0.15} for s in sections}
+    for _ in range(rng.randint(0, 4)):
+        section = rng.choice(sections)
+        results[section][rng.choice(names[section])] = 1
+    return results
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def recall(lsh: List[Dict], exact: List[Dict]) -> float:
+    if not exact:
+        return 1.0
+    # LSH results carry exact scores: any at or above the k-th exact score
+    # belongs to a valid top k (repos tied with it are interchangeable)
+    kth = exact[-1]['jaccard']
+    return min(len(exact), sum(1 for r in lsh if r['jaccard'] >= kth)) / len(exact)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark MinHash/LSH similar-repo search.")
+    ap.add_argument('--repos', type=int, default=100000)
+    ap.add_argument('--families', type=int, default=5000)
+    ap.add_argument('--queries', type=int, default=500)
+    ap.add_argument('--exact-queries', type=int, default=50)
+    ap.add_argument('--updates', type=int, default=2000)
+    ap.add_argument('-k', type=int, default=10)
+    ap.add_argument('--num-perm', type=int, default=NUM_PERM)
+    ap.add_argument('--bands', type=int, default=BANDS)
+    ap.add_argument('--features', default=os.path.join(os.path.dirname(HERE), 'data', 'feature-versions.yaml'))
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = ap.parse_args(argv)
+
+    names = feature_names(args.features)
+    t = time.perf_counter()
+    corpus = synth_corpus(names, args.repos, args.families, args.seed)
+    synth_s = time.perf_counter() - t
+    sources = [f"https://github.com/bench/repo-{i}" for i in range(args.repos)]
+    avg_features = sum(len(feature_set(r)) for r in corpus[:1000]) / min(1000, len(corpus))
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    index = SimilarityIndex(args.num_perm, args.bands)
+    t = time.perf_counter()
+    index.add_many(zip(sources, corpus))
+    build_s = time.perf_counter() - t
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    rng = random.Random(args.seed + 1)
+    picks = [rng.randrange(args.repos) for _ in range(args.queries)]
+    query_ms, candidates = [], []
+    for i in picks:
+        t = time.perf_counter()
+        out = index.similar_to(sources[i], args.k)
+        query_ms.append((time.perf_counter() - t) * 1000)
+        candidates.append(out['candidates'])
+
+    exact_ms, recalls = [], []
+    for i in picks[:args.exact_queries]:
+        t = time.perf_counter()
+        exact = index.exact_query(corpus[i], args.k + 1)
+        exact_ms.append((time.perf_counter() - t) * 1000)
+        # exact_query() does not know the query is indexed: drop the repo itself
+        exact = [r for r in exact['results'] if r['repo'] != sources[i]][:args.k]
+        recalls.append(recall(index.similar_to(sources[i], args.k)['results'], exact))
+
+    update_ms = []
+    for _ in range(args.updates):
+        i = rng.randrange(args.repos)
+        corpus[i] = mutate(rng, {s: list(corpus[i][s]) for s, _ in FEATURE_SECTIONS}, names,
+                           [s for s, _ in FEATURE_SECTIONS])
+        t = time.perf_counter()
+        index.update(sources[i], corpus[i])
+        update_ms.append((time.perf_counter() - t) * 1000)
+    # A re-analyzed repo must be found with its new features
+    i = rng.randrange(args.repos)
+    corpus[i]['helpers']['bench_only_helper'] = 1
+    index.update(sources[i], corpus[i])
+    found = index.query(corpus[i], 1)['results']
+    updated_found = bool(found) and found[0]['repo'] == sources[i] and found[0]['jaccard'] == 1.0
+
+    report = {
+        'repos': args.repos,
+        'families': args.families,
+        'avg_features': round(avg_features, 1),
+        'stats': index.stats(),
+        'synth_s': round(synth_s, 2),
+        'build_s': round(build_s, 2),
+        'build_repos_per_s': round(args.repos / build_s, 1),
+        'build_rss_mb': round((rss_after - rss_before) / 1024, 1),
+        'query_ms': {'p50': round(percentile(query_ms, 0.5), 3), 'p95': round(percentile(query_ms, 0.95), 3)},
+        'query_candidates': {'p50': percentile(candidates, 0.5), 'p95': percentile(candidates, 0.95)},
+        'exact_ms': {'p50': round(percentile(exact_ms, 0.5), 3), 'p95': round(percentile(exact_ms, 0.95), 3)},
+        f'recall_at_{args.k}': round(sum(recalls) / len(recalls), 4) if recalls else None,
+        'update_ms': {'p50': round(percentile(update_ms, 0.5), 3), 'p95': round(percentile(update_ms, 0.95), 3)}
+        if update_ms else None,
+        'updated_repo_found': updated_found,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"{args.repos} repos in {args.families} families, {report['avg_features']} features per repo "
+          f"({report['stats']['features']} distinct)")
+    print(f"  build   {build_s:8.2f} s  ({report['build_repos_per_s']} repos/s, +{report['build_rss_mb']} MB RSS)")
+    print(f"  query   p50 {report['query_ms']['p50']:8.3f} ms  p95 {report['query_ms']['p95']:8.3f} ms  "
+          f"({report['query_candidates']['p50']} candidates p50, {report['query_candidates']['p95']} p95)")
+    print(f"  exact   p50 {report['exact_ms']['p50']:8.3f} ms  p95 {report['exact_ms']['p95']:8.3f} ms")
+    print(f"  recall@{args.k} {report[f'recall_at_{args.k}']}")
+    if update_ms:
+        print(f"  update  p50 {report['update_ms']['p50']:8.3f} ms  p95 {report['update_ms']['p95']:8.3f} ms")
+    print(f"  re-analyzed repo found with its new features: {updated_found}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
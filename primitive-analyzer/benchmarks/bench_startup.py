@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark
+
+Measures how long the analyzer takes to get ready to scan: the in-process
+ground-truth load and the wall time of a full CLI run on the bundled
+32-line fixture, where startup dominates.
+
+Usage:
+  python benchmarks/bench_startup.py [--features <path>] [--runs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+sys.path.insert(0, APP_DIR)
+
+import main as analyzer  # noqa: E402
+
+FIXTURE = os.path.join(APP_DIR, 'test', 'dummy_repo')
+
+
+def cli_run_seconds(features_path: str) -> float:
+    cmd = [sys.executable, os.path.join(APP_DIR, 'main.py'),
+           '--repo', FIXTURE, '--features', features_path, '--json']
+    start = time.perf_counter()
+    subprocess.run(cmd, cwd=APP_DIR, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark analyzer startup.")
+    ap.add_argument('--features', default=None)
+    ap.add_argument('--runs', type=int, default=5)
+    args = ap.parse_args(argv)
+
+    features_path = args.features or analyzer.default_features_path(HERE)
+
+    loads = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        analyzer.load_feature_sets(features_path)
+        loads.append(time.perf_counter() - start)
+
+    runs = [cli_run_seconds(features_path) for _ in range(args.runs)]
+
+    print(f"load_feature_sets : median {statistics.median(loads) * 1000:8.1f} ms  "
+          f"(first {loads[0] * 1000:.1f} ms)")
+    print(f"CLI run (fixture) : median {statistics.median(runs) * 1000:8.1f} ms  "
+          f"(first {runs[0] * 1000:.1f} ms)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite with regression gates
+
+Generates a synthetic repository (see synth_repo.py) and measures
+
+  parse_files_per_s / parse_mb_per_s   in-process parse_repo, median of --repeat
+  archive_request_s                    POST /analyze-archive through the Flask app
+  clone_request_s                      POST /clone-and-analyze of a local bare repo, cold
+  clone_memo_request_s                 the same request again, answered from the memo
+  peak_rss_mb                          peak RSS of a CLI run over the tree
+  startup_s                            median CLI run over the 32-line fixture
+
+The metrics are compared against benchmarks/baseline.json; anything worse
+than the baseline by more than --tolerance is reported as a regression and
+the run exits non-zero. Baselines are only comparable on the same machine
+and synthetic spec, so refresh the stored one with --save-baseline when
+either changes.
+
+Usage:
+  python benchmarks/bench_suite.py [--files N] [--header-kb N] [--repeat N]
+      [--tolerance 0.25] [--baseline PATH] [--save-baseline] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, HERE)
+
+import main as analyzer  # noqa: E402
+from bench_memory import run_measured  # noqa: E402
+from bench_startup import cli_run_seconds  # noqa: E402
+from synth_repo import SynthSpec, generate  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+
+# metric -> True when higher is better
+METRICS = {
+    'parse_files_per_s': True,
+    'parse_mb_per_s': True,
+    'archive_request_s': False,
+    'clone_request_s': False,
+    'clone_memo_request_s': False,
+    'peak_rss_mb': False,
+    'startup_s': False,
+}
+
+
+def median_of(fn, repeat: int) -> float:
+    """Median wall time of `repeat` calls; steadier than the best run for gating."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def tar_gz(root: str) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w:gz') as tar:
+        tar.add(root, arcname='.')
+    return buf.getvalue()
+
+
+def make_bare_repo(src: str, bare: str) -> None:
+    git = ['git', '-c', 'user.name=bench', '-c', 'user.email=bench@localhost']
+    subprocess.run(git + ['init', '-q', src], check=True)
+    subprocess.run(git + ['-C', src, 'add', '-A'], check=True)
+    subprocess.run(git + ['-C', src, 'commit', '-q', '-m', 'synthetic'], check=True)
+    subprocess.run(['git', 'clone', '-q', '--bare', src, bare], check=True)
+
+
+def load_organizer(work: str):
+    """Imports repo-organizer.py configured to run inside `work`."""
+    import importlib.util
+    saved = dict(os.environ)
+    # The app reads its settings at import; restore the environment after so
+    # the CLI runs below don't inherit them.
+    os.environ.update({
+        'ALLOW_FILE_URLS': '1',
+        'CLONE_BASE': os.path.join(work, 'clones'),
+        'EBPF_FILE_CACHE': 'off',
+        'ANALYZER_WORKERS': '1',
+    })
+    try:
+        spec = importlib.util.spec_from_file_location('repo_organizer', os.path.join(APP_DIR, 'repo-organizer.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    return module
+
+
+def measure_requests(repo: str, work: str, repeat: int) -> Dict[str, float]:
+    organizer = load_organizer(work)
+    organizer.analyzer_pool.warm_up()
+    client = organizer.app.test_client()
+    out: Dict[str, float] = {}
+
+    archive = tar_gz(repo)
+
+    def post_archive():
+        resp = client.post('/analyze-archive', data=archive)
+        if resp.status_code != 200:
+            raise RuntimeError(f"/analyze-archive returned {resp.status_code}: {resp.get_data(as_text=True)}")
+    out['archive_request_s'] = median_of(post_archive, repeat)
+
+    bare = os.path.join(work, 'bare.git')
+    make_bare_repo(repo, bare)
+    url = f'file://{bare}'
+
+    def post_clone():
+        resp = client.post('/clone-and-analyze', json={'repo_url': url})
+        if resp.status_code != 200:
+            raise RuntimeError(f"/clone-and-analyze returned {resp.status_code}: {resp.get_data(as_text=True)}")
+    out['clone_request_s'] = median_of(post_clone, 1)
+    out['clone_memo_request_s'] = median_of(post_clone, repeat)
+    organizer.analyzer_pool.shutdown()
+    return out
+
+
+def run_suite(spec: SynthSpec, features_path: str, repeat: int, work: str) -> Dict:
+    repo = os.path.join(work, 'repo')
+    manifest = generate(repo, spec, analyzer.load_feature_sets(features_path))
+    mb = manifest['bytes'] / 1e6
+
+    metrics: Dict[str, float] = {}
+    parse_s = median_of(lambda: analyzer.parse_repo(repo, features_path), repeat)
+    metrics['parse_files_per_s'] = manifest['files'] / parse_s
+    metrics['parse_mb_per_s'] = mb / parse_s
+    metrics.update(measure_requests(repo, work, repeat))
+
+    cli = [sys.executable, os.path.join(APP_DIR, 'main.py'), '--repo', repo,
+           '--features', features_path, '--json', '--no-file-cache']
+    _, metrics['peak_rss_mb'] = run_measured(cli)
+    metrics['startup_s'] = statistics.median(cli_run_seconds(features_path) for _ in range(repeat))
+
+    return {
+        'spec': asdict(spec),
+        'files': manifest['files'],
+        'bytes': manifest['bytes'],
+        'metrics': {k: round(v, 4) for k, v in metrics.items()},
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Returns one message per metric that is worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        base = baseline['metrics'].get(name)
+        value = current['metrics'].get(name)
+        if not base or value is None:
+            continue
+        change = (value - base) / base
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions.append(f"{name}: {value:g} vs baseline {base:g} ({change:+.1%})")
+    return regressions
+
+
+def print_report(current: Dict, baseline: Optional[Dict]) -> None:
+    print(f"Synthetic repo: {current['files']} files, {current['bytes'] / 1e6:.1f} MB")
+    for name in METRICS:
+        value = current['metrics'][name]
+        line = f"  {name:<22} {value:12.4f}"
+        base = (baseline or {}).get('metrics', {}).get(name)
+        if base:
+            line += f"   baseline {base:12.4f}  ({(value - base) / base:+.1%})"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    defaults = SynthSpec()
+    ap = argparse.ArgumentParser(description="Run the benchmark suite against a stored baseline.")
+    ap.add_argument('--features', default=None)
+    ap.add_argument('--files', type=int, default=defaults.files)
+    ap.add_argument('--programs', type=int, default=defaults.programs)
+    ap.add_argument('--helper-density', type=int, default=defaults.helper_density)
+    ap.add_argument('--headers', type=int, default=defaults.headers)
+    ap.add_argument('--header-kb', type=int, default=defaults.header_kb)
+    ap.add_argument('--seed', type=int, default=defaults.seed)
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--tolerance', type=float, default=0.25,
+                    help="allowed relative slowdown before a metric counts as a regression")
+    ap.add_argument('--baseline', default=DEFAULT_BASELINE)
+    ap.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    ap.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = ap.parse_args(argv)
+
+    features_path = args.features or analyzer.default_features_path(HERE)
+    spec = SynthSpec(files=args.files, programs=args.programs, helper_density=args.helper_density,
+                     headers=args.headers, header_kb=args.header_kb, seed=args.seed)
+
+    work = tempfile.mkdtemp(prefix='ebpf-bench-')
+    try:
+        current = run_suite(spec, features_path, args.repeat, work)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('spec') != current['spec']:
+            print("Baseline was recorded with a different synthetic spec; not comparing.", file=sys.stderr)
+            baseline = None
+
+    if args.json:
+        print(json.dumps(current, indent=2))
+    else:
+        print_report(current, baseline)
+
+    if baseline is None:
+        return 0
+    regressions = compare(current, baseline, args.tolerance)
+    for msg in regressions:
+        print(f"REGRESSION {msg}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Synthetic eBPF repository generator
+
+Builds a repository tree that looks like a typical libbpf project: BPF
+programs under src/ (SEC() programs calling helpers and declaring maps),
+user-space loaders that mention attach and program type constants, and
+vendored headers (a vmlinux.h-style dump) under headers/. Every name is
+drawn from data/feature-versions.yaml, so the analyzer finds real
+features in it.
+
+The output depends only on the parameters and --seed: the same arguments
+always produce byte-identical files, which is what the benchmark suite
+needs to compare runs against a stored baseline.
+
+Usage:
+  python benchmarks/synth_repo.py --out <dir> [--files N] [--programs N]
+      [--helper-density N] [--headers N] [--header-kb N] [--seed N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import main as analyzer  # noqa: E402
+
+# Attach suffixes that make SEC names look like real ones ("kprobe/<fn>")
+ATTACH_TARGETS = ['do_sys_open', 'tcp_v4_connect', 'vfs_read', 'sys_enter_execve', 'sched_switch',
+                  'inet_csk_accept', 'security_file_open', 'netif_receive_skb']
+CTX_TYPES = ['struct xdp_md *ctx', 'struct __sk_buff *skb', 'struct pt_regs *ctx', 'void *ctx',
+             'struct bpf_sock_addr *ctx', 'struct bpf_sock_ops *skops']
+
+
+@dataclass
+class SynthSpec:
+    files: int = 200               # BPF program sources under src/
+    programs: int = 4              # SEC() programs per source file
+    helper_density: int = 6        # helper calls per program
+    headers: int = 2               # vendored headers under headers/
+    header_kb: int = 512           # approximate size of each vendored header
+    seed: int = 1
+
+
+class Generator:
+    def __init__(self, gt: Dict, spec: SynthSpec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        # Sorted so the draw order never depends on set iteration order
+        self.helpers = sorted(gt['helpers'])
+        self.map_types = sorted(gt['map_types'])
+        self.attach_types = sorted(gt['attach_types'])
+        self.program_types = sorted(gt['program_types'])
+        self.sec_literals = sorted(gt['sec_literals'])
+        self.kfuncs = sorted(gt['kfuncs'])
+        self.flags = sorted(gt['flags'])
+        self.syscall_commands = sorted(gt['syscall_commands'])
+        self.link_types = sorted(gt['link_type'])
+
+    def sec_name(self) -> str:
+        literal = self.rng.choice(self.sec_literals)
+        if '/' not in literal and self.rng.random() < 0.6:
+            return f"{literal}/{self.rng.choice(ATTACH_TARGETS)}"
+        return literal
+
+    def map_decl(self, i: int) -> str:
+        return (
+            "struct {\n"
+            f"    __uint(type, {self.rng.choice(self.map_types)});\n"
+            f"    __uint(max_entries, {self.rng.choice((64, 1024, 10240, 65536))});\n"
+            "    __type(key, __u32);\n"
+            "    __type(value, __u64);\n"
+            f"}} map_{i} SEC(\".maps\");\n"
+        )
+
+    def program(self, file_no: int, prog_no: int, n_maps: int) -> str:
+        lines = [f'SEC("{self.sec_name()}")',
+                 f"int prog_{file_no}_{prog_no}({self.rng.choice(CTX_TYPES)})",
+                 "{",
+                 "    __u32 key = 0;",
+                 "    __u64 *val;"]
+        for _ in range(self.spec.helper_density):
+            # one call in eight goes to a kfunc instead of a helper
+            helper = self.rng.choice(self.kfuncs if self.rng.random() < 0.125 else self.helpers)
+            if n_maps and self.rng.random() < 0.3:
+                lines.append(f"    val = {helper}(&map_{self.rng.randrange(n_maps)}, &key);")
+            else:
+                lines.append(f"    {helper}(ctx, key);")
+        lines += ["    return 0;", "}", ""]
+        return '\n'.join(lines)
+
+    def bpf_source(self, file_no: int) -> str:
+        n_maps = self.rng.randint(1, 3)
+        parts = ['#include "vmlinux.h"', '#include <bpf/bpf_helpers.h>', '']
+        parts += [self.map_decl(i) for i in range(n_maps)]
+        parts += [self.program(file_no, p, n_maps) for p in range(self.spec.programs)]
+        parts.append('char LICENSE[] SEC("license") = "GPL";\n')
+        return '\n'.join(parts)
+
+    def loader_source(self, file_no: int) -> str:
+        attach = self.rng.choice(self.attach_types)
+        prog_type = self.rng.choice(self.program_types)
+        return (
+            '#include <bpf/libbpf.h>\n\n'
+            f'int load_{file_no}(struct bpf_object *obj, int cgroup_fd)\n'
+            '{\n'
+            f'    struct bpf_program *prog = bpf_object__find_program_by_name(obj, "prog_{file_no}_0");\n'
+            f'    union bpf_attr attr = {{ .link_create.attach_type = {attach} }};\n'
+            f'    bpf_program__set_type(prog, {prog_type});\n'
+            f'    if (syscall(__NR_bpf, {self.rng.choice(self.syscall_commands)}, &attr, sizeof(attr)) == '
+            f'{self.rng.choice(self.link_types)})\n'
+            '        return 0;\n'
+            f'    return bpf_prog_attach(bpf_program__fd(prog), cgroup_fd, {attach}, '
+            f'{self.rng.choice(self.flags)});\n'
+            '}\n'
+        )
+
+    def vendored_header(self, header_no: int) -> str:
+        # Mostly type definitions with no features in them, like vmlinux.h,
+        # plus the enums that name every map and attach type once.
+        parts = [f'#ifndef __VMLINUX_{header_no}_H__', f'#define __VMLINUX_{header_no}_H__', '',
+                 'enum bpf_map_type {']
+        parts += [f'    {name} = {i},' for i, name in enumerate(self.map_types)]
+        parts += ['};', '', 'enum bpf_attach_type {']
+        parts += [f'    {name} = {i},' for i, name in enumerate(self.attach_types)]
+        parts += ['};', '']
+        target = self.spec.header_kb * 1024
+        size = sum(len(p) + 1 for p in parts)
+        i = 0
+        while size < target:
+            n_fields = self.rng.randint(2, 12)
+            struct = [f'struct ktype_{header_no}_{i} {{']
+            struct += [f'    {self.rng.choice(("__u32", "__u64", "long", "void *"))} f{j};'
+                       for j in range(n_fields)]
+            struct += ['};', '']
+            size += sum(len(s) + 1 for s in struct)
+            parts += struct
+            i += 1
+        parts.append('#endif')
+        return '\n'.join(parts) + '\n'
+
+
+def write_file(path: str, text: str) -> int:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = text.encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def generate(out_dir: str, spec: SynthSpec, gt: Dict) -> Dict:
+    """Writes the synthetic repo to `out_dir`; returns a manifest of what was written."""
+    gen = Generator(gt, spec)
+    total_files = 0
+    total_bytes = 0
+    for i in range(spec.files):
+        total_bytes += write_file(os.path.join(out_dir, 'src', f'prog_{i:05d}.bpf.c'), gen.bpf_source(i))
+        total_files += 1
+        if i % 4 == 0:
+            total_bytes += write_file(os.path.join(out_dir, 'user', f'loader_{i:05d}.c'), gen.loader_source(i))
+            total_files += 1
+    for h in range(spec.headers):
+        total_bytes += write_file(os.path.join(out_dir, 'headers', f'vmlinux_{h}.h'), gen.vendored_header(h))
+        total_files += 1
+    return {'spec': asdict(spec), 'files': total_files, 'bytes': total_bytes}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    defaults = SynthSpec()
+    ap = argparse.ArgumentParser(description="Generate a synthetic eBPF repository.")
+    ap.add_argument('--out', required=True)
+    ap.add_argument('--features', default=None)
+    ap.add_argument('--files', type=int, default=defaults.files)
+    ap.add_argument('--programs', type=int, default=defaults.programs)
+    ap.add_argument('--helper-density', type=int, default=defaults.helper_density)
+    ap.add_argument('--headers', type=int, default=defaults.headers)
+    ap.add_argument('--header-kb', type=int, default=defaults.header_kb)
+    ap.add_argument('--seed', type=int, default=defaults.seed)
+    args = ap.parse_args(argv)
+
+    features_path = args.features or analyzer.default_features_path(HERE)
+    spec = SynthSpec(files=args.files, programs=args.programs, helper_density=args.helper_density,
+                     headers=args.headers, header_kb=args.header_kb, seed=args.seed)
+    manifest = generate(os.path.abspath(args.out), spec, analyzer.load_feature_sets(features_path))
+    print(json.dumps(manifest, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,351 @@
+"""
+Compiled BPF object reader
+
+Reads the features of a BPF ELF object (a clang `-target bpf` .o /
+.bpf.o) straight from its sections, without disassembling it:
+
+ - program sections: every executable section other than .text is a
+   SEC() program section, named exactly as in the source; one entry per
+   program (FUNC symbol) placed in it
+ - maps: BTF-defined maps in ".maps" get their type from the map struct's
+   `type` member (`__uint(type, X)` is encoded as `int (*type)[X]`);
+   legacy `struct bpf_map_def` maps in "maps" from their first field
+ - helpers: every `call` instruction with a plain immediate is a helper
+   call, and the immediate is its BPF_FUNC_* id (see bpf_ids.py)
+ - kfuncs: calls relocated against an undefined (extern) symbol are
+   named by that symbol
+
+object_tokens turns these into the same (RE_SCAN-style keys, SEC strings)
+pair a source scan produces, so count_file classifies objects and sources
+into one output schema and token indexes record them unchanged.
+
+The object is read through a memoryview with struct.unpack_from, so an
+mmapped file is parsed in place; only the names are copied out.
+"""
+
+from __future__ import annotations
+
+import struct
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from bpf_ids import helper_name, map_type_name
+
+ELF_MAGIC = b'\x7fELF'
+ELFCLASS64 = 2
+ELFDATA2LSB, ELFDATA2MSB = 1, 2
+EM_BPF = 247
+
+SHT_SYMTAB = 2
+SHT_REL = 9
+SHF_EXECINSTR = 0x4
+SHN_UNDEF = 0
+STT_OBJECT, STT_FUNC = 1, 2
+
+BPF_CALL = 0x85  # BPF_JMP | BPF_CALL
+
+BTF_MAGIC = 0xEB9F
+BTF_KIND_INT, BTF_KIND_PTR, BTF_KIND_ARRAY, BTF_KIND_STRUCT, BTF_KIND_UNION = 1, 2, 3, 4, 5
+BTF_KIND_ENUM, BTF_KIND_TYPEDEF, BTF_KIND_VOLATILE, BTF_KIND_CONST = 6, 8, 9, 10
+BTF_KIND_RESTRICT, BTF_KIND_FUNC_PROTO, BTF_KIND_VAR, BTF_KIND_DATASEC = 11, 13, 14, 15
+BTF_KIND_DECL_TAG, BTF_KIND_TYPE_TAG, BTF_KIND_ENUM64 = 17, 18, 19
+BTF_MODIFIERS = {BTF_KIND_TYPEDEF, BTF_KIND_VOLATILE, BTF_KIND_CONST, BTF_KIND_RESTRICT,
+                 BTF_KIND_TYPE_TAG}
+
+# Data sections that are written as SEC("...") in the source
+SEC_DATA_SECTIONS = ('.maps', 'maps', 'license', 'version')
+
+
+class ElfError(ValueError):
+    """
+    Raised for objects that cannot be read: `reason` is 'not_bpf' for
+    files that are not BPF ELF objects and 'bad_object' for malformed ones.
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class _Section:
+    __slots__ = ('index', 'name', 'type', 'flags', 'offset', 'size', 'link', 'info')
+
+    def __init__(self, index, name_off, sh_type, flags, offset, size, link, info):
+        self.index = index
+        self.name = name_off
+        self.type = sh_type
+        self.flags = flags
+        self.offset = offset
+        self.size = size
+        self.link = link
+        self.info = info
+
+
+class BpfObject:
+    """The sections, symbols and relocations of one BPF ELF object."""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.mv = memoryview(buf)
+        if len(self.mv) < 64 or self.mv[:4] != ELF_MAGIC:
+            raise ElfError('not_bpf', "not an ELF file")
+        if self.mv[4] != ELFCLASS64 or self.mv[5] not in (ELFDATA2LSB, ELFDATA2MSB):
+            raise ElfError('not_bpf', "not a 64-bit ELF file")
+        self.e = '<' if self.mv[5] == ELFDATA2LSB else '>'
+        (_, machine, _, _, _, shoff, _, _, _, _, shentsize, shnum, shstrndx) = \
+            self.unpack('HHIQQQIHHHHHH', 16)
+        if machine != EM_BPF:
+            raise ElfError('not_bpf', f"ELF machine {machine} is not BPF")
+        if shentsize != 64 or shoff + shnum * 64 > len(self.mv):
+            raise ElfError('bad_object', "section header table out of bounds")
+
+        self.sections: List[_Section] = []
+        for i in range(shnum):
+            name, sh_type, flags, _, offset, size, link, info, _, _ = \
+                self.unpack('IIQQQQIIQQ', shoff + i * 64)
+            self.sections.append(_Section(i, name, sh_type, flags, offset, size, link, info))
+        if shstrndx >= shnum:
+            raise ElfError('bad_object', "bad section name table index")
+        shstr = self.sections[shstrndx]
+        for sec in self.sections:
+            sec.name = self.cstr(shstr, sec.name)
+        self.by_name: Dict[str, _Section] = {s.name: s for s in self.sections}
+
+        self.symbols: List[Tuple[str, int, int, int]] = []   # (name, type, shndx, value)
+        symtab = next((s for s in self.sections if s.type == SHT_SYMTAB), None)
+        if symtab is not None:
+            strtab = self.section(symtab.link)
+            for off in range(symtab.offset, symtab.offset + symtab.size - 23, 24):
+                name, info, _, shndx, value, _ = self.unpack('IBBHQQ', off)
+                self.symbols.append((self.cstr(strtab, name), info & 0xf, shndx, value))
+
+    def unpack(self, fmt: str, offset: int) -> tuple:
+        try:
+            return struct.unpack_from(self.e + fmt, self.mv, offset)
+        except struct.error:
+            raise ElfError('bad_object', f"truncated object at offset {offset}") from None
+
+    def section(self, index: int) -> _Section:
+        if not 0 <= index < len(self.sections):
+            raise ElfError('bad_object', f"bad section index {index}")
+        return self.sections[index]
+
+    def data(self, sec: _Section) -> memoryview:
+        if sec.offset + sec.size > len(self.mv):
+            raise ElfError('bad_object', f"section {sec.name!r} out of bounds")
+        return self.mv[sec.offset:sec.offset + sec.size]
+
+    def cstr(self, strtab: _Section, offset: int) -> str:
+        return cstr(self.buf, strtab.offset + offset, strtab.offset + strtab.size)
+
+    def relocations(self, target: _Section) -> Dict[int, int]:
+        """{instruction offset: symbol index} of the relocations against `target`."""
+        out: Dict[int, int] = {}
+        for sec in self.sections:
+            if sec.type == SHT_REL and sec.info == target.index:
+                for off in range(sec.offset, sec.offset + sec.size - 15, 16):
+                    r_offset, r_info = self.unpack('QQ', off)
+                    out[r_offset] = r_info >> 32
+        return out
+
+    def release(self) -> None:
+        """Drops the view so an mmap under it can be closed."""
+        self.mv.release()
+
+
+def cstr(buf, start: int, end: int) -> str:
+    """The NUL-terminated string at `start` of a bytes or mmap buffer."""
+    if start >= end:
+        return ''
+    stop = buf.find(b'\0', start, end)
+    return buf[start:stop if stop != -1 else end].decode('utf-8', 'replace')
+
+
+# ----------------------------
+# Programs and calls
+# ----------------------------
+
+def program_sections(obj: BpfObject) -> List[str]:
+    """SEC() strings, one per program and per map/license definition."""
+    per_section: Counter[int] = Counter()
+    for _, sym_type, shndx, _ in obj.symbols:
+        if sym_type in (STT_FUNC, STT_OBJECT):
+            per_section[shndx] += 1
+    secs: List[str] = []
+    for sec in obj.sections:
+        if sec.flags & SHF_EXECINSTR and sec.size:
+            if sec.name == '.text':
+                continue  # subprograms and static functions
+        elif sec.name not in SEC_DATA_SECTIONS:
+            continue
+        secs.extend([sec.name] * max(1, per_section[sec.index]))
+    return secs
+
+
+def call_keys(obj: BpfObject, keys: Counter) -> None:
+    """Adds a 'name(' key per helper or kfunc call instruction."""
+    e = obj.e
+    src_shift = 4 if e == '<' else 0
+    for sec in obj.sections:
+        if not sec.flags & SHF_EXECINSTR or not sec.size:
+            continue
+        relocs = obj.relocations(sec)
+        code = obj.data(sec)
+        for pos in range(0, len(code) - 7, 8):
+            if code[pos] != BPF_CALL:
+                continue
+            src = (code[pos + 1] >> src_shift) & 0xf
+            sym = relocs.get(pos)
+            if sym is not None:
+                # extern (kfunc) calls are relocated against an undefined symbol
+                if sym < len(obj.symbols):
+                    name, _, shndx, _ = obj.symbols[sym]
+                    if shndx == SHN_UNDEF and name:
+                        keys[name + '('] += 1
+                continue
+            if src == 0:
+                (imm,) = struct.unpack_from(e + 'i', code, pos + 4)
+                name = helper_name(imm)
+                if name:
+                    keys[name + '('] += 1
+
+
+# ----------------------------
+# Maps
+# ----------------------------
+
+class Btf:
+    """Just enough of a .BTF section to resolve map definitions."""
+
+    def __init__(self, obj: BpfObject, sec: _Section):
+        mv = obj.data(sec)
+        e = obj.e
+        try:
+            magic, _, _, hdr_len, type_off, type_len, str_off, str_len = \
+                struct.unpack_from(e + 'HBBIIIII', mv, 0)
+        except struct.error:
+            raise ElfError('bad_object', "truncated .BTF header") from None
+        if magic != BTF_MAGIC:
+            raise ElfError('bad_object', "bad .BTF magic")
+        self.mv = mv
+        self.e = e
+        self.buf = obj.buf
+        self.str_start = sec.offset + hdr_len + str_off
+        self.str_end = min(self.str_start + str_len, sec.offset + sec.size)
+        # types[id] = (kind, name_off, vlen, size_or_type, offset of the kind data)
+        self.types: List[Tuple[int, int, int, int, int]] = [(0, 0, 0, 0, 0)]
+        pos = hdr_len + type_off
+        end = pos + type_len
+        try:
+            while pos + 12 <= end:
+                name_off, info, size_or_type = struct.unpack_from(e + 'III', mv, pos)
+                kind = (info >> 24) & 0x1f
+                vlen = info & 0xffff
+                self.types.append((kind, name_off, vlen, size_or_type, pos + 12))
+                pos += 12 + self.extra_size(kind, vlen)
+        except struct.error:
+            raise ElfError('bad_object', "truncated .BTF types") from None
+
+    @staticmethod
+    def extra_size(kind: int, vlen: int) -> int:
+        if kind in (BTF_KIND_INT, BTF_KIND_VAR, BTF_KIND_DECL_TAG):
+            return 4
+        if kind == BTF_KIND_ARRAY:
+            return 12
+        if kind in (BTF_KIND_STRUCT, BTF_KIND_UNION, BTF_KIND_ENUM64, BTF_KIND_DATASEC):
+            return 12 * vlen
+        if kind in (BTF_KIND_ENUM, BTF_KIND_FUNC_PROTO):
+            return 8 * vlen
+        return 0
+
+    def name(self, name_off: int) -> str:
+        return cstr(self.buf, self.str_start + name_off, self.str_end)
+
+    def get(self, type_id: int) -> Optional[Tuple[int, int, int, int, int]]:
+        return self.types[type_id] if 0 < type_id < len(self.types) else None
+
+    def skip_mods(self, type_id: int) -> Optional[Tuple[int, int, int, int, int]]:
+        t = self.get(type_id)
+        for _ in range(32):
+            if t is None or t[0] not in BTF_MODIFIERS:
+                return t
+            t = self.get(t[3])
+        return None
+
+    def datasec_vars(self, name: str) -> List[int]:
+        """Type ids of the VARs in the DATASEC called `name`, in offset order."""
+        for kind, name_off, vlen, _, data in self.types:
+            if kind == BTF_KIND_DATASEC and self.name(name_off) == name:
+                entries = [struct.unpack_from(self.e + 'III', self.mv, data + 12 * i)
+                           for i in range(vlen)]
+                return [type_id for type_id, _, _ in sorted(entries, key=lambda v: v[1])]
+        return []
+
+    def map_type(self, var_id: int) -> Optional[int]:
+        """The `type` field of a BTF-defined map variable, if it has one."""
+        var = self.get(var_id)
+        if var is None or var[0] != BTF_KIND_VAR:
+            return None
+        struct_t = self.skip_mods(var[3])
+        if struct_t is None or struct_t[0] != BTF_KIND_STRUCT:
+            return None
+        for i in range(struct_t[2]):
+            name_off, member_type, _ = struct.unpack_from(self.e + 'III', self.mv, struct_t[4] + 12 * i)
+            if self.name(name_off) != 'type':
+                continue
+            ptr = self.skip_mods(member_type)
+            if ptr is None or ptr[0] != BTF_KIND_PTR:
+                return None
+            arr = self.skip_mods(ptr[3])
+            if arr is None or arr[0] != BTF_KIND_ARRAY:
+                return None
+            (_, _, nelems) = struct.unpack_from(self.e + 'III', self.mv, arr[4])
+            return nelems
+        return None
+
+
+def map_types(obj: BpfObject) -> List[int]:
+    """The map type of every map the object defines, BTF-defined maps first."""
+    out: List[int] = []
+    btf_sec = obj.by_name.get('.BTF')
+    if btf_sec is not None and '.maps' in obj.by_name:
+        btf = Btf(obj, btf_sec)
+        for var_id in btf.datasec_vars('.maps'):
+            t = btf.map_type(var_id)
+            if t is not None:
+                out.append(t)
+    legacy = obj.by_name.get('maps')
+    if legacy is not None:
+        for _, sym_type, shndx, value in obj.symbols:
+            if shndx == legacy.index and sym_type == STT_OBJECT and value + 4 <= legacy.size:
+                out.append(obj.unpack('I', legacy.offset + value)[0])
+    return out
+
+
+def object_tokens(buf) -> Tuple[Counter, List[str]]:
+    """
+    (keys, secs) for count_file from a BPF object's bytes (bytes or mmap).
+    Raises ElfError for anything that is not a readable BPF object.
+    """
+    error: Optional[ElfError] = None
+    try:
+        obj = BpfObject(buf)
+        try:
+            keys: Counter[str] = Counter()
+            for t in map_types(obj):
+                name = map_type_name(t)
+                if name:
+                    keys[name] += 1
+            call_keys(obj, keys)
+            secs = program_sections(obj)
+        finally:
+            obj.release()
+    except ElfError as e:
+        error = ElfError(e.reason, str(e))
+    except struct.error:
+        error = ElfError('bad_object', "truncated object")
+    if error is not None:
+        # Raised outside the handler: the failed parse's frames (and their
+        # views into a caller's mmap) are gone, so the mmap can be closed.
+        raise error
+    return keys, secs
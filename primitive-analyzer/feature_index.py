@@ -0,0 +1,228 @@
+"""
+Compiled feature index
+
+Parsing data/feature-versions.yaml with PyYAML dominates analyzer startup,
+so the ground truth is compiled once into a JSON index stored next to the
+YAML (feature-versions.index.json) and reloaded from there while the YAML's
+sha256 is unchanged.
+
+The compiled index is a dict:
+
+{
+    'hash': sha256 of the YAML bytes (+ index format version),
+    'program_types': {kernel_prog_type_name: {literal, ...}},
+    'map_types': {...}, 'attach_types': {...}, 'helpers': {...},
+    ... one name set per NAME_SECTIONS entry ...,
+    'sec_literals': {literal: (yaml_rank, kernel_prog_type_name)},
+    'token_classes': {token: (kind, ...)},
+}
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, Optional, Set, Tuple
+
+# Bump whenever the compiled layout or what gets counted changes, so stale
+# caches (and the result memos keyed by the index hash) are rebuilt.
+INDEX_VERSION = 4
+
+# YAML sections that are plain lists of feature names
+NAME_SECTIONS = (
+    'map_types', 'attach_types', 'helpers', 'syscall_commands', 'link_type', 'flags',
+    'argument_constants', 'sock_ops', 'sock_opt_types', 'kfuncs',
+)
+
+# Output sections filled from token_classes. All of them share one lookup
+# per identifier, so adding a section does not add a pass over the text.
+TOKEN_KINDS = (
+    'map_types', 'attach_types', 'program_types_tokens', 'syscall_commands', 'link_type', 'flags',
+    'argument_constants', 'sock_ops', 'sock_opt_types', 'kfuncs',
+)
+
+# Kinds only counted where the token is called, like helpers
+CALL_KINDS = frozenset({'kfuncs'})
+
+
+def index_path_for(features_yaml_path: str) -> str:
+    base, _ = os.path.splitext(features_yaml_path)
+    return f"{base}.index.json"
+
+
+def yaml_digest(raw: bytes) -> str:
+    h = hashlib.sha256()
+    h.update(f"v{INDEX_VERSION}\0".encode())
+    h.update(raw)
+    return h.hexdigest()
+
+
+def feature_index_hash(features_yaml_path: str) -> str:
+    """Hash of the index for the YAML as it is on disk, without loading it."""
+    with open(features_yaml_path, 'rb') as f:
+        return yaml_digest(f.read())
+
+
+# ----------------------------
+# Compilation
+# ----------------------------
+
+def parse_feature_yaml(raw: bytes) -> Dict[str, object]:
+    """
+    Parses the YAML ground truth into:
+
+    {
+        'program_types': {
+            kernel_prog_type_name: {literal1, literal2, ...}
+        },
+        'map_types': {map_names...},
+        'attach_types': {attach_names...},
+        'helpers': {helper_names...},
+        ... and a name set for every other NAME_SECTIONS entry
+    }
+    """
+    try:
+        import yaml
+    except ImportError:
+        print("PyYAML required. Install with: pip install pyyaml", file=sys.stderr)
+        raise
+
+    data = yaml.safe_load(raw)
+
+    result = {'program_types': {}}
+    result.update((name, set()) for name in NAME_SECTIONS)
+
+    for section in data:
+        name = section.get('name')
+        features = section.get('features', [])
+        if not isinstance(features, list):
+            continue
+
+        # program types need literal mapping
+        if name == 'program_types':
+            for feat in features:
+                kernel_type = feat.get('name')
+                literal_list = feat.get('literals', [])
+                if kernel_type and isinstance(literal_list, list):
+                    result['program_types'][kernel_type] = set(literal_list)
+
+        # simple name-only sets
+        elif name in NAME_SECTIONS:
+            for feat in features:
+                feat_name = feat.get('name')
+                if feat_name:
+                    result[name].add(feat_name)
+
+    return result
+
+
+def build_sec_literals(program_types: Dict[str, Set[str]]) -> Dict[str, Tuple[int, str]]:
+    """
+    Inverts {kernel_type: {literal, ...}} into {literal: (rank, kernel_type)}
+    where rank is the type's YAML position. A literal listed under several
+    types keeps the first one, matching the old linear scan.
+    """
+    out: Dict[str, Tuple[int, str]] = {}
+    for rank, (kernel_type, literals) in enumerate(program_types.items()):
+        for lit in literals:
+            out.setdefault(lit, (rank, kernel_type))
+    return out
+
+
+def build_token_classes(gt: Dict) -> Dict[str, Tuple[str, ...]]:
+    """
+    Inverts the ground-truth name sets into {token: (kind, ...)} so each
+    identifier is classified with a single dict lookup.
+    """
+    sources = {kind: gt.get(kind, ()) for kind in TOKEN_KINDS}
+    sources['program_types_tokens'] = gt['program_types']
+    classes: Dict[str, Tuple[str, ...]] = {}
+    for kind in TOKEN_KINDS:
+        for name in sources[kind]:
+            classes[name] = classes.get(name, ()) + (kind,)
+    return classes
+
+
+def compile_feature_index(raw: bytes, digest: str) -> Dict:
+    gt = parse_feature_yaml(raw)
+    gt['hash'] = digest
+    gt['sec_literals'] = build_sec_literals(gt['program_types'])
+    gt['token_classes'] = build_token_classes(gt)
+    return gt
+
+
+# ----------------------------
+# On-disk cache
+# ----------------------------
+
+def _to_json(index: Dict) -> Dict:
+    data = {
+        'hash': index['hash'],
+        'program_types': {k: sorted(v) for k, v in index['program_types'].items()},
+        'sec_literals': {k: list(v) for k, v in index['sec_literals'].items()},
+        'token_classes': {k: list(v) for k, v in index['token_classes'].items()},
+    }
+    data.update((name, sorted(index[name])) for name in NAME_SECTIONS)
+    return data
+
+
+def _from_json(data: Dict) -> Dict:
+    index = {
+        'hash': data['hash'],
+        'program_types': {k: set(v) for k, v in data['program_types'].items()},
+        'sec_literals': {k: tuple(v) for k, v in data['sec_literals'].items()},
+        'token_classes': {k: tuple(v) for k, v in data['token_classes'].items()},
+    }
+    index.update((name, set(data[name])) for name in NAME_SECTIONS)
+    return index
+
+
+def _read_cached(index_path: str, digest: str) -> Optional[Dict]:
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('hash') != digest:
+        return None
+    try:
+        return _from_json(data)
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+def _write_cached(index_path: str, index: Dict) -> None:
+    # Best effort: a read-only data dir just means compiling every run.
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(prefix='.feature-index-', dir=os.path.dirname(index_path) or '.')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(_to_json(index), f, separators=(',', ':'))
+        os.replace(tmp, index_path)
+    except OSError:
+        if tmp and os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def load_feature_index(features_yaml_path: str, use_cache: bool = True) -> Dict:
+    """
+    Returns the compiled index for `features_yaml_path`, reusing the on-disk
+    index when its hash matches the YAML and (re)writing it otherwise.
+    """
+    with open(features_yaml_path, 'rb') as f:
+        raw = f.read()
+    digest = yaml_digest(raw)
+    index_path = index_path_for(features_yaml_path)
+
+    if use_cache:
+        cached = _read_cached(index_path, digest)
+        if cached is not None:
+            return cached
+
+    index = compile_feature_index(raw, digest)
+    if use_cache:
+        _write_cached(index_path, index)
+    return index
@@ -0,0 +1,147 @@
+"""
+Content-addressed per-file result cache
+
+Vendored files (vmlinux.h, bpf_helper_defs.h, whole libbpf trees) are
+byte-identical across many repositories. Their per-file partial counts are
+stored in SQLite under (content digest, feature index hash), so parse_repo
+only tokenizes content it has never seen before.
+
+The database is bounded by the total size of the stored results, which
+triggers keep in a one-row table so a flush never has to sum the whole
+table. When the total grows past the bound, the least recently used
+entries are evicted down to EVICT_TO of it. Several processes (parallel
+scan workers, analyzer pool workers) can share one database file: it
+runs in WAL mode and every writer batches its changes into a single
+transaction per flush.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Eviction frees this much headroom, so a full cache is not trimmed on every flush
+EVICT_TO = 0.9
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS file_counts ("
+    " key TEXT PRIMARY KEY,"
+    " counts TEXT NOT NULL,"
+    " size INTEGER NOT NULL,"
+    " last_used REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS file_counts_lru ON file_counts(last_used)",
+    "CREATE TABLE IF NOT EXISTS file_counts_total ("
+    " id INTEGER PRIMARY KEY CHECK (id = 1),"
+    " bytes INTEGER NOT NULL)",
+    # Databases from before the running total start from their current size
+    "INSERT OR IGNORE INTO file_counts_total(id, bytes)"
+    " SELECT 1, COALESCE(SUM(size), 0) FROM file_counts"
+    " WHERE NOT EXISTS (SELECT 1 FROM file_counts_total)",
+    "CREATE TRIGGER IF NOT EXISTS file_counts_insert AFTER INSERT ON file_counts BEGIN"
+    " UPDATE file_counts_total SET bytes = bytes + new.size WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS file_counts_delete AFTER DELETE ON file_counts BEGIN"
+    " UPDATE file_counts_total SET bytes = bytes - old.size WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS file_counts_resize AFTER UPDATE OF size ON file_counts BEGIN"
+    " UPDATE file_counts_total SET bytes = bytes + new.size - old.size WHERE id = 1; END",
+)
+
+
+def default_cache_path() -> str:
+    return os.environ.get("EBPF_FILE_CACHE") or os.path.join(
+        os.path.expanduser("~"), ".cache", "ebpfinsight", "file-counts.sqlite")
+
+
+def content_digest(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class FileCache:
+    """Per-file partial counts keyed by content digest and feature index hash."""
+
+    def __init__(self, path: str, index_hash: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.index_hash = index_hash
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._pending: List[Tuple[str, str, int, float]] = []
+        self._touched: Dict[str, float] = {}
+
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+
+    def _key(self, digest: str) -> str:
+        return f"{digest}:{self.index_hash}"
+
+    def get(self, digest: str) -> Optional[Dict[str, Counter]]:
+        key = self._key(digest)
+        row = self._conn.execute("SELECT counts FROM file_counts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[key] = time.time()
+        return {kind: Counter(d) for kind, d in json.loads(row[0]).items()}
+
+    def put(self, digest: str, counts: Dict[str, Counter]) -> None:
+        blob = json.dumps(counts, separators=(',', ':'))
+        self._pending.append((self._key(digest), blob, len(blob), time.time()))
+
+    def flush(self) -> None:
+        """Writes pending entries and LRU touches, then evicts if over budget."""
+        if not self._pending and not self._touched:
+            return
+        with self._conn:
+            # An upsert rather than INSERT OR REPLACE: REPLACE's implicit
+            # delete would not fire file_counts_delete
+            self._conn.executemany(
+                "INSERT INTO file_counts(key, counts, size, last_used) VALUES (?,?,?,?)"
+                " ON CONFLICT(key) DO UPDATE SET counts = excluded.counts, size = excluded.size,"
+                " last_used = excluded.last_used",
+                self._pending,
+            )
+            self._conn.executemany(
+                "UPDATE file_counts SET last_used = ? WHERE key = ?",
+                [(ts, key) for key, ts in self._touched.items()],
+            )
+            self._pending.clear()
+            self._touched.clear()
+            self._evict()
+
+    def size_bytes(self) -> int:
+        return self._conn.execute("SELECT bytes FROM file_counts_total WHERE id = 1").fetchone()[0]
+
+    def _evict(self) -> None:
+        if self.size_bytes() <= self.max_bytes:
+            return
+        self._conn.execute(
+            "DELETE FROM file_counts WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS running"
+            "  FROM file_counts)"
+            " WHERE running > ?)",
+            (int(self.max_bytes * EVICT_TO),),
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
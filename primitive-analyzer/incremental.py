@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Incremental re-analysis between git commits
+
+Keeps a state file with the per-file counters of the last analyzed commit.
+When a newer commit is analyzed, `git diff-tree` between the two commits
+lists the changed paths. The entries of deleted and modified files are
+dropped, and only the new versions of added and modified files are
+scanned. The totals are then merged from the per-file counters in path
+order, which is cheap next to scanning and keeps key order independent
+of the commits the state went through. File contents are read straight
+from the object store (`git cat-file --batch`), so this works on bare
+mirrors as well as checkouts. Candidate files are the same ones iter_files
+selects: same extensions, same excluded directories.
+
+Without a usable state (first run, different feature index, base commit
+no longer present) a full scan of the commit is done and recorded. The
+state also records the scan options (file size limit, --elf); a run with
+different options is refused rather than mixing files scanned under two
+policies.
+
+The printed JSON has the same shape as `main.py --json`, skipped_files
+included. --report adds an 'incremental' block with the number of files
+rescanned. --check also does a full scan of the commit and fails if the
+output differs, key order included.
+
+Usage:
+  python incremental.py --repo <git dir> --state <state.json> [--commit REV]
+                        [--features <path>] [--max-file-mb N] [--elf] [--report] [--check]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import main as analyzer
+from bpf_elf import ElfError
+from reader import DEFAULT_MAX_FILE_BYTES, skip_reason
+
+STATE_VERSION = 4
+
+# Regular files only; symlinks (120000) and submodules (160000) are skipped.
+BLOB_MODES = ('100644', '100755')
+
+
+# ----------------------------
+# git plumbing
+# ----------------------------
+
+def git(repo: str, *args: str) -> bytes:
+    proc = subprocess.run(["git", "-C", repo, *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"git {args[0]} failed: {proc.stderr.decode(errors='replace').strip()}")
+    return proc.stdout
+
+
+def resolve_commit(repo: str, rev: str) -> str:
+    return git(repo, "rev-parse", "--verify", f"{rev}^{{commit}}").decode().strip()
+
+
+def has_commit(repo: str, sha: str) -> bool:
+    proc = subprocess.run(["git", "-C", repo, "cat-file", "-e", f"{sha}^{{commit}}"],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return proc.returncode == 0
+
+
+def list_blobs(repo: str, commit: str, elf: bool = False) -> List[Tuple[str, str]]:
+    """(path, blob sha) of every candidate file in `commit`, in path order."""
+    include_exts = analyzer.include_exts_for(elf)
+    out = []
+    for entry in git(repo, "ls-tree", "-r", "-z", commit).split(b'\0'):
+        if not entry:
+            continue
+        meta, path = entry.split(b'\t', 1)
+        mode, _, sha = meta.decode().split()
+        rel = path.decode('utf-8', errors='surrogateescape')
+        if mode in BLOB_MODES and analyzer.is_candidate_path(rel, include_exts):
+            out.append((rel, sha))
+    return out
+
+
+def diff_blobs(repo: str, old: str, new: str) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Yields (path, new blob sha or None) for every path that differs between
+    the commits. None means the path is gone or no longer a regular file.
+    """
+    raw = git(repo, "diff-tree", "-r", "-z", "--no-renames", old, new)
+    fields = raw.split(b'\0')
+    i = 0
+    while i + 1 < len(fields):
+        meta, path = fields[i].decode(), fields[i + 1].decode('utf-8', errors='surrogateescape')
+        i += 2
+        _, new_mode, _, new_sha, status = meta.lstrip(':').split()
+        if status == 'D' or new_mode not in BLOB_MODES:
+            yield path, None
+        else:
+            yield path, new_sha
+
+
+class BlobReader:
+    """A long-lived `git cat-file --batch` for reading many blobs."""
+
+    def __init__(self, repo: str):
+        self._proc = subprocess.Popen(["git", "-C", repo, "cat-file", "--batch"],
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, sha: str) -> bytes:
+        self._proc.stdin.write(sha.encode() + b'\n')
+        self._proc.stdin.flush()
+        header = self._proc.stdout.readline().split()
+        if len(header) != 3:
+            raise RuntimeError(f"cannot read blob {sha}")
+        data = self._proc.stdout.read(int(header[2]))
+        self._proc.stdout.read(1)  # trailing newline
+        return data
+
+    def close(self) -> None:
+        self._proc.stdin.close()
+        self._proc.wait()
+
+    def kill(self) -> None:
+        self._proc.kill()
+
+    def __enter__(self) -> "BlobReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ----------------------------
+# Scanning and state
+# ----------------------------
+
+def scan_options(max_file_bytes: Optional[int], elf: bool = False) -> Dict:
+    """The options a state was built with; an update must use the same ones."""
+    return {'max_file_bytes': max_file_bytes, 'elf': elf}
+
+
+def scan_blob(path: str, raw: bytes, gt: Dict, options: Dict) -> Dict:
+    """
+    The state entry of one blob's content. Like parse_repo, blobs that the
+    size/binary policy or the ELF reader rejects have no counts and a
+    'skipped' reason instead.
+    """
+    is_object = analyzer.is_object_path(path)
+    reason = skip_reason(raw, len(raw), options['max_file_bytes'], is_object) if raw else None
+    counts = None
+    if raw and not reason:
+        try:
+            counts = analyzer.scan_object(raw, gt) if is_object else analyzer.scan_buffer(raw, gt)
+        except ElfError as e:
+            reason = e.reason
+    return {'counts': counts, 'skipped': reason, 'size': len(raw)}
+
+
+def path_order(files: Dict[str, Dict]) -> List[str]:
+    """Paths in ls-tree order: by their bytes, not by code points."""
+    return sorted(files, key=lambda p: p.encode('utf-8', errors='surrogateescape'))
+
+
+def merge_files(files: Dict[str, Dict]) -> Dict[str, Counter]:
+    """
+    Totals of the per-file counters, merged in path order (the order
+    ls-tree lists them), so key order is the same as a full scan's however
+    the state was reached.
+    """
+    totals = analyzer.new_totals()
+    for path in path_order(files):
+        if files[path]['counts']:
+            analyzer.merge_file_counts(totals, files[path]['counts'])
+    return totals
+
+
+def full_scan(repo: str, commit: str, gt: Dict, options: Dict) -> Dict:
+    files: Dict[str, Dict] = {}
+    with BlobReader(repo) as blobs:
+        for path, sha in list_blobs(repo, commit, options['elf']):
+            files[path] = {'blob': sha, **scan_blob(path, blobs.read(sha), gt, options)}
+    return {'commit': commit, 'options': options, 'files': files, 'rescanned': len(files)}
+
+
+def incremental_scan(repo: str, state: Dict, commit: str, gt: Dict) -> Dict:
+    files = state['files']
+    include_exts = analyzer.include_exts_for(state['options']['elf'])
+    rescanned = 0
+
+    with BlobReader(repo) as blobs:
+        for path, new_sha in diff_blobs(repo, state['commit'], commit):
+            files.pop(path, None)
+            if new_sha is None or not analyzer.is_candidate_path(path, include_exts):
+                continue
+            files[path] = {'blob': new_sha, **scan_blob(path, blobs.read(new_sha), gt, state['options'])}
+            rescanned += 1
+
+    return {'commit': commit, 'options': state['options'], 'files': files, 'rescanned': rescanned}
+
+
+def skipped_files(files: Dict[str, Dict]) -> List[Dict]:
+    """parse_repo's 'skipped_files' entries, in path order."""
+    return [{'path': path, 'reason': files[path]['skipped'], 'size': files[path]['size']}
+            for path in path_order(files) if files[path]['skipped']]
+
+
+def format_state(state: Dict) -> Dict:
+    """The state's results, shaped like parse_repo's output."""
+    results = analyzer.format_results(merge_files(state['files']))
+    skipped = skipped_files(state['files'])
+    if skipped:
+        results['skipped_files'] = skipped
+    return results
+
+
+def load_state(path: str, index_hash: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != STATE_VERSION or data.get('index_hash') != index_hash:
+        return None
+
+    def counters(d):
+        return {key: Counter(d[key]) for key in analyzer.FILE_COUNT_KEYS} if d else None
+
+    return {
+        'commit': data['commit'],
+        'options': data['options'],
+        'files': {p: {**f, 'counts': counters(f['counts'])} for p, f in data['files'].items()},
+    }
+
+
+def save_state(path: str, index_hash: str, state: Dict) -> None:
+    data = {
+        'version': STATE_VERSION,
+        'index_hash': index_hash,
+        'commit': state['commit'],
+        'options': state['options'],
+        'files': state['files'],
+    }
+    fd, tmp = tempfile.mkstemp(prefix='.state-', dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def analyze_commit(repo: str, commit: str, gt: Dict, state: Optional[Dict],
+                   options: Dict) -> Tuple[Dict, Dict]:
+    """
+    Returns (new state, stats) for `commit`, incrementally when possible.
+    Raises ValueError if `state` was built with other scan options.
+    """
+    if state is not None and state['options'] != options:
+        raise ValueError(f"state was built with {state['options']}, not {options}")
+    base = state['commit'] if state else None
+    if state is not None and has_commit(repo, base):
+        new_state = incremental_scan(repo, state, commit, gt)
+        full = False
+    else:
+        new_state = full_scan(repo, commit, gt, options)
+        full = True
+    stats = {
+        'base_commit': base,
+        'commit': commit,
+        'full_scan': full,
+        'files_rescanned': new_state.pop('rescanned'),
+        'files_tracked': len(new_state['files']),
+    }
+    return new_state, stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Re-analyze a git repository incrementally.")
+    ap.add_argument('--repo', required=True, help="git checkout or bare repository")
+    ap.add_argument('--state', required=True, help="per-file counter state from the last run")
+    ap.add_argument('--commit', default='HEAD')
+    ap.add_argument('--features', default=None)
+    ap.add_argument('--max-file-mb', type=float, default=DEFAULT_MAX_FILE_BYTES / (1024 * 1024),
+                    help="skip (and list) files larger than this; 0 = no limit. Must match the state's")
+    ap.add_argument('--elf', action='store_true', help="also analyze compiled BPF objects. Must match the state's")
+    ap.add_argument('--report', action='store_true', help="add an 'incremental' block with rescan stats")
+    ap.add_argument('--check', action='store_true', help="verify against a full scan of the commit")
+    args = ap.parse_args(argv)
+
+    features_path = args.features or analyzer.default_features_path(__file__)
+    if not os.path.isfile(features_path):
+        print(f"feature-versions.yaml not found at {features_path}", file=sys.stderr)
+        return 2
+    gt = analyzer.load_feature_sets(features_path)
+
+    options = scan_options(int(args.max_file_mb * 1024 * 1024) or None, args.elf)
+    commit = resolve_commit(args.repo, args.commit)
+    state = load_state(args.state, gt['hash'])
+    try:
+        new_state, stats = analyze_commit(args.repo, commit, gt, state, options)
+    except ValueError as e:
+        print(f"refusing to update {args.state}: {e}; pass the same options or remove the state file",
+              file=sys.stderr)
+        return 2
+    save_state(args.state, gt['hash'], new_state)
+
+    actual = format_state(new_state)
+    results = dict(actual)
+    if args.report:
+        results['incremental'] = stats
+    print(json.dumps(results, indent=2))
+
+    if args.check:
+        expected = format_state(full_scan(args.repo, commit, gt, options))
+        # Compared as JSON, so a difference in key order fails the check too
+        if json.dumps(expected) != json.dumps(actual):
+            print("consistency check FAILED: incremental output differs from a full scan", file=sys.stderr)
+            return 1
+        print("consistency check passed", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
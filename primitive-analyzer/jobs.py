@@ -0,0 +1,147 @@
+"""
+Background analysis jobs for repo-organizer
+
+A submitted job gets an id right away and runs on one of a fixed number of
+worker threads. Its phase moves through
+
+  queued -> cloning -> scanning -> done
+                                -> failed (from any running phase)
+
+and a status lookup returns the phase, timestamps, and the result or
+error once the job has finished.
+
+Jobs wait in a priority queue: "interactive" jobs (a user waiting in the
+UI) are always started before "bulk" ones, FIFO within each class. The
+queue is bounded; submit raises QueueFull instead of accepting work that
+would wait indefinitely. Finished jobs are kept for `keep_seconds` so
+clients can poll for the result, then dropped.
+"""
+
+from __future__ import annotations
+
+import itertools
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+PRIORITIES = {"interactive": 0, "bulk": 1}
+FINISHED = ("done", "failed")
+
+# run(params, set_phase) -> result; set_phase("scanning") etc.
+JobRunner = Callable[[Dict, Callable[[str], None]], Dict]
+
+
+class QueueFull(RuntimeError):
+    """Raised by submit when max_queued jobs are already waiting."""
+
+
+class JobQueue:
+    def __init__(self, run: JobRunner, workers: int = 2, max_queued: int = 1000,
+                 keep_seconds: float = 3600.0):
+        self.run = run
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.keep_seconds = keep_seconds
+        self._jobs: Dict[str, Dict] = {}
+        self._done_events: Dict[str, threading.Event] = {}
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    # ----------------------------
+    # Client side
+    # ----------------------------
+
+    def submit(self, params: Dict, priority: str = "interactive") -> Dict:
+        """Queues a job and returns its initial status."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of: {', '.join(PRIORITIES)}")
+        self._start_workers()
+        self._prune()
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "phase": "queued",
+            "priority": priority,
+            "params": params,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            if self._queue.qsize() >= self.max_queued:
+                raise QueueFull(f"{self.max_queued} jobs already queued")
+            self._jobs[job_id] = job
+            self._done_events[job_id] = threading.Event()
+            self._queue.put((PRIORITIES[priority], next(self._seq), job_id))
+            return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Blocks until the job finished (or `timeout`); returns its status."""
+        with self._lock:
+            event = self._done_events.get(job_id)
+        if event is not None:
+            event.wait(timeout)
+        return self.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            phases = [job["phase"] for job in self._jobs.values()]
+        return {
+            "queued": phases.count("queued"),
+            "running": sum(1 for p in phases if p not in FINISHED and p != "queued"),
+            "workers": self.workers,
+        }
+
+    # ----------------------------
+    # Workers
+    # ----------------------------
+
+    def _start_workers(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _set(self, job_id: str, **fields) -> None:
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _work(self) -> None:
+        while True:
+            _, _, job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs[job_id]
+                job.update(phase="cloning", started_at=time.time())
+                params = job["params"]
+            try:
+                result = self.run(params, lambda phase: self._set(job_id, phase=phase))
+                self._set(job_id, phase="done", result=result, finished_at=time.time())
+            except Exception as e:
+                self._set(job_id, phase="failed", error=str(e), finished_at=time.time())
+            finally:
+                with self._lock:
+                    event = self._done_events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.keep_seconds
+        with self._lock:
+            stale = [job_id for job_id, job in self._jobs.items()
+                     if job["finished_at"] is not None and job["finished_at"] < cutoff]
+            for job_id in stale:
+                del self._jobs[job_id]
@@ -9,10 +9,19 @@ Discovers across a repository:
  - declared program type(s) inferred via SEC() and ground truth
  - explicit program type tokens (BPF_PROG_TYPE_*) if present
 
-Ground truth for valid names is loaded from data/feature-versions.yaml.
+With --elf, compiled BPF objects (*.o, *.bpf.o) in the tree are read from
+their ELF sections as well (see bpf_elf.py) and counted into the same
+output.
+
+Ground truth for valid names is loaded from data/feature-versions.yaml,
+via the compiled index cached next to it (see feature_index.py).
 
 Usage:
-  python -m tools.repo_parser.main --repo <path> [--features <path>] [--json]
+  python -m tools.repo_parser.main --repo <path> [--features <path>] [--json] [--jobs N]
+                                   [--file-cache [<db>]] [--max-file-mb N] [--elf] [--profile]
+
+  <path> may also be a tar/zip archive, or - to stream one from stdin:
+  git archive HEAD | python main.py --repo - --json
 """
 
 from __future__ import annotations
@@ -22,23 +31,29 @@ import json
 import os
 import re
 import sys
+import time
 from collections import Counter
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
-try:
-    import yaml
-except ImportError:
-    print("PyYAML required. Install with: pip install pyyaml", file=sys.stderr)
-    raise
+from archives import ArchiveError, iter_archive
+from bpf_elf import ElfError, object_tokens
+from feature_index import CALL_KINDS, TOKEN_KINDS, load_feature_index
+from file_cache import DEFAULT_MAX_BYTES as DEFAULT_CACHE_MAX_BYTES
+from file_cache import FileCache, content_digest, default_cache_path
+from reader import (DEFAULT_MAX_FILE_BYTES, Buffer, SkipFile, iter_chunks, open_buffer,
+                    release_pages, skip_reason)
+from timing import PhaseTimer, format_breakdown
+from token_index import TokenIndex, is_index_key
 
 
 # ----------------------------
 # Ground-truth loading helpers
 # ----------------------------
 
-def load_feature_sets(features_yaml_path: str) -> Dict[str, Dict[str, Set[str]]]:
+def load_feature_sets(features_yaml_path: str) -> Dict:
     """
-    Loads YAML and returns:
+    Returns the compiled feature index for the YAML:
 
     {
         'program_types': {
@@ -46,41 +61,14 @@ def load_feature_sets(features_yaml_path: str) -> Dict[str, Dict[str, Set[str]]]
         },
         'map_types': {map_names...},
         'attach_types': {attach_names...},
-        'helpers': {helper_names...}
+        'helpers': {helper_names...},
+        'kfuncs': {kfunc_names...}, 'flags': {...}, ... (every name section),
+        'sec_literals': {literal: (rank, kernel_prog_type_name)},
+        'token_classes': {token: (kind, ...)},
+        'hash': ...
     }
     """
-    with open(features_yaml_path, 'r', encoding='utf-8') as f:
-        data = yaml.safe_load(f)
-
-    result = {
-        'program_types': {},
-        'map_types': set(),
-        'attach_types': set(),
-        'helpers': set(),
-    }
-
-    for section in data:
-        name = section.get('name')
-        features = section.get('features', [])
-        if not isinstance(features, list):
-            continue
-
-        # program types need literal mapping
-        if name == 'program_types':
-            for feat in features:
-                kernel_type = feat.get('name')
-                literal_list = feat.get('literals', [])
-                if kernel_type and isinstance(literal_list, list):
-                    result['program_types'][kernel_type] = set(literal_list)
-
-        # simple name-only sets
-        elif name in ('map_types', 'attach_types', 'helpers'):
-            for feat in features:
-                feat_name = feat.get('name')
-                if feat_name:
-                    result[name].add(feat_name)
-
-    return result
+    return load_feature_index(features_yaml_path)
 
 
 
@@ -93,20 +81,50 @@ DEFAULT_INCLUDE_EXTS = {
     '.go', '.rs', '.skel.h', '.skel.c'
 }
 
+# Candidates read as compiled BPF objects rather than as source text. They
+# are only scanned on request (elf=True, --elf): in a build tree most
+# objects are host code, each of which would be read and listed as not_bpf.
+OBJECT_EXTS = ('.o',)
+ELF_INCLUDE_EXTS = DEFAULT_INCLUDE_EXTS | set(OBJECT_EXTS)
+
 EXCLUDE_DIRS = {'.git', 'build', 'dist', 'out', 'node_modules', 'vendor', 'target', '.venv',
                  '.mypy_cache', '.pytest_cache'}
 
 
+def is_excluded_dir(name: str) -> bool:
+    return name in EXCLUDE_DIRS or name.startswith('.')
+
+
+def has_include_ext(filename: str, include_exts: Set[str] = DEFAULT_INCLUDE_EXTS) -> bool:
+    low = filename.lower()
+    return any(low.endswith(ext) for ext in include_exts)
+
+
+def is_candidate_path(relpath: str, include_exts: Set[str] = DEFAULT_INCLUDE_EXTS) -> bool:
+    """
+    The iter_files filter for a '/'-separated path relative to the repo root,
+    for sources that are not a directory walk (git trees, archives).
+    """
+    parts = relpath.split('/')
+    if any(is_excluded_dir(d) for d in parts[:-1]):
+        return False
+    return has_include_ext(parts[-1], include_exts)
+
+
+def include_exts_for(elf: bool) -> Set[str]:
+    return ELF_INCLUDE_EXTS if elf else DEFAULT_INCLUDE_EXTS
+
+
+def is_object_path(path: str) -> bool:
+    return path.lower().endswith(OBJECT_EXTS)
+
+
 def iter_files(root: str, include_exts: Set[str] = DEFAULT_INCLUDE_EXTS) -> Iterable[str]:
     for dirpath, dirnames, filenames in os.walk(root):
-        dirnames[:] = [d for d in dirnames if d not in EXCLUDE_DIRS and not d.startswith('.')]
+        dirnames[:] = [d for d in dirnames if not is_excluded_dir(d)]
         for fn in filenames:
-            low = fn.lower()
-            path = os.path.join(dirpath, fn)
-            for ext in include_exts:
-                if low.endswith(ext):
-                    yield path
-                    break
+            if has_include_ext(fn, include_exts):
+                yield os.path.join(dirpath, fn)
 
 
 # ---------------------------------
@@ -115,18 +133,32 @@ def iter_files(root: str, include_exts: Set[str] = DEFAULT_INCLUDE_EXTS) -> Iter
 
 RE_SEC = re.compile(r'\bSEC\s*\(\s*"([^"]+)"\s*\)')
 RE_SECTION_ATTR = re.compile(r'section\s*\(\s*"([^"]+)"\s*\)')
-RE_HELPER_CALL = re.compile(r'\b(bpf_[a-z0-9_]+)\s*\(')
+# Fallback helper shape when the ground truth lists no helpers.
+RE_HELPER_NAME = re.compile(r'bpf_[a-z0-9_]+')
 RE_TOKEN = re.compile(r'\b([A-Z][A-Z0-9_]{2,})\b')
 
 
-def read_text(path: str) -> Optional[str]:
+def read_bytes(path: str) -> Optional[bytes]:
     try:
-        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        with open(path, 'rb') as f:
             return f.read()
     except Exception:
         return None
 
 
+def decode_text(raw: bytes) -> str:
+    """Same text as open(path, 'r', encoding='utf-8', errors='ignore').read()."""
+    text = raw.decode('utf-8', errors='ignore')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def read_text(path: str) -> Optional[str]:
+    raw = read_bytes(path)
+    return decode_text(raw) if raw is not None else None
+
+
 # ----------------------------
 # SEC helpers
 # ----------------------------
@@ -145,31 +177,28 @@ def sec_prefix_candidates(sec: str) -> Tuple[str, Optional[str]]:
     return first, first_two
 
 
-def infer_program_type_from_sec(sec: str, program_types: Dict[str, Set[str]]) -> Optional[str]:
+def infer_program_type_from_sec(sec: str, sec_literals: Dict[str, Tuple[int, str]]) -> Optional[str]:
     """
-    Given a SEC string and a mapping:
-        {kernel_prog_type_name: {literals...}}
+    Given a SEC string and the inverted mapping:
+        {literal: (rank, kernel_prog_type_name)}
 
-    A literal matches if SEC starts with the literal exactly or if the literal equals:
+    A literal matches if it equals:
     - first literal
     - first-two literal
 
-    If match found, return the kernel program type name.
+    If both match, the program type listed first in the YAML wins.
 
     If none match, return None.
     """
     first, first_two = sec_prefix_candidates(sec)
 
-    # possible SEC prefixes to test
-    candidates = {first}
-    if first_two:
-        candidates.add(first_two)
-
-    for kernel_type, literal_set in program_types.items():
-        if any(c in literal_set for c in candidates):
-            return kernel_type
+    hit = sec_literals.get(first)
+    if first_two is not None:
+        hit_two = sec_literals.get(first_two)
+        if hit_two is not None and (hit is None or hit_two < hit):
+            hit = hit_two
 
-    return None
+    return hit[1] if hit is not None else None
 
 
 # ----------------------------
@@ -253,99 +282,530 @@ def extract_attach_from_sec(sec: str) -> str:
 
 
 # ----------------------------
-# Core parsing routine
+# Single-pass file scanner
 # ----------------------------
 
-def parse_repo(repo_root: str, features_path: str) -> Dict[str, Dict[str, int]]:
-    gt = load_feature_sets(features_path)
+# One sweep per file: every identifier run, with a trailing call paren kept
+# attached. ASCII text takes the (much faster) re.ASCII variant; \w only
+# differs from it on non-ASCII characters.
+RE_SCAN = re.compile(r'\w+(?:\s*\()?')
+RE_SCAN_ASCII = re.compile(r'\w+(?:\s*\()?', re.ASCII)
+
+# Sections counted on top of the original six (syscall commands, kfuncs, ...)
+EXTRA_TOKEN_KINDS = tuple(k for k in TOKEN_KINDS
+                          if k not in ('map_types', 'attach_types', 'program_types_tokens'))
+
+def finditer_at_literal(pattern: re.Pattern, text: str, literal: str) -> List[str]:
+    """
+    Same matches as pattern.finditer(text) for a pattern that can only start
+    with `literal`, but only tries the offsets where `literal` occurs.
+    """
+    out: List[str] = []
+    pos = text.find(literal)
+    while pos != -1:
+        m = pattern.match(text, pos)
+        if m:
+            out.append(m.group(1))
+            pos = text.find(literal, m.end())
+        else:
+            pos = text.find(literal, pos + 1)
+    return out
+
+
+def scan_text(text: str, gt: Dict) -> Dict[str, Counter]:
+    """
+    Scans one file's text and returns its partial counts:
+
+    {
+        'sec_full': Counter, 'program_types_inferred': Counter,
+        'attach_types': Counter, 'helpers': Counter,
+        'map_types': Counter, 'program_types_tokens': Counter,
+        'syscall_commands': Counter, ... one Counter per other TOKEN_KINDS entry
+    }
+
+    Counts (and first-seen key order) are identical to running RE_SEC,
+    RE_SECTION_ATTR and one word-bounded alternation per name set (a call
+    alternation for helpers and kfuncs).
+    """
+    scanner = RE_SCAN_ASCII if text.isascii() else RE_SCAN
+    return count_file(Counter(scanner.findall(text)), lambda: text, gt)
+
+
+def scan_buffer(buf: Buffer, gt: Dict, index: Optional[TokenIndex] = None) -> Dict[str, Counter]:
+    """
+    scan_text for a file's raw bytes (bytes or mmap), without decoding the
+    whole file. The buffer is tokenized chunk by chunk (see reader.py), so
+    at most one chunk is held as text; non-ASCII chunks are decoded like
+    decode_text so identifiers tokenize exactly as in scan_text. Only files
+    that call SEC()/section() are decoded whole, for literal extraction.
+
+    With an `index` (see token_index.py) the file's tokens are recorded too.
+    """
+    chunks = list(iter_chunks(buf))
+    keys: Counter[str] = Counter()
+    for start, end in chunks:
+        data = buf[start:end]
+        if data.isascii():
+            # a plain copy; cheaper than decoding every distinct bytes key
+            chunk_keys = Counter(RE_SCAN_ASCII.findall(data.decode('ascii')))
+        else:
+            chunk_keys = Counter(RE_SCAN.findall(decode_text(data)))
+        if len(chunks) > 1:
+            # Generated headers carry millions of distinct identifiers; keep
+            # only the ones count_file (or the index) looks at so memory
+            # stays bounded.
+            chunk_keys = {k: n for k, n in chunk_keys.items()
+                          if is_counted_key(k, gt) or (index is not None and is_index_key(k))}
+        keys.update(chunk_keys)
+        release_pages(buf, start, end)
+    return count_file(keys, lambda: decode_text(buf[:]), gt, index=index)
+
+
+def scan_object(buf: Buffer, gt: Dict, index: Optional[TokenIndex] = None) -> Dict[str, Counter]:
+    """
+    scan_buffer for a compiled BPF object: its program sections, map types
+    and helper/kfunc calls (see bpf_elf.py) are classified by count_file
+    like a source file's. Raises ElfError for files that are not BPF objects.
+    """
+    keys, secs = object_tokens(buf)
+    return count_file(keys, None, gt, secs=secs, index=index)
+
+
+def is_counted_key(key: str, gt: Dict) -> bool:
+    """Whether count_file does anything with this RE_SCAN key."""
+    if key[-1] == '(':
+        tok = key[:-1].rstrip()
+        if tok == 'SEC' or tok.endswith('section') or tok in gt['token_classes']:
+            return True
+        helpers_set = gt['helpers']
+        return (tok in helpers_set) if helpers_set else bool(RE_HELPER_NAME.fullmatch(tok))
+    return key in gt['token_classes']
+
+
+def count_file(keys: Counter, get_text: Optional[Callable[[], str]], gt: Dict,
+               secs: Optional[List[str]] = None,
+               index: Optional[TokenIndex] = None) -> Dict[str, Counter]:
+    """
+    Classifies one file's RE_SCAN keys (in first-seen order) into partial
+    counts. `get_text` returns the decoded file and is only called when the
+    keys show a SEC(/section( call whose literals must be extracted.
+
+    `secs` passes the SEC()/section() strings directly instead (a recount
+    from a token index has no text). With an `index`, the keys and SEC
+    strings are added to it.
+    """
     helpers_set = gt['helpers']
-    map_types_set = gt['map_types']
-    attach_types_set = gt['attach_types']
-    program_types_set = gt['program_types']
-    program_types_dict = gt['program_types']
+    sec_literals = gt['sec_literals']
+    token_classes = gt['token_classes']
 
+    has_sec = has_section = False
     helper_counts: Counter[str] = Counter()
-    map_type_counts: Counter[str] = Counter()
-    attach_type_counts: Counter[str] = Counter()
-    program_type_counts: Counter[str] = Counter()
+    token_counts: Dict[str, Counter] = {kind: Counter() for kind in TOKEN_KINDS}
+
+    for key, n in keys.items():
+        call = key[-1] == '('
+        if call:
+            tok = key[:-1].rstrip()
+            if tok == 'SEC':
+                has_sec = True
+            elif tok.endswith('section'):
+                has_section = True
+            if (tok in helpers_set) if helpers_set else RE_HELPER_NAME.fullmatch(tok):
+                helper_counts[tok] += n
+        else:
+            tok = key
+        kinds = token_classes.get(tok)
+        if kinds:
+            for kind in kinds:
+                if call or kind not in CALL_KINDS:
+                    token_counts[kind][tok] += n
+
+    if secs is None:
+        # Only files whose token stream contains a SEC(/section( call get their
+        # literals pulled out, and only at offsets where the call name occurs.
+        text = get_text() if has_sec or has_section else ''
+        secs = finditer_at_literal(RE_SEC, text, 'SEC') if has_sec else []
+        if has_section:
+            secs += finditer_at_literal(RE_SECTION_ATTR, text, 'section')
+    if index is not None:
+        index.add_file(keys, secs)
+
     sec_full_counts: Counter[str] = Counter()
-    prog_type_token_counts: Counter[str] = Counter()
+    program_type_counts: Counter[str] = Counter()
+    attach_type_counts: Counter[str] = Counter()
 
-    if helpers_set:
-        helpers_alt = '|'.join(sorted(re.escape(h) for h in helpers_set))
-        re_helper_exact = re.compile(rf'\b({helpers_alt})\s*\(')
-    else:
-        re_helper_exact = RE_HELPER_CALL
+    # SEC() and attribute section()
+    for sec in secs:
+        sec_full_counts[sec] += 1
 
-    map_alt = '|'.join(sorted(re.escape(m) for m in map_types_set)) if map_types_set else None
-    re_map_token = re.compile(rf'\b({map_alt})\b') if map_alt else None
+        # Non-literal sections like ".maps" map to no program type.
+        kernel_type = infer_program_type_from_sec(sec, sec_literals)
+        if kernel_type:
+            program_type_counts[kernel_type] += 1
 
-    attach_alt = '|'.join(sorted(re.escape(a) for a in attach_types_set)) if attach_types_set else None
-    re_attach_token = re.compile(rf'\b({attach_alt})\b') if attach_alt else None
+        attach_literal = extract_attach_from_sec(sec)
+        attach_type_counts[attach_literal] += 1
 
-    prog_alt = '|'.join(sorted(re.escape(p) for p in program_types_set)) if program_types_set else None
-    re_prog_token = re.compile(rf'\b({prog_alt})\b') if prog_alt else None
+    # explicit attach type tokens come after SEC-derived attach points
+    attach_type_counts.update(token_counts['attach_types'])
 
-    for path in iter_files(repo_root):
-        text = read_text(path)
-        if not text:
-            continue
+    counts = {
+        'sec_full': sec_full_counts,
+        'program_types_inferred': program_type_counts,
+        'attach_types': attach_type_counts,
+        'helpers': helper_counts,
+    }
+    for kind in TOKEN_KINDS:
+        if kind != 'attach_types':
+            counts[kind] = token_counts[kind]
+    return counts
+
+
+# Merge order mirrors the per-file order in which the original regex sweeps
+# populated each counter, so dict key order in the output is unchanged.
+FILE_COUNT_KEYS = (
+    'sec_full', 'program_types_inferred', 'attach_types',
+    'helpers', 'map_types', 'program_types_tokens',
+) + EXTRA_TOKEN_KINDS
 
-        # SEC() and attribute section()
-        for sec_match in list(RE_SEC.finditer(text)) + list(RE_SECTION_ATTR.finditer(text)):
-            sec = sec_match.group(1)
-            sec_full_counts[sec] += 1
-
-            # Exclude non-literal sections like ".maps" from inferred types.
-            first, first_two = sec_prefix_candidates(sec)
-            # Determine if the first or first-two literal exists in any program type literal set
-            has_valid_literal = any(
-                (first in lits) or (first_two is not None and first_two in lits)
-                for lits in program_types_dict.values()
-            )
-
-            if has_valid_literal:
-                kernel_type = infer_program_type_from_sec(sec, program_types_dict)
-                if kernel_type:
-                    program_type_counts[kernel_type] += 1
-
-            # for at in infer_attach_from_sec(sec, attach_types_set):
-            #     attach_type_counts[at] += 1
-
-            attach_literal = extract_attach_from_sec(sec)
-            attach_type_counts[attach_literal] += 1
-
-        # helpers
-        for m in re_helper_exact.finditer(text):
-            helper_counts[m.group(1)] += 1
-
-        # map types
-        if re_map_token:
-            for m in re_map_token.finditer(text):
-                map_type_counts[m.group(1)] += 1
-
-        # explicit attach type tokens
-        if re_attach_token:
-            for m in re_attach_token.finditer(text):
-                attach_type_counts[m.group(1)] += 1
-
-        # explicit program type tokens
-        if re_prog_token:
-            for m in re_prog_token.finditer(text):
-                prog_type_token_counts[m.group(1)] += 1
 
+def merge_file_counts(totals: Dict[str, Counter], partial: Dict[str, Counter]) -> None:
+    for key in FILE_COUNT_KEYS:
+        totals[key].update(partial[key])
+
+
+def format_results(totals: Dict[str, Counter]) -> Dict[str, Dict[str, int]]:
     return {
-        'map_types': dict(map_type_counts),
-        'attach_types': dict(attach_type_counts),
-        'helpers': dict(helper_counts),
+        'map_types': dict(totals['map_types']),
+        'attach_types': dict(totals['attach_types']),
+        'helpers': dict(totals['helpers']),
         'program_sections': {
-            'sec_full': dict(sec_full_counts),
+            'sec_full': dict(totals['sec_full']),
         },
-        'program_types_inferred': dict(program_type_counts),
-        'program_types_tokens': dict(prog_type_token_counts),
+        'program_types_inferred': dict(totals['program_types_inferred']),
+        'program_types_tokens': dict(totals['program_types_tokens']),
+        **{kind: dict(totals[kind]) for kind in EXTRA_TOKEN_KINDS},
     }
 
 
+def new_totals() -> Dict[str, Counter]:
+    return {key: Counter() for key in FILE_COUNT_KEYS}
+
+
+def scan_files(paths: Iterable[str], gt: Dict, cache: Optional[FileCache] = None,
+               max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+               skipped: Optional[List[Dict]] = None,
+               timer: Optional[PhaseTimer] = None,
+               index: Optional[TokenIndex] = None) -> Dict[str, Counter]:
+    """
+    Scans `paths` in order and returns merged counts. With a `cache`, files
+    whose content was scanned before (in any repo) are not tokenized again.
+    Files rejected by the size/binary policy (see reader.py) are appended
+    to `skipped` as {'path', 'reason', 'size'}, and so are object files
+    that are not readable BPF objects (reason 'not_bpf' or 'bad_object').
+
+    With a `timer`, time to open/read each file is charged to 'read' and
+    the rest to 'scan' (mmapped pages fault in during the scan). With an
+    `index`, every scanned file is recorded in it.
+    """
+    totals = new_totals()
+    clock = time.perf_counter
+    read_s = scan_s = 0.0
+    files = nbytes = 0
+    for path in paths:
+        start = clock()
+        is_object = is_object_path(path)
+        try:
+            with open_buffer(path, max_file_bytes, binary=is_object) as buf:
+                opened = clock()
+                read_s += opened - start
+                if buf:
+                    scan = scan_object if is_object else scan_buffer
+                    merge_file_counts(totals, scan_cached(buf, gt, cache, index, scan))
+                    files += 1
+                    nbytes += len(buf)
+                scan_s += clock() - opened
+        except SkipFile as e:
+            if skipped is not None:
+                skipped.append({'path': path, 'reason': e.reason, 'size': e.size})
+        except ElfError as e:
+            if skipped is not None:
+                skipped.append({'path': path, 'reason': e.reason, 'size': file_size(path)})
+        except (OSError, ValueError):
+            continue
+    if cache is not None:
+        cache.flush()
+    if timer is not None:
+        timer.add('read', read_s)
+        timer.add('scan', scan_s)
+        timer.count('files_scanned', files)
+        timer.count('bytes_read', nbytes)
+    return totals
+
+
+def scan_contents(members: Iterable[Tuple[str, int, Optional[bytes]]], gt: Dict,
+                  cache: Optional[FileCache] = None,
+                  max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+                  skipped: Optional[List[Dict]] = None,
+                  timer: Optional[PhaseTimer] = None,
+                  index: Optional[TokenIndex] = None) -> Dict[str, Counter]:
+    """
+    scan_files over in-memory (path, size, content) members, e.g. from an
+    archive. A None content means the member was too large to be read.
+    With a `timer`, reading (and decompressing) members is charged to 'read'.
+    """
+    totals = new_totals()
+    clock = time.perf_counter
+    scan_s = 0.0
+    files = nbytes = 0
+    if timer is not None:
+        members = timer.timed_iter(members, 'read')
+    for path, size, raw in members:
+        is_object = is_object_path(path)
+        reason = 'too_large' if raw is None else skip_reason(raw, size, max_file_bytes, is_object)
+        if not reason and raw:
+            start = clock()
+            try:
+                partial = scan_cached(raw, gt, cache, index, scan_object if is_object else scan_buffer)
+            except ElfError as e:
+                reason = e.reason
+            scan_s += clock() - start
+        if reason:
+            if skipped is not None:
+                skipped.append({'path': path, 'reason': reason, 'size': size})
+            continue
+        if raw:
+            merge_file_counts(totals, partial)
+            files += 1
+            nbytes += len(raw)
+    if cache is not None:
+        cache.flush()
+    if timer is not None:
+        timer.add('scan', scan_s)
+        timer.count('files_scanned', files)
+        timer.count('bytes_read', nbytes)
+    return totals
+
+
+def scan_cached(buf: Buffer, gt: Dict, cache: Optional[FileCache],
+                index: Optional[TokenIndex] = None,
+                scan: Callable[..., Dict[str, Counter]] = scan_buffer) -> Dict[str, Counter]:
+    # Cached counts carry no tokens, so indexing always scans.
+    if cache is None or index is not None:
+        return scan(buf, gt, index)
+    digest = content_digest(buf)
+    partial = cache.get(digest)
+    if partial is None:
+        partial = scan(buf, gt)
+        cache.put(digest, partial)
+    return partial
+
+
+# ----------------------------
+# Parallel scanning
+# ----------------------------
+
+# Below this many bytes of candidate source, pool startup costs more than
+# the parallel scan saves and parse_repo stays serial.
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+# Chunks handed out per worker; more chunks smooth out uneven file sizes.
+CHUNKS_PER_JOB = 4
+
+_worker_gt: Optional[Dict] = None
+_worker_cache: Optional[FileCache] = None
+_worker_max_file_bytes: Optional[int] = None
+_worker_indexing = False
+
+
+def _init_scan_worker(gt: Dict, cache_path: Optional[str], cache_max_bytes: int,
+                      max_file_bytes: Optional[int], indexing: bool = False) -> None:
+    global _worker_gt, _worker_cache, _worker_max_file_bytes, _worker_indexing
+    _worker_gt = gt
+    _worker_max_file_bytes = max_file_bytes
+    _worker_indexing = indexing
+    if cache_path:
+        _worker_cache = FileCache(cache_path, gt['hash'], cache_max_bytes)
+
+
+def _scan_chunk(paths: List[str]) -> Tuple[Dict[str, Counter], Dict[str, int], List[Dict], Dict,
+                                           Optional[TokenIndex]]:
+    before = _worker_cache.stats() if _worker_cache else {}
+    skipped: List[Dict] = []
+    timer = PhaseTimer()
+    index = TokenIndex() if _worker_indexing else None
+    totals = scan_files(paths, _worker_gt, _worker_cache, _worker_max_file_bytes, skipped, timer, index)
+    after = _worker_cache.stats() if _worker_cache else {}
+    return totals, {k: after[k] - before[k] for k in after}, skipped, timer.as_dict(), index
+
+
+def chunk_by_size(paths: List[str], sizes: List[int], n_chunks: int) -> List[List[str]]:
+    """
+    Splits `paths` into at most `n_chunks` contiguous runs of roughly equal
+    byte size. Keeping runs contiguous and merging them in order preserves
+    the serial scan's first-seen key order.
+    """
+    target = max(1, sum(sizes) // n_chunks)
+    chunks: List[List[str]] = []
+    cur: List[str] = []
+    cur_bytes = 0
+    for path, size in zip(paths, sizes):
+        cur.append(path)
+        cur_bytes += size
+        if cur_bytes >= target and len(chunks) < n_chunks - 1:
+            chunks.append(cur)
+            cur, cur_bytes = [], 0
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+def file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def resolve_jobs(jobs: int) -> int:
+    """0 (or less) means one job per CPU."""
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+
+def scan_files_parallel(paths: List[str], gt: Dict, jobs: int,
+                        cache: Optional[FileCache] = None,
+                        max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+                        skipped: Optional[List[Dict]] = None,
+                        timer: Optional[PhaseTimer] = None,
+                        index: Optional[TokenIndex] = None) -> Dict[str, Counter]:
+    """
+    With a `timer`, the workers' read/scan times are summed, so they can
+    exceed the wall time of the parallel scan. Workers build their own token
+    indexes, which are appended to `index` in chunk order.
+    """
+    sizes = [file_size(p) for p in paths]
+    if jobs <= 1 or len(paths) < 2 or sum(sizes) < PARALLEL_MIN_BYTES:
+        return scan_files(paths, gt, cache, max_file_bytes, skipped, timer, index)
+
+    chunks = chunk_by_size(paths, sizes, jobs * CHUNKS_PER_JOB)
+    totals = new_totals()
+    # Each worker opens its own connection to the shared cache database.
+    cache_args = (cache.path, cache.max_bytes) if cache else (None, 0)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks)),
+                             initializer=_init_scan_worker,
+                             initargs=(gt, *cache_args, max_file_bytes, index is not None)) as pool:
+        # map() yields in submission order, so the merge is deterministic
+        for partial, stats, chunk_skipped, chunk_timings, chunk_index in pool.map(_scan_chunk, chunks):
+            merge_file_counts(totals, partial)
+            if index is not None:
+                index.extend(chunk_index)
+            if skipped is not None:
+                skipped.extend(chunk_skipped)
+            if timer is not None:
+                timer.merge(chunk_timings)
+            if cache:
+                cache.hits += stats['hits']
+                cache.misses += stats['misses']
+    return totals
+
+
+# ----------------------------
+# Core parsing routine
+# ----------------------------
+
+def parse_repo(repo_root: Union[str, BinaryIO], features_path: str, gt: Optional[Dict] = None,
+               jobs: int = 1, file_cache: Optional[str] = None,
+               file_cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+               max_file_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+               timer: Optional[PhaseTimer] = None,
+               token_index: Optional[TokenIndex] = None,
+               elf: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Scans `repo_root` and returns the aggregated counts. Long-lived callers
+    can pass an already loaded feature index as `gt` to skip reloading it.
+
+    `repo_root` is a directory, the path of a tar/zip archive, or a binary
+    file object holding one (stdin, an upload). Archives are read as a
+    stream, member by member, with the same path filtering as iter_files;
+    nothing is extracted to disk and they are always scanned serially.
+    Anything else (a plain file, a corrupt archive) raises ArchiveError.
+
+    With jobs > 1 (0 = one per CPU) files are scanned by a process pool; the
+    output is identical to the serial scan. Small repos are always scanned
+    serially.
+
+    `file_cache` is the path of a shared per-file result cache (see
+    file_cache.py); when given, the output gains a 'file_cache' entry with
+    hit/miss counts.
+
+    Files over `max_file_bytes` (None = no limit) and binaries are not
+    scanned; they are listed under 'skipped_files' as {'path', 'reason',
+    'size'} with repo-relative paths. The key is omitted when nothing was
+    skipped. With `elf`, object files are candidates too and are read as
+    compiled BPF objects; ones that are not (host objects, corrupt files)
+    are skipped as 'not_bpf' or 'bad_object'.
+
+    A `timer` (see timing.py) receives the load/walk/read/scan phase times
+    and the files_scanned, bytes_read and file cache counters.
+
+    A `token_index` (see token_index.py) receives every scanned file's
+    tokens and SEC strings, plus the skipped files, so recount.py can
+    recompute this output later without the repo. Indexing bypasses the
+    file cache.
+    """
+    if timer is None:
+        timer = PhaseTimer()
+    if gt is None:
+        with timer.phase('load_index'):
+            gt = load_feature_sets(features_path)
+
+    if token_index is not None:
+        file_cache = None
+    cache = FileCache(file_cache, gt['hash'], file_cache_max_bytes) if file_cache else None
+    try:
+        jobs = resolve_jobs(jobs)
+        include_exts = include_exts_for(elf)
+
+        def is_candidate(relpath: str) -> bool:
+            return is_candidate_path(relpath, include_exts)
+
+        skipped: List[Dict] = []
+        if not isinstance(repo_root, str):
+            members = iter_archive(repo_root, is_candidate, max_file_bytes)
+            totals = scan_contents(members, gt, cache, max_file_bytes, skipped, timer, token_index)
+        elif os.path.isfile(repo_root):
+            try:
+                with open(repo_root, 'rb') as f:
+                    members = iter_archive(f, is_candidate, max_file_bytes)
+                    totals = scan_contents(members, gt, cache, max_file_bytes, skipped, timer, token_index)
+            except ArchiveError as e:
+                raise ArchiveError(f"{repo_root} is not a directory or a readable tar/zip archive ({e})") from e
+        else:
+            if jobs > 1:
+                with timer.phase('walk'):
+                    paths = list(iter_files(repo_root, include_exts))
+                totals = scan_files_parallel(paths, gt, jobs, cache, max_file_bytes, skipped, timer,
+                                             token_index)
+            else:
+                paths = timer.timed_iter(iter_files(repo_root, include_exts), 'walk')
+                totals = scan_files(paths, gt, cache, max_file_bytes, skipped, timer, token_index)
+            for entry in skipped:
+                entry['path'] = os.path.relpath(entry['path'], repo_root).replace(os.sep, '/')
+    finally:
+        if cache is not None:
+            cache.close()
+
+    results = format_results(totals)
+    if cache is not None:
+        results['file_cache'] = cache.stats()
+        timer.count('file_cache_hits', cache.hits)
+        timer.count('file_cache_misses', cache.misses)
+    if skipped:
+        results['skipped_files'] = skipped
+    if token_index is not None:
+        token_index.meta['skipped_files'] = skipped
+    return results
+
+
 def default_features_path(start_path: str) -> str:
     here = os.path.abspath(start_path)
     if os.path.isfile(here):
@@ -364,25 +824,60 @@ def default_features_path(start_path: str) -> str:
 
 def main(argv: Optional[List[str]] = None) -> int:
     ap = argparse.ArgumentParser(description="Parse an eBPF repository.")
-    ap.add_argument('--repo', required=True)
+    ap.add_argument('--repo', required=True,
+                    help="repository directory, tar/zip archive, or - to read an archive from stdin")
     ap.add_argument('--features', default=None)
     ap.add_argument('--json', action='store_true')
+    ap.add_argument('--jobs', type=int, default=1,
+                    help="scan files with N processes (0 = one per CPU); small repos stay serial")
+    ap.add_argument('--file-cache', nargs='?', const='', default=None, metavar='DB',
+                    help="reuse per-file results from a cache database (DB defaults to $EBPF_FILE_CACHE "
+                         "or ~/.cache/ebpfinsight); adds hit/miss counts to the output")
+    ap.add_argument('--file-cache-max-mb', type=int, default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024))
+    ap.add_argument('--no-file-cache', action='store_true', help="scan every file (the default)")
+    ap.add_argument('--max-file-mb', type=float, default=DEFAULT_MAX_FILE_BYTES / (1024 * 1024),
+                    help="skip (and list) files larger than this; 0 = no limit")
+    ap.add_argument('--elf', action='store_true',
+                    help="also analyze compiled BPF objects (*.o); host objects are listed as not_bpf")
+    ap.add_argument('--profile', action='store_true', help="print a per-phase timing breakdown to stderr")
+    ap.add_argument('--token-index', default=None, metavar='PATH',
+                    help="also write the repo's token index (see recount.py) to PATH")
     args = ap.parse_args(argv)
 
-    repo_root = os.path.abspath(args.repo)
-    if not os.path.isdir(repo_root):
-        print(f"Repository not found: {repo_root}", file=sys.stderr)
-        return 2
-
-    features_path = args.features or default_features_path(repo_root)
+    if args.repo == '-':
+        repo_root = sys.stdin.buffer
+        features_path = args.features or default_features_path(__file__)
+    else:
+        repo_root = os.path.abspath(args.repo)
+        if not os.path.exists(repo_root):
+            print(f"Repository not found: {repo_root}", file=sys.stderr)
+            return 2
+        features_path = args.features or default_features_path(repo_root)
     if not os.path.isfile(features_path):
         print(f"feature-versions.yaml not found at {features_path}", file=sys.stderr)
         return 2
 
-    results = parse_repo(repo_root, features_path)
+    file_cache = None
+    if args.file_cache is not None and not args.no_file_cache:
+        file_cache = args.file_cache or default_cache_path()
+    timer = PhaseTimer()
+    token_index = TokenIndex({'source': args.repo}) if args.token_index else None
+    try:
+        results = parse_repo(repo_root, features_path, jobs=args.jobs, file_cache=file_cache,
+                             file_cache_max_bytes=args.file_cache_max_mb * 1024 * 1024,
+                             max_file_bytes=int(args.max_file_mb * 1024 * 1024) or None,
+                             timer=timer, token_index=token_index, elf=args.elf)
+    except ArchiveError as e:
+        print(str(e) if args.repo != '-' else f"stdin: {e}", file=sys.stderr)
+        return 2
+    if token_index is not None:
+        with timer.phase('write_index'):
+            token_index.save(args.token_index)
 
     if args.json:
-        print(json.dumps(results, indent=2))
+        with timer.phase('serialize'):
+            out = json.dumps(results, indent=2)
+        print(out)
     else:
         def print_counter(title: str, d: Dict[str, int]) -> None:
             print(f"\n{title} ({sum(d.values())} occurrences, {len(d)} unique):")
@@ -399,7 +894,18 @@ def main(argv: Optional[List[str]] = None) -> int:
             print(f"  {pt}")
         print_counter('Program type tokens (BPF_PROG_TYPE_*)', results['program_types_tokens'])
         print_counter('SEC full', results['program_sections']['sec_full'])
-
+        for kind in EXTRA_TOKEN_KINDS:
+            print_counter(kind.replace('_', ' ').capitalize(), results[kind])
+        if 'file_cache' in results:
+            fc = results['file_cache']
+            print(f"\nFile cache: {fc['hits']} hits, {fc['misses']} misses")
+        if 'skipped_files' in results:
+            print(f"\nSkipped files ({len(results['skipped_files'])}):")
+            for entry in results['skipped_files']:
+                print(f"  {entry['path']}: {entry['reason']} ({entry['size']} bytes)")
+
+    if args.profile:
+        print(format_breakdown(timer.as_dict()), file=sys.stderr)
     return 0
 
 
@@ -0,0 +1,67 @@
+"""
+Prometheus metrics for repo-organizer
+
+Every finished analysis feeds its PhaseTimer breakdown (see timing.py)
+into these metrics; GET /metrics renders them in the text exposition
+format. Phase durations share one histogram labelled by phase (queue_wait,
+resolve, fetch, materialize, load_index, walk, read, scan, store,
+serialize, and similar for /similar lookups), so a dashboard can stack
+them to see where the time goes.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+PHASE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+                 120.0, 300.0)
+
+PHASE_SECONDS = Histogram(
+    "organizer_phase_seconds", "Time spent per analysis phase", ["phase"], buckets=PHASE_BUCKETS)
+ANALYSIS_SECONDS = Histogram(
+    "organizer_analysis_seconds", "End-to-end analysis time", ["kind"], buckets=PHASE_BUCKETS)
+FILES_SCANNED = Counter("organizer_files_scanned_total", "Files scanned by the analyzer")
+BYTES_READ = Counter("organizer_bytes_read_total", "Bytes of source read by the analyzer")
+CACHE_LOOKUPS = Counter(
+    "organizer_cache_lookups_total", "Cache lookups by cache and outcome", ["cache", "outcome"])
+JOBS_FINISHED = Counter("organizer_jobs_finished_total", "Finished jobs by outcome", ["outcome"])
+JOBS = Gauge("organizer_jobs", "Jobs currently queued or running", ["state"])
+SIMILARITY_UPDATES = Counter(
+    "organizer_similarity_updates_total", "Similarity index updates by outcome", ["outcome"])
+
+# PhaseTimer counter -> (metric, labels)
+_COUNTER_METRICS = {
+    "files_scanned": (FILES_SCANNED, None),
+    "bytes_read": (BYTES_READ, None),
+    "file_cache_hits": (CACHE_LOOKUPS, ("file", "hit")),
+    "file_cache_misses": (CACHE_LOOKUPS, ("file", "miss")),
+    "result_memo_hits": (CACHE_LOOKUPS, ("result_memo", "hit")),
+    "result_memo_misses": (CACHE_LOOKUPS, ("result_memo", "miss")),
+}
+
+
+def observe_timings(timings: Optional[Dict], kind: str) -> None:
+    """Records one analysis' as_dict() breakdown."""
+    if not timings:
+        return
+    ANALYSIS_SECONDS.labels(kind).observe(timings.get("total", 0.0))
+    for phase, seconds in timings.get("phases", {}).items():
+        PHASE_SECONDS.labels(phase).observe(seconds)
+    for name, n in timings.get("counters", {}).items():
+        metric, labels = _COUNTER_METRICS.get(name, (None, None))
+        if metric is None:
+            continue
+        (metric.labels(*labels) if labels else metric).inc(n)
+
+
+def observe_phase(phase: str, seconds: float) -> None:
+    PHASE_SECONDS.labels(phase).observe(seconds)
+
+
+def render(job_stats: Dict[str, int]) -> Tuple[bytes, str]:
+    """(body, content type) for GET /metrics."""
+    JOBS.labels("queued").set(job_stats.get("queued", 0))
+    JOBS.labels("running").set(job_stats.get("running", 0))
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,419 @@
+"""
+Mirror cache and commit-keyed result memo for repo-organizer
+
+Each repository URL gets a bare mirror under <cache_dir>/mirrors. A repeat
+analysis only fetches the new HEAD commit into the existing mirror
+(`git fetch --depth 1`) instead of cloning from scratch. The tree to scan is
+materialized from the mirror with `git archive`.
+
+Analysis results are memoized on disk under (commit SHA, feature index
+hash). The remote HEAD is resolved with `git ls-remote` before anything is
+fetched, so a request for an unchanged HEAD is answered from the memo.
+
+Mirrors are bounded by a disk quota. When the total size exceeds it, the
+least recently used mirrors that are not in use are deleted.
+
+In sparse mode the mirror is a blobless partial clone (`--filter=blob:none`):
+only commits and trees are fetched. The tree is then filtered with the
+analyzer's own candidate rules (include extensions, excluded directories),
+the missing candidate blobs are fetched in one batch, and only those files
+are written to the work directory. Images, datasets and vendored trees are
+never downloaded. In-tree symlinks are resolved against the tree, so a
+linked candidate is written with the content a checkout reads through it.
+Sparse and full mirrors of a URL are kept apart; the result memo is shared
+because both scan the same files with the same content.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import main as analyzer
+from incremental import BLOB_MODES, BlobReader
+from repo_fetch import Deadline, DeadlineExceeded, ensure_dir, kill_at_deadline, repo_name_from_url
+from timing import PhaseTimer
+
+DEFAULT_QUOTA_BYTES = 20 * 1024 * 1024 * 1024
+FETCH_MODES = ("full", "sparse")
+# Per-run entries of a scan's output; the memo keeps only what the commit determines
+RUN_KEYS = ("timings", "file_cache")
+LINK_MODE = "120000"
+# Symlinks followed while resolving one path, as the kernel's ELOOP limit
+MAX_LINK_HOPS = 40
+
+
+def run_git(args, cwd: Optional[str] = None, input: Optional[str] = None,
+            deadline: Optional[Deadline] = None, log: bool = False) -> str:
+    """Returns git's stdout, or with `log` its combined stdout and stderr."""
+    try:
+        proc = subprocess.run(["git", *args], cwd=cwd, input=input, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT if log else subprocess.PIPE, text=True,
+                              timeout=deadline.remaining() if deadline else None)
+    except subprocess.TimeoutExpired:
+        raise deadline.exceeded()
+    if proc.returncode != 0:
+        raise RuntimeError(f"git {args[0]} failed: {(proc.stdout if log else proc.stderr).strip()}")
+    return proc.stdout
+
+
+def dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for fn in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, fn)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _skip_unsafe(member: tarfile.TarInfo, dest: str) -> Optional[tarfile.TarInfo]:
+    # Links pointing outside the tree are dropped rather than failing the
+    # whole extraction; they are never scanned from a normal checkout either.
+    try:
+        return tarfile.data_filter(member, dest)
+    except tarfile.FilterError:
+        return None
+
+
+def extract_tree(mirror_dir: str, sha: str, dest: str, deadline: Optional[Deadline] = None) -> int:
+    """
+    Writes the tree of `sha` into `dest` without a checkout or index.
+    Returns the number of files written.
+    """
+    proc = subprocess.Popen(["git", "--git-dir", mirror_dir, "archive", "--format=tar", sha],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    written = 0
+
+    def count_files(member: tarfile.TarInfo, path: str) -> Optional[tarfile.TarInfo]:
+        nonlocal written
+        member = _skip_unsafe(member, path)
+        if member is not None and member.isfile():
+            written += 1
+        return member
+
+    try:
+        with kill_at_deadline(proc.kill, deadline), \
+                tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+            tar.extractall(dest, filter=count_files)
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode(errors="replace")
+        proc.stderr.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError(f"git archive failed: {stderr.strip()}")
+    return written
+
+
+def tree_entries(mirror_dir: str, sha: str, deadline: Optional[Deadline] = None) -> Dict[str, Tuple[str, str]]:
+    """path -> (mode, object sha) of every file, symlink and submodule in `sha`."""
+    entries = {}
+    raw = run_git(["ls-tree", "-r", "-z", sha], cwd=mirror_dir, deadline=deadline)
+    for entry in raw.split("\0"):
+        if not entry:
+            continue
+        meta, path = entry.split("\t", 1)
+        mode, _, obj = meta.split()
+        entries[path] = (mode, obj)
+    return entries
+
+
+def resolve_path(entries: Dict[str, Tuple[str, str]], links: Dict[str, str], path: str) -> Optional[str]:
+    """
+    The regular file `path` names in a checkout, following in-tree symlinks
+    (`links`: path -> link target) in any component, as the OS would. None
+    when it dangles, loops, leaves the tree or is not a regular file;
+    extract_tree drops links leaving the tree, and parse_repo skips the rest.
+    """
+    pending = path.split("/")
+    resolved: List[str] = []
+    hops = 0
+    while pending:
+        part = pending.pop(0)
+        if part in ("", "."):
+            continue
+        if part == "..":
+            if not resolved:
+                return None
+            resolved.pop()
+            continue
+        resolved.append(part)
+        target = links.get("/".join(resolved))
+        if target is not None:
+            hops += 1
+            if hops > MAX_LINK_HOPS or target.startswith("/"):
+                return None
+            resolved.pop()
+            pending = target.split("/") + pending
+    key = "/".join(resolved)
+    return key if entries.get(key, ("",))[0] in BLOB_MODES else None
+
+
+def candidate_blobs(entries: Dict[str, Tuple[str, str]], links: Dict[str, str]) -> List[Tuple[str, str]]:
+    """
+    (path, blob sha) of the files parse_repo would read. A symlinked
+    candidate gets the blob of the file it resolves to, which is what the
+    scan of a `git archive` tree reads through the link.
+    """
+    out = []
+    for path, (mode, blob) in entries.items():
+        if not analyzer.is_candidate_path(path):
+            continue
+        if mode == LINK_MODE:
+            target = resolve_path(entries, links, path)
+            if target is None:
+                continue
+            blob = entries[target][1]
+        elif mode not in BLOB_MODES:
+            continue
+        out.append((path, blob))
+    return out
+
+
+def missing_objects(mirror_dir: str, sha: str, deadline: Optional[Deadline] = None) -> Set[str]:
+    """Objects reachable from `sha` that a partial clone has not fetched yet."""
+    raw = run_git(["rev-list", "--objects", "--missing=print", sha], cwd=mirror_dir, deadline=deadline)
+    return {line[1:] for line in raw.splitlines() if line.startswith("?")}
+
+
+def fetch_blobs(mirror_dir: str, blobs: List[str], deadline: Optional[Deadline] = None) -> None:
+    """Fetches the given blobs from origin in a single request."""
+    if not blobs:
+        return
+    run_git(["-c", "fetch.negotiationAlgorithm=noop", "fetch", "-q", "origin", "--no-tags",
+             "--no-write-fetch-head", "--recurse-submodules=no", "--filter=blob:none", "--stdin"],
+            cwd=mirror_dir, input="\n".join(blobs) + "\n", deadline=deadline)
+
+
+def materialize_candidates(mirror_dir: str, sha: str, dest: str,
+                           deadline: Optional[Deadline] = None) -> int:
+    """
+    Writes only the analyzer's candidate files of `sha` into `dest`,
+    fetching the blobs a blobless mirror does not have yet. Symlinked
+    candidates are written as copies of the files they resolve to. Returns
+    the number of files written.
+    """
+    entries = tree_entries(mirror_dir, sha, deadline)
+    missing = missing_objects(mirror_dir, sha, deadline)
+    # Link targets are read first: a link's file may be no candidate itself
+    link_blobs = {path: blob for path, (mode, blob) in entries.items() if mode == LINK_MODE}
+    links: Dict[str, str] = {}
+    if link_blobs:
+        fetch_blobs(mirror_dir, sorted({blob for blob in link_blobs.values() if blob in missing}), deadline)
+        with BlobReader(mirror_dir) as reader, kill_at_deadline(reader.kill, deadline):
+            links = {path: reader.read(blob).decode("utf-8", "surrogateescape")
+                     for path, blob in link_blobs.items()}
+    files = candidate_blobs(entries, links)
+    fetch_blobs(mirror_dir, sorted({blob for _, blob in files if blob in missing}), deadline)
+
+    root = os.path.realpath(dest)
+    with BlobReader(mirror_dir) as reader, kill_at_deadline(reader.kill, deadline):
+        for path, blob in files:
+            target = os.path.realpath(os.path.join(root, path))
+            if not target.startswith(root + os.sep):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(reader.read(blob))
+    return len(files)
+
+
+class MirrorCache:
+    def __init__(self, cache_dir: str, quota_bytes: int = DEFAULT_QUOTA_BYTES):
+        self.mirror_dir = os.path.join(cache_dir, "mirrors")
+        self.results_dir = os.path.join(cache_dir, "results")
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._in_use: Set[str] = set()
+
+    # ----------------------------
+    # Mirrors
+    # ----------------------------
+
+    def mirror_path(self, repo_url: str, sparse: bool = False) -> str:
+        key = hashlib.sha1(repo_url.encode()).hexdigest()[:16]
+        suffix = "-sparse" if sparse else ""
+        return os.path.join(self.mirror_dir, f"{repo_name_from_url(repo_url)}-{key}{suffix}.git")
+
+    @staticmethod
+    def resolve_head(repo_url: str, deadline: Optional[Deadline] = None) -> str:
+        out = run_git(["ls-remote", repo_url, "HEAD"], deadline=deadline)
+        if not out.strip():
+            raise RuntimeError(f"could not resolve HEAD of {repo_url}")
+        return out.split()[0]
+
+    def update_mirror(self, repo_url: str, sparse: bool = False,
+                      deadline: Optional[Deadline] = None) -> Tuple[str, str, str]:
+        """Fetches the remote HEAD into the URL's mirror; returns (mirror, sha, fetch log)."""
+        path = self.mirror_path(repo_url, sparse)
+        if not os.path.isdir(path):
+            ensure_dir(self.mirror_dir)
+            tmp = tempfile.mkdtemp(prefix=".init-", dir=self.mirror_dir)
+            run_git(["init", "--bare", "-q", tmp])
+            run_git(["remote", "add", "origin", repo_url], cwd=tmp)
+            if sparse:
+                run_git(["config", "remote.origin.promisor", "true"], cwd=tmp)
+                run_git(["config", "remote.origin.partialclonefilter", "blob:none"], cwd=tmp)
+            os.replace(tmp, path)
+        fetch = ["fetch", "--no-progress", "--depth", "1"]
+        if sparse:
+            fetch.append("--filter=blob:none")
+        fetch_log = run_git([*fetch, "origin", "+HEAD:refs/heads/head"], cwd=path, deadline=deadline, log=True)
+        sha = run_git(["rev-parse", "refs/heads/head"], cwd=path).strip()
+        os.utime(path)
+        return path, sha, fetch_log
+
+    def enforce_quota(self) -> None:
+        """Deletes least recently used mirrors until under the quota."""
+        if not os.path.isdir(self.mirror_dir):
+            return
+        mirrors = []
+        for name in os.listdir(self.mirror_dir):
+            path = os.path.join(self.mirror_dir, name)
+            if name.endswith(".git") and os.path.isdir(path):
+                mirrors.append((os.stat(path).st_mtime, path, dir_size(path)))
+        total = sum(size for _, _, size in mirrors)
+        for _, path, size in sorted(mirrors):
+            if total <= self.quota_bytes:
+                break
+            with self._lock:
+                if path in self._in_use:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    # ----------------------------
+    # Result memo
+    # ----------------------------
+
+    def _result_path(self, sha: str, index_hash: str) -> str:
+        return os.path.join(self.results_dir, index_hash[:16], f"{sha}.json")
+
+    def get_result(self, sha: str, index_hash: str) -> Optional[Dict]:
+        try:
+            with open(self._result_path(sha, index_hash), "r", encoding="utf-8") as f:
+                results = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Entries written before RUN_KEYS was applied may still carry them
+        return {k: v for k, v in results.items() if k not in RUN_KEYS}
+
+    def put_result(self, sha: str, index_hash: str, results: Dict) -> None:
+        """Stores `results` without its RUN_KEYS, which describe the run that produced it."""
+        path = self._result_path(sha, index_hash)
+        ensure_dir(os.path.dirname(path))
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in results.items() if k not in RUN_KEYS}, f)
+        os.replace(tmp, path)
+
+    # ----------------------------
+    # Request entry point
+    # ----------------------------
+
+    def analyze(self, repo_url: str, index_hash: str, scan: Callable[[str], Dict],
+                workdir_base: str, keep: bool = False, fetch: str = "full",
+                clone_timeout: Optional[float] = None,
+                on_phase: Optional[Callable[[str], None]] = None,
+                timer: Optional[PhaseTimer] = None) -> Dict:
+        """
+        Returns {"commit", "cached", "results", "repo_path", "fetch",
+        "clone_log"} for the remote HEAD of `repo_url`. `fetch` is "full" or
+        "sparse"; the "fetch" entry reports the mode, bytes added to the
+        mirror and files written to the work directory. "clone_log" is the
+        output of the mirror fetch, empty when the memo answered without
+        one. Concurrent calls for the same URL and mode share one job.
+
+        Every git step until the tree is on disk (ls-remote, fetch, archive
+        or blob materialization) shares one `clone_timeout` deadline; the
+        scan's deadline is up to `scan`. `on_phase` is called with
+        "scanning" once the tree is ready. A `timer` receives the resolve,
+        fetch, materialize and store phase times.
+        """
+        if fetch not in FETCH_MODES:
+            raise ValueError(f"fetch must be one of {', '.join(FETCH_MODES)}")
+        job = (repo_url, fetch)
+        with self._lock:
+            fut = self._inflight.get(job)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._inflight[job] = fut
+        if not owner:
+            return dict(fut.result())
+
+        try:
+            out = self._analyze(repo_url, index_hash, scan, workdir_base, keep, fetch == "sparse",
+                                Deadline(clone_timeout, "clone"), on_phase, timer or PhaseTimer())
+            fut.set_result(out)
+            return out
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(job, None)
+
+    def _analyze(self, repo_url: str, index_hash: str, scan: Callable[[str], Dict],
+                 workdir_base: str, keep: bool, sparse: bool, deadline: Deadline,
+                 on_phase: Optional[Callable[[str], None]], timer: PhaseTimer) -> Dict:
+        fetch_stats = {"mode": "sparse" if sparse else "full", "bytes_fetched": 0, "files_materialized": 0}
+        with timer.phase("resolve"):
+            sha = self.resolve_head(repo_url, deadline)
+            cached = self.get_result(sha, index_hash)
+        timer.count("result_memo_hits" if cached is not None else "result_memo_misses")
+        if cached is not None and not keep:
+            return {"commit": sha, "cached": True, "results": cached, "repo_path": None,
+                    "fetch": fetch_stats, "clone_log": ""}
+
+        path = self.mirror_path(repo_url, sparse)
+        with self._lock:
+            self._in_use.add(path)
+        try:
+            objects = os.path.join(path, "objects")
+            size_before = dir_size(objects)
+            try:
+                with timer.phase("fetch"):
+                    _, sha, fetch_log = self.update_mirror(repo_url, sparse, deadline)
+            except DeadlineExceeded:
+                # A killed fetch can leave lock files behind; start over next time.
+                shutil.rmtree(path, ignore_errors=True)
+                raise
+            ensure_dir(workdir_base)
+            workdir = tempfile.mkdtemp(prefix=f"{repo_name_from_url(repo_url)}_{sha[:12]}_", dir=workdir_base)
+            try:
+                with timer.phase("materialize"):
+                    if sparse:
+                        written = materialize_candidates(path, sha, workdir, deadline)
+                    else:
+                        written = extract_tree(path, sha, workdir, deadline)
+                fetch_stats["bytes_fetched"] = max(0, dir_size(objects) - size_before)
+                fetch_stats["files_materialized"] = written
+                results = cached if cached is not None else self.get_result(sha, index_hash)
+                was_cached = results is not None
+                if results is None:
+                    if on_phase:
+                        on_phase("scanning")
+                    results = scan(workdir)
+                    with timer.phase("store"):
+                        self.put_result(sha, index_hash, results)
+            finally:
+                if not keep:
+                    shutil.rmtree(workdir, ignore_errors=True)
+        finally:
+            with self._lock:
+                self._in_use.discard(path)
+        self.enforce_quota()
+        return {"commit": sha, "cached": was_cached, "results": results,
+                "repo_path": workdir if keep else None, "fetch": fetch_stats, "clone_log": fetch_log}
@@ -0,0 +1,125 @@
+"""
+Bounded-memory file reader
+
+Files larger than one chunk are memory-mapped instead of read into a bytes
+object, and the scanner walks the mapping in chunks of about CHUNK_BYTES.
+Chunks only end right after a ';' or '}' byte. Neither can occur inside
+an identifier run or its `\\s*(` tail, and both are ASCII, so no token and
+no UTF-8 sequence (or \\r\\n pair) ever straddles two chunks. Scanning the
+chunks in order gives exactly the matches of scanning the whole file.
+
+Before anything is scanned, two policies apply:
+ - files larger than the size limit are skipped ("too_large")
+ - files with a NUL byte in their first SNIFF_BYTES are skipped as
+   binaries ("binary"), the same heuristic git uses.
+Skipped files are reported by parse_repo instead of silently dropped.
+
+Compiled BPF objects are binaries by design; they are opened with
+`binary=True`, which skips the sniff and always maps the file, so the
+ELF reader (see bpf_elf.py) parses it in place.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple, Union
+
+Buffer = Union[bytes, mmap.mmap]
+
+DEFAULT_MAX_FILE_BYTES = 32 * 1024 * 1024
+CHUNK_BYTES = 1024 * 1024
+SNIFF_BYTES = 8000
+
+# Bytes a chunk may end after; see the module docstring.
+CHUNK_DELIMS = (b';', b'}')
+
+
+class SkipFile(Exception):
+    """Raised by open_buffer for files the size or binary policy rejects."""
+
+    def __init__(self, reason: str, size: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.size = size
+
+
+def looks_binary(buf: Buffer) -> bool:
+    return buf.find(b'\0', 0, SNIFF_BYTES) != -1
+
+
+def skip_reason(buf: Buffer, size: int, max_bytes: Optional[int],
+                binary: bool = False) -> Optional[str]:
+    """The policy check for content that is already in memory (archives, blobs)."""
+    if max_bytes and size > max_bytes:
+        return 'too_large'
+    if not binary and looks_binary(buf):
+        return 'binary'
+    return None
+
+
+@contextmanager
+def open_buffer(path: str, max_bytes: Optional[int] = DEFAULT_MAX_FILE_BYTES,
+                binary: bool = False) -> Iterator[Buffer]:
+    """
+    Yields the file's content: bytes for files up to one chunk, a read-only
+    mmap for larger ones (and for any non-empty file with `binary`). Raises
+    SkipFile for files the policy rejects and OSError for unreadable ones.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if max_bytes and size > max_bytes:
+            raise SkipFile('too_large', size)
+        if binary:
+            if not size:
+                yield b''
+                return
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mm
+            finally:
+                mm.close()
+            return
+        if size <= CHUNK_BYTES:
+            buf: Buffer = f.read()
+            if looks_binary(buf):
+                raise SkipFile('binary', size)
+            yield buf
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if looks_binary(mm):
+                raise SkipFile('binary', size)
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield mm
+        finally:
+            mm.close()
+
+
+def release_pages(buf: Buffer, start: int, end: int) -> None:
+    """Drops the scanned pages of a mapping so RSS stays around one chunk."""
+    if not isinstance(buf, mmap.mmap):
+        return
+    first = start - start % mmap.PAGESIZE
+    last = end - end % mmap.PAGESIZE
+    if last > first:
+        buf.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+
+def iter_chunks(buf: Buffer, chunk_bytes: int = CHUNK_BYTES) -> Iterator[Tuple[int, int]]:
+    """(start, end) offsets covering `buf`, split only after CHUNK_DELIMS."""
+    size = len(buf)
+    start = 0
+    while start < size:
+        end = start + chunk_bytes
+        if end >= size:
+            yield start, size
+            return
+        cut = max(buf.rfind(d, start, end) for d in CHUNK_DELIMS)
+        if cut == -1:
+            # No delimiter in this window; take the next one after it.
+            found = [p for p in (buf.find(d, end) for d in CHUNK_DELIMS) if p != -1]
+            cut = min(found) if found else size - 1
+        yield start, cut + 1
+        start = cut + 1
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Recount a corpus from its token indexes
+
+Recomputes the full parse_repo output of every repository that has a
+token index (written by `main.py --token-index` or `batch.py
+--token-index-dir`, see token_index.py) under the current feature YAML,
+without cloning or reading any repository. After the YAML gains helpers or
+kfuncs, this refreshes a whole corpus in seconds.
+
+The output is one JSON line per index, in the same shape as batch.py:
+
+  {"source": ..., "results": {...parse_repo output...}}
+
+Usage:
+  python recount.py <index file or directory>... [--features <path>] [--output results.jsonl]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+import main as analyzer
+from token_index import SUFFIX, TokenIndex, TokenIndexError
+
+
+def recount_index(index: TokenIndex, gt: Dict) -> Dict:
+    """The parse_repo output for the repo `index` was built from, under `gt`."""
+    totals = analyzer.new_totals()
+    for keys, secs in index.iter_files():
+        analyzer.merge_file_counts(totals, analyzer.count_file(keys, None, gt, secs=secs))
+    results = analyzer.format_results(totals)
+    skipped = index.meta.get('skipped_files')
+    if skipped:
+        results['skipped_files'] = skipped
+    return results
+
+
+def iter_index_paths(paths: Iterable[str]) -> Iterable[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(SUFFIX):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Recompute parse_repo output from token indexes.")
+    ap.add_argument('paths', nargs='+', help="token index files or directories of them")
+    ap.add_argument('--features', default=None)
+    ap.add_argument('--output', default='-', help="JSONL output file (default: stdout)")
+    args = ap.parse_args(argv)
+
+    features_path = args.features or analyzer.default_features_path(__file__)
+    if not os.path.isfile(features_path):
+        print(f"feature-versions.yaml not found at {features_path}", file=sys.stderr)
+        return 2
+    gt = analyzer.load_feature_sets(features_path)
+
+    start = time.perf_counter()
+    repos = files = failed = 0
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        for path in iter_index_paths(args.paths):
+            try:
+                index = TokenIndex.load(path)
+            except (OSError, ValueError, TokenIndexError) as e:
+                print(f"{path}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            record = {'source': index.meta.get('source', path), 'results': recount_index(index, gt)}
+            out.write(json.dumps(record) + '\n')
+            repos += 1
+            files += index.files
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"recounted {repos} repos ({files} files) in {time.perf_counter() - start:.2f} s"
+          + (f", {failed} unreadable" if failed else ""), file=sys.stderr)
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
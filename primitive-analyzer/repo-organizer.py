@@ -1,71 +1,154 @@
-import json
+import atexit
 import os
 import re
-import shutil
-import subprocess
-import tempfile
+import sys
 import time
-from typing import Tuple
+from concurrent.futures import TimeoutError as FutureTimeout
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from archives import ArchiveError  # noqa: E402
+from feature_index import feature_index_hash  # noqa: E402
+from file_cache import default_cache_path  # noqa: E402
+from jobs import PRIORITIES, JobQueue, QueueFull  # noqa: E402
+import metrics  # noqa: E402
+from mirror_cache import DEFAULT_QUOTA_BYTES, FETCH_MODES, MirrorCache  # noqa: E402
+from repo_fetch import DeadlineExceeded  # noqa: E402
+from similarity import SimilarityIndex  # noqa: E402
+from timing import PhaseTimer  # noqa: E402
+from workers import AnalyzerPool  # noqa: E402
 
 app = Flask(__name__)
 
 # Accept broader git URLs, not only GitHub
 GIT_URL_RE = re.compile(r"^https?://.+/.+/.+(\.git)?/?$")
+# file:// URLs (local bare repos) are only accepted when explicitly enabled
+ALLOW_FILE_URLS = os.environ.get("ALLOW_FILE_URLS") == "1"
+FILE_URL_RE = re.compile(r"^file:///.+")
 CLONE_BASE = os.environ.get("CLONE_BASE", "/tmp/repos")
-APP_DIR = os.path.dirname(os.path.abspath(__file__))
-MAIN_PY = os.path.join(APP_DIR, "main.py")
 FEATURES_YAML = os.path.join(APP_DIR, "data", "feature-versions.yaml")
+# Number of warm analyzer processes, i.e. how many repos are scanned at once
+ANALYZER_WORKERS = int(os.environ.get("ANALYZER_WORKERS", "0")) or None
+# Per-file result cache shared by all workers; EBPF_FILE_CACHE=off disables it
+FILE_CACHE = None if os.environ.get("EBPF_FILE_CACHE") == "off" else default_cache_path()
 
+# Bare mirrors plus results memoized per (commit, feature index)
+MIRROR_CACHE_DIR = os.environ.get("MIRROR_CACHE_DIR", os.path.join(CLONE_BASE, "cache"))
+MIRROR_QUOTA_BYTES = int(os.environ.get("MIRROR_QUOTA_MB", "0")) * 1024 * 1024 or DEFAULT_QUOTA_BYTES
+# "sparse" fetches only the files the analyzer reads; per request via "fetch"
+FETCH_MODE = os.environ.get("FETCH_MODE", "full")
+# Largest accepted archive upload for /analyze-archive
+ARCHIVE_MAX_BYTES = int(os.environ.get("ARCHIVE_MAX_MB", "512")) * 1024 * 1024
+# Clone/analyze jobs: concurrent jobs, queue bound, and per-phase deadlines (seconds, 0 = none)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "1000"))
+JOB_KEEP_SECONDS = float(os.environ.get("JOB_KEEP_SECONDS", "3600"))
+CLONE_TIMEOUT = float(os.environ.get("CLONE_TIMEOUT", "300")) or None
+SCAN_TIMEOUT = float(os.environ.get("SCAN_TIMEOUT", "300")) or None
+# Similar-repo index fed by every finished analysis (see similarity.py); "off" disables it.
+# It is saved every SIMILARITY_SAVE_EVERY changed repos and at exit.
+SIMILARITY_INDEX = os.environ.get("SIMILARITY_INDEX", os.path.join(MIRROR_CACHE_DIR, "similarity.npz"))
+SIMILARITY_SAVE_EVERY = int(os.environ.get("SIMILARITY_SAVE_EVERY", "50"))
+SIMILAR_MAX_K = 100
 
-def ensure_dir(path: str) -> None:
-    os.makedirs(path, exist_ok=True)
-
-
-def clone_repo(repo_url: str) -> Tuple[str, str]:
-    ensure_dir(CLONE_BASE)
-    ts = int(time.time())
-    repo_name = repo_url.rstrip("/").split("/")[-1]
-    if repo_name.endswith(".git"):
-        repo_name = repo_name[:-4]
-    dest = os.path.join(CLONE_BASE, f"{repo_name}_{ts}")
-    cmd = [
-        "git",
-        "clone",
-        "--depth",
-        "1",
-        repo_url,
-        dest,
-    ]
-    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if proc.returncode != 0:
-        raise RuntimeError(f"git clone failed: {proc.stderr.strip()}")
-    return dest, proc.stdout
-
-
-def run_analyzer(repo_path: str, json_output: bool = True):
-    # Call the existing CLI without modifying its logic
-    cmd = [
-        "python",
-        MAIN_PY,
-        "--repo",
-        repo_path,
-        "--features",
-        FEATURES_YAML,
-    ]
-    if json_output:
-        cmd.append("--json")
-    proc = subprocess.run(cmd, cwd=APP_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if proc.returncode != 0:
-        raise RuntimeError(proc.stderr.strip() or f"analyzer failed with code {proc.returncode}")
-    if json_output:
-        try:
-            return json.loads(proc.stdout)
-        except json.JSONDecodeError:
-            # If not valid JSON, return raw text
-            return {"raw": proc.stdout}
-    return {"raw": proc.stdout}
+analyzer_pool = AnalyzerPool(FEATURES_YAML, workers=ANALYZER_WORKERS, file_cache=FILE_CACHE)
+mirror_cache = MirrorCache(MIRROR_CACHE_DIR, quota_bytes=MIRROR_QUOTA_BYTES)
+
+
+def open_similarity_index():
+    if SIMILARITY_INDEX == "off":
+        return None
+    try:
+        return SimilarityIndex.open(SIMILARITY_INDEX)
+    except (OSError, ValueError) as e:
+        # Unreadable or from another version: analyses rebuild it from scratch
+        print(f"similarity index {SIMILARITY_INDEX} not loaded, starting empty: {e}", file=sys.stderr)
+        return SimilarityIndex()
+
+
+def save_similarity_index(min_changes: int = 1):
+    if similarity_index is None or similarity_index.dirty < min_changes:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(SIMILARITY_INDEX)), exist_ok=True)
+    similarity_index.save(SIMILARITY_INDEX)
+
+
+similarity_index = open_similarity_index()
+atexit.register(save_similarity_index)
+
+
+def valid_repo_url(repo_url: str) -> bool:
+    if GIT_URL_RE.match(repo_url):
+        return True
+    return ALLOW_FILE_URLS and bool(FILE_URL_RE.match(repo_url))
+
+
+def run_analyzer(repo_path: str, timer: PhaseTimer):
+    # Scan in one of the warm worker processes; results come back as a dict
+    try:
+        results = analyzer_pool.analyze(repo_path, timeout=SCAN_TIMEOUT)
+    except FutureTimeout:
+        # The worker keeps going, but the tree is deleted under it right
+        # after this, so the abandoned scan ends quickly.
+        raise DeadlineExceeded(f"scan phase exceeded its {SCAN_TIMEOUT:g}s deadline")
+    # The worker's breakdown and file cache stats belong to this request, not
+    # to the memoized results; the stats are already in the timer's counters
+    timer.merge(results.pop("timings", None))
+    results.pop("file_cache", None)
+    return results
+
+
+def run_job(params, set_phase):
+    timer = PhaseTimer()
+    timer.add("queue_wait", max(0.0, time.time() - params["submitted_at"]))
+    try:
+        out = mirror_cache.analyze(
+            params["repo_url"],
+            feature_index_hash(FEATURES_YAML),
+            lambda repo_path: run_analyzer(repo_path, timer),
+            CLONE_BASE,
+            keep=params["keep"],
+            fetch=params["fetch"],
+            clone_timeout=CLONE_TIMEOUT,
+            on_phase=set_phase,
+            timer=timer,
+        )
+    except Exception:
+        metrics.JOBS_FINISHED.labels("failed").inc()
+        metrics.observe_timings(timer.as_dict(), "repo")
+        raise
+    metrics.JOBS_FINISHED.labels("done").inc()
+    if similarity_index is not None:
+        # A re-analyzed repo replaces its previous feature set
+        metrics.SIMILARITY_UPDATES.labels(similarity_index.update(params["repo_url"], out["results"])).inc()
+        save_similarity_index(SIMILARITY_SAVE_EVERY)
+    timings = timer.as_dict()
+    metrics.observe_timings(timings, "repo")
+    return {
+        "repo_path": out["repo_path"],
+        "clone_log": out["clone_log"],
+        "commit": out["commit"],
+        "cached": out["cached"],
+        "results": out["results"],
+        "fetch": out["fetch"],
+        "timings": timings,
+    }
+
+
+job_queue = JobQueue(run_job, workers=JOB_WORKERS, max_queued=JOB_QUEUE_MAX,
+                     keep_seconds=JOB_KEEP_SECONDS)
+
+
+def timed_jsonify(payload):
+    """jsonify, with the serialization time recorded as the "serialize" phase."""
+    start = time.perf_counter()
+    resp = jsonify(payload)
+    metrics.observe_phase("serialize", time.perf_counter() - start)
+    return resp
 
 
 @app.route("/healthz", methods=["GET"])
@@ -73,41 +156,160 @@ def healthz():
     return jsonify({"status": "ok"})
 
 
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    body, content_type = metrics.render(job_queue.stats())
+    return Response(body, content_type=content_type)
+
+
+def parse_job_request(body):
+    """Validates a clone-and-analyze body; returns (params, None) or (None, error response)."""
+    repo_url = body.get("repo_url")
+    if not repo_url or not isinstance(repo_url, str):
+        return None, (jsonify({"error": "repo_url is required"}), 400)
+    if not valid_repo_url(repo_url.strip()):
+        return None, (jsonify({"error": "repo_url must be a valid git URL (https://host/owner/repo[.git])"}), 400)
+    fetch = body.get("fetch", FETCH_MODE)
+    if fetch not in FETCH_MODES:
+        return None, (jsonify({"error": f"fetch must be one of: {', '.join(FETCH_MODES)}"}), 400)
+    return {"repo_url": repo_url.strip(), "fetch": fetch, "keep": bool(body.get("keep", False)),
+            "submitted_at": time.time()}, None
+
+
+def job_status(job):
+    status = {
+        "job_id": job["id"],
+        "phase": job["phase"],
+        "priority": job["priority"],
+        "repo_url": job["params"]["repo_url"],
+        "submitted_at": job["submitted_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["phase"] == "done":
+        status["result"] = job["result"]
+    elif job["phase"] == "failed":
+        status["error"] = job["error"]
+    return status
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    body = request.get_json(silent=True) or {}
+    params, error = parse_job_request(body)
+    if error:
+        return error
+    priority = body.get("priority", "interactive")
+    if priority not in PRIORITIES:
+        return jsonify({"error": f"priority must be one of: {', '.join(PRIORITIES)}"}), 400
+    try:
+        job = job_queue.submit(params, priority)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    resp = job_status(job)
+    resp["status_url"] = f"/jobs/{job['id']}"
+    return jsonify(resp), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job id"}), 404
+    return timed_jsonify(job_status(job))
+
+
 @app.route("/clone-and-analyze", methods=["POST"])
 def clone_and_analyze():
+    # Synchronous form of POST /jobs: same queue, pool and deadlines.
     body = request.get_json(silent=True) or {}
-    repo_url = body.get("repo_url")
-    if not repo_url or not isinstance(repo_url, str):
-        return jsonify({"error": "repo_url is required"}), 400
-    if not GIT_URL_RE.match(repo_url.strip()):
-        return jsonify({"error": "repo_url must be a valid git URL (https://host/owner/repo[.git])"}), 400
+    params, error = parse_job_request(body)
+    if error:
+        return error
+    try:
+        job = job_queue.submit(params, "interactive")
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    job = job_queue.wait(job["id"])
+    if job["phase"] == "done":
+        return timed_jsonify(job["result"])
+    # Surface more diagnostic context
+    return jsonify({
+        "error": job["error"],
+        "repo_url": params["repo_url"],
+        "hint": "Ensure the repo is public and reachable; if private, provide credentials via URL."
+    }), 500
+
+
+@app.route("/analyze-archive", methods=["POST"])
+def analyze_archive():
+    """
+    Analyzes an uploaded tar/zip archive (e.g. `git archive` output) without
+    cloning or extracting it. Send it as the "archive" field of a multipart
+    form or as the raw request body.
+    """
+    if request.content_length is not None and request.content_length > ARCHIVE_MAX_BYTES:
+        return jsonify({"error": f"archive exceeds {ARCHIVE_MAX_BYTES // (1024 * 1024)} MB"}), 413
+    upload = request.files.get("archive")
+    data = upload.read() if upload is not None else request.get_data(cache=False)
+    if not data:
+        return jsonify({"error": "archive is required (multipart field 'archive' or request body)"}), 400
+    if len(data) > ARCHIVE_MAX_BYTES:
+        return jsonify({"error": f"archive exceeds {ARCHIVE_MAX_BYTES // (1024 * 1024)} MB"}), 413
 
-    keep = bool(body.get("keep", False))
     try:
-        repo_path, clone_stdout = clone_repo(repo_url.strip())
-        results = run_analyzer(repo_path, json_output=True)
-        resp = {
-            "repo_path": repo_path,
-            "clone_log": clone_stdout,
-            "results": results,
-        }
-        return jsonify(resp)
+        results = analyzer_pool.analyze_archive(data, timeout=SCAN_TIMEOUT)
+    except ArchiveError as e:
+        return jsonify({"error": str(e)}), 400
+    except FutureTimeout:
+        # The pool kills the worker still busy with it (see AnalyzerPool)
+        return jsonify({"error": f"scan phase exceeded its {SCAN_TIMEOUT:g}s deadline"}), 504
     except Exception as e:
-        # Surface more diagnostic context
-        return jsonify({
-            "error": str(e),
-            "repo_url": repo_url,
-            "hint": "Ensure the repo is public and reachable; if private, provide credentials via URL."
-        }), 500
-    finally:
-        if not keep:
-            try:
-                if 'repo_path' in locals() and os.path.isdir(repo_path):
-                    shutil.rmtree(repo_path, ignore_errors=True)
-            except Exception:
-                pass
+        return jsonify({"error": f"could not analyze archive: {e}"}), 500
+    timings = results.pop("timings", None)
+    metrics.observe_timings(timings, "archive")
+    return timed_jsonify({"results": results, "timings": timings})
+
+
+@app.route("/similar", methods=["GET", "POST"])
+def similar():
+    """
+    Repos with the most similar primitive feature sets (Jaccard index,
+    searched with MinHash/LSH; see similarity.py). GET with ?repo_url=
+    for an analyzed repo, or POST {"results": <parse_repo output>} for any
+    feature set. Both take k (default 10) and min_score (default 0).
+    """
+    if similarity_index is None:
+        return jsonify({"error": "the similarity index is disabled (SIMILARITY_INDEX=off)"}), 503
+    args = request.args if request.method == "GET" else (request.get_json(silent=True) or {})
+    try:
+        k = int(args.get("k", 10))
+        min_score = float(args.get("min_score", 0.0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "k must be an integer and min_score a number"}), 400
+    if not 1 <= k <= SIMILAR_MAX_K:
+        return jsonify({"error": f"k must be between 1 and {SIMILAR_MAX_K}"}), 400
+
+    start = time.perf_counter()
+    if request.method == "POST":
+        results = args.get("results")
+        if not isinstance(results, dict):
+            return jsonify({"error": "results (a parse_repo output) is required"}), 400
+        out = similarity_index.query(results, k, min_score)
+    else:
+        repo_url = (args.get("repo_url") or "").strip()
+        if not repo_url:
+            return jsonify({"error": "repo_url is required"}), 400
+        try:
+            out = similarity_index.similar_to(repo_url, k, min_score)
+        except KeyError:
+            return jsonify({"error": "repo has not been analyzed", "repo_url": repo_url}), 404
+    metrics.observe_phase("similar", time.perf_counter() - start)
+    out["indexed"] = len(similarity_index)
+    return timed_jsonify(out)
 
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", "5000"))
+    analyzer_pool.warm_up()
     app.run(host="0.0.0.0", port=port)
@@ -0,0 +1,109 @@
+"""
+Git helpers shared by repo-organizer and the batch runner.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
+
+class DeadlineExceeded(RuntimeError):
+    """A phase (clone, scan) ran past its deadline."""
+
+
+class Deadline:
+    """
+    A point in time shared by every step of one phase. None means no
+    deadline.
+    """
+
+    def __init__(self, seconds: Optional[float], phase: str):
+        self.seconds = seconds
+        self.phase = phase
+        self._at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left; raises DeadlineExceeded once the deadline passed."""
+        if self._at is None:
+            return None
+        left = self._at - time.monotonic()
+        if left <= 0:
+            raise self.exceeded()
+        return left
+
+    def expired(self) -> bool:
+        return self._at is not None and time.monotonic() >= self._at
+
+    def exceeded(self) -> DeadlineExceeded:
+        return DeadlineExceeded(f"{self.phase} phase exceeded its {self.seconds:g}s deadline")
+
+
+@contextmanager
+def kill_at_deadline(kill: Callable[[], None], deadline: Optional[Deadline]) -> Iterator[None]:
+    """
+    Calls `kill` (e.g. Popen.kill) if the deadline passes while the block
+    runs, and turns the resulting failure into DeadlineExceeded.
+    """
+    remaining = deadline.remaining() if deadline else None
+    timer = threading.Timer(remaining, kill) if remaining is not None else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+    try:
+        yield
+    except Exception:
+        if deadline and deadline.expired():
+            raise deadline.exceeded()
+        raise
+    finally:
+        if timer:
+            timer.cancel()
+    if deadline and deadline.expired():
+        raise deadline.exceeded()
+
+
+def ensure_dir(path: str) -> None:
+    os.makedirs(path, exist_ok=True)
+
+
+def repo_name_from_url(repo_url: str) -> str:
+    repo_name = repo_url.rstrip("/").split("/")[-1]
+    if repo_name.endswith(".git"):
+        repo_name = repo_name[:-4]
+    return repo_name
+
+
+def clone_repo(repo_url: str, clone_base: str, timeout: Optional[float] = None) -> Tuple[str, str]:
+    """
+    Shallow-clones `repo_url` into a fresh directory under `clone_base`.
+    Raises DeadlineExceeded if the clone takes longer than `timeout` seconds.
+    """
+    ensure_dir(clone_base)
+    ts = int(time.time())
+    # mkdtemp keeps concurrent clones of same-named repos apart
+    dest = tempfile.mkdtemp(prefix=f"{repo_name_from_url(repo_url)}_{ts}_", dir=clone_base)
+    cmd = [
+        "git",
+        "clone",
+        "--depth",
+        "1",
+        repo_url,
+        dest,
+    ]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                              timeout=timeout)
+    except subprocess.TimeoutExpired:
+        shutil.rmtree(dest, ignore_errors=True)
+        raise DeadlineExceeded(f"git clone exceeded its {timeout:g}s deadline")
+    if proc.returncode != 0:
+        shutil.rmtree(dest, ignore_errors=True)
+        raise RuntimeError(f"git clone failed: {proc.stderr.strip()}")
+    return dest, proc.stdout
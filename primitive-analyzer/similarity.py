@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+"""
+Similar-repository search over primitive feature sets
+
+A repo's feature set is the helpers, map types, attach types and inferred
+program types of its parse_repo output ('helper:bpf_map_lookup_elem',
+'map:BPF_MAP_TYPE_HASH', ...), and two repos are as similar as the
+Jaccard index of their sets. Comparing a query against every repo is
+linear per query (quadratic for all pairs), so the index keeps:
+
+ - a MinHash signature per repo: the NUM_PERM minima of the universal
+   hashes h_i(x) = (a_i * x + b_i) mod (2^31 - 1) over its features. Two
+   signatures agree in a position with probability equal to the Jaccard
+   index of the sets.
+ - LSH banding: signatures are cut into BANDS bands of ROWS values and
+   repos that agree on a whole band are candidates. A pair with Jaccard s
+   becomes a candidate with probability 1 - (1 - s^ROWS)^BANDS: about 0.5
+   at s = 0.38 with the defaults, over 0.99 from s = 0.7.
+ - the exact feature sets, to rescore candidates by their true Jaccard
+   index before the top k are picked. Only the candidates that collide
+   in the most bands are rescored (at least RESCORE_MIN, RESCORE_PER_K
+   per result), which bounds the cost of queries in dense neighbourhoods.
+
+Each band is a sorted array of band keys searched by bisection, plus a
+small dict of the keys added since it was last sorted, so looking up the
+candidates costs O(BANDS * log n) plus their number. Adding or
+re-analyzing a repo costs O(BANDS): its previous entry is only marked
+dead, and the arrays are re-sorted (and dead entries dropped) once the
+unsorted part outgrows MERGE_FRACTION of the index.
+
+Usage:
+  python similarity.py build --index sim.npz --input results.jsonl [--input ...]
+                             [--num-perm 128] [--bands 32]
+  python similarity.py add --index sim.npz --input more.jsonl
+  python similarity.py query --index sim.npz (--repo <source> | --results <parse.json|->)
+                             [-k 10] [--min-score 0.0] [--json]
+  python similarity.py stats --index sim.npz
+
+--input is batch.py output: JSON lines with "source" and "results" (lines
+with "error" are skipped); - reads stdin. A source that is already indexed
+is replaced, so re-running `add` on a newer batch updates the index.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 32
+SEED = 1
+PRIME = (1 << 31) - 1
+# Re-sort the bands once this share of the index was added since the last sort
+MERGE_FRACTION = 0.05
+MERGE_MIN = 256
+# Signatures computed per vectorized step in add_many()
+BUILD_CHUNK = 2048
+# Candidates rescored exactly per query: the max(RESCORE_MIN, RESCORE_PER_K * k)
+# that collide in the most bands (a pair with Jaccard s collides in BANDS * s^ROWS
+# bands on average)
+RESCORE_MIN = 200
+RESCORE_PER_K = 20
+
+# Bump when the saved layout or the feature set definition changes
+INDEX_VERSION = 1
+
+# parse_repo output section -> feature prefix
+FEATURE_SECTIONS = (
+    ('helpers', 'helper'),
+    ('map_types', 'map'),
+    ('attach_types', 'attach'),
+    ('program_types_inferred', 'prog'),
+)
+
+
+def feature_set(results: Dict) -> List[str]:
+    """Sorted feature names of one parse_repo output."""
+    out = []
+    for section, prefix in FEATURE_SECTIONS:
+        for name, count in (results.get(section) or {}).items():
+            if count:
+                out.append(f'{prefix}:{name}')
+    return sorted(out)
+
+
+def repo_key(source: str) -> str:
+    """Index key of a repo URL or path (trailing slash and .git dropped)."""
+    key = source.strip().rstrip('/')
+    return key[:-4] if key.endswith('.git') else key
+
+
+def token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little') % PRIME
+
+
+class SimilarityIndex:
+    """MinHash/LSH index of repo feature sets, keyed by repo_key(source). Thread-safe."""
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = SEED):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, PRIME, num_perm, dtype=np.int64)
+        self._b = rng.integers(0, PRIME, num_perm, dtype=np.int64)
+        # Odd multipliers folding a band's ROWS values into one 64-bit key
+        self._mix = rng.integers(1, 1 << 62, self.rows, dtype=np.uint64) | np.uint64(1)
+
+        # Features: name <-> id, and each feature's NUM_PERM hash values
+        self._vocab: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._hashes = np.empty((0, num_perm), dtype=np.uint32)
+
+        # Slots: one per added repo version; a re-analyzed repo gets a new slot
+        self._keys: List[Optional[str]] = []
+        self._features: List[np.ndarray] = []
+        self._slot_of: Dict[str, int] = {}
+        self._n = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._sizes = np.zeros(0, dtype=np.int32)
+        self._sigs = np.zeros((0, num_perm), dtype=np.uint32)
+        self._band_keys = np.zeros((0, bands), dtype=np.uint64)
+
+        # Per band: sorted keys of the slots present at the last merge, and
+        # the keys of newer slots in a dict
+        self._sorted_keys = [np.zeros(0, dtype=np.uint64) for _ in range(bands)]
+        self._sorted_slots = [np.zeros(0, dtype=np.int64) for _ in range(bands)]
+        self._pending: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+        self._pending_count = 0
+
+        self._lock = threading.RLock()
+        # Changes since the last save()
+        self.dirty = 0
+
+    # ----------------------------
+    # Hashing
+    # ----------------------------
+
+    def _token_hashes(self, tokens: Sequence[str]) -> np.ndarray:
+        x = np.array([token_hash(t) for t in tokens], dtype=np.int64)
+        return ((self._a[None, :] * x[:, None] + self._b[None, :]) % PRIME).astype(np.uint32)
+
+    def _intern(self, tokens: Iterable[str]) -> np.ndarray:
+        """Feature ids of `tokens`, adding unknown ones to the vocabulary."""
+        new = [t for t in dict.fromkeys(tokens) if t not in self._vocab]
+        if new:
+            for t in new:
+                self._vocab[t] = len(self._names)
+                self._names.append(t)
+            self._hashes = np.vstack([self._hashes, self._token_hashes(new)])
+        return np.array(sorted(self._vocab[t] for t in tokens), dtype=np.int32)
+
+    def _query_features(self, tokens: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(known feature ids, signature) of a query set, without growing the vocabulary."""
+        known = np.array(sorted(self._vocab[t] for t in tokens if t in self._vocab), dtype=np.int32)
+        unknown = [t for t in tokens if t not in self._vocab]
+        parts = [self._hashes[known]] if len(known) else []
+        if unknown:
+            parts.append(self._token_hashes(unknown))
+        sig = np.vstack(parts).min(axis=0) if parts else np.full(self.num_perm, PRIME, dtype=np.uint32)
+        return known, sig
+
+    def _band_keys_of(self, sigs: np.ndarray) -> np.ndarray:
+        """(n, BANDS) band keys of (n, NUM_PERM) signatures."""
+        bands = sigs.reshape(len(sigs), self.bands, self.rows).astype(np.uint64)
+        return (bands * self._mix).sum(axis=2, dtype=np.uint64)
+
+    # ----------------------------
+    # Slots
+    # ----------------------------
+
+    def _reserve(self, extra: int) -> None:
+        need = self._n + extra
+        if need <= len(self._alive):
+            return
+        cap = max(need, 2 * len(self._alive), 1024)
+
+        def grow(a: np.ndarray) -> np.ndarray:
+            out = np.zeros((cap,) + a.shape[1:], dtype=a.dtype)
+            out[:self._n] = a[:self._n]
+            return out
+
+        self._alive = grow(self._alive)
+        self._sizes = grow(self._sizes)
+        self._sigs = grow(self._sigs)
+        self._band_keys = grow(self._band_keys)
+
+    def _drop(self, key: str) -> bool:
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return False
+        self._alive[slot] = False
+        self._keys[slot] = None
+        self._features[slot] = np.zeros(0, dtype=np.int32)
+        return True
+
+    def _append(self, keys: List[str], features: List[np.ndarray], sigs: np.ndarray) -> None:
+        self._reserve(len(keys))
+        start, end = self._n, self._n + len(keys)
+        self._keys.extend(keys)
+        self._features.extend(features)
+        self._alive[start:end] = True
+        self._sizes[start:end] = [len(f) for f in features]
+        self._sigs[start:end] = sigs
+        for lo in range(start, end, BUILD_CHUNK):
+            hi = min(lo + BUILD_CHUNK, end)
+            self._band_keys[lo:hi] = self._band_keys_of(self._sigs[lo:hi])
+        for i, key in enumerate(keys):
+            self._slot_of[key] = start + i
+        self._n = end
+
+    def _signatures(self, features: List[np.ndarray]) -> np.ndarray:
+        """Signatures of many feature id sets, one vectorized min per chunk."""
+        sigs = np.full((len(features), self.num_perm), PRIME, dtype=np.uint32)
+        for lo in range(0, len(features), BUILD_CHUNK):
+            chunk = features[lo:lo + BUILD_CHUNK]
+            nonempty = [i for i, f in enumerate(chunk) if len(f)]
+            if not nonempty:
+                continue
+            flat = np.concatenate([chunk[i] for i in nonempty])
+            offsets = np.cumsum([0] + [len(chunk[i]) for i in nonempty[:-1]])
+            sigs[lo + np.array(nonempty)] = np.minimum.reduceat(self._hashes[flat], offsets, axis=0)
+        return sigs
+
+    def _merge(self) -> None:
+        """Re-sorts every band over the live slots (dropping dead ones first if many)."""
+        if self._n and self._n - len(self._slot_of) > self._n // 2:
+            self._compact()
+        live = np.flatnonzero(self._alive[:self._n] & (self._sizes[:self._n] > 0))
+        for j in range(self.bands):
+            keys = self._band_keys[live, j]
+            order = np.argsort(keys, kind='stable')
+            self._sorted_keys[j] = keys[order]
+            self._sorted_slots[j] = live[order]
+            self._pending[j] = {}
+        self._pending_count = 0
+
+    def _compact(self) -> None:
+        live = np.flatnonzero(self._alive[:self._n])
+        self._keys = [self._keys[i] for i in live]
+        self._features = [self._features[i] for i in live]
+        n = len(live)
+        for name in ('_alive', '_sizes', '_sigs', '_band_keys'):
+            a = getattr(self, name)
+            setattr(self, name, a[live].copy() if n else a[:0].copy())
+        self._n = n
+        self._slot_of = {key: i for i, key in enumerate(self._keys)}
+
+    def _maybe_merge(self) -> None:
+        if self._pending_count > max(MERGE_MIN, MERGE_FRACTION * len(self._slot_of)):
+            self._merge()
+
+    # ----------------------------
+    # Updates
+    # ----------------------------
+
+    def add_many(self, items: Iterable[Tuple[str, Dict]]) -> Dict[str, int]:
+        """
+        Indexes many (source, parse_repo output) pairs at once, replacing
+        sources that are already indexed, then re-sorts the bands. For
+        building an index; use update() for single repos.
+        """
+        with self._lock:
+            latest: Dict[str, np.ndarray] = {}
+            for source, results in items:
+                latest[repo_key(source)] = self._intern(feature_set(results))
+            counts = {'added': 0, 'updated': 0, 'unchanged': 0}
+            keys, features = [], []
+            for key, ids in latest.items():
+                slot = self._slot_of.get(key)
+                if slot is not None and np.array_equal(self._features[slot], ids):
+                    counts['unchanged'] += 1
+                    continue
+                counts['updated' if self._drop(key) else 'added'] += 1
+                keys.append(key)
+                features.append(ids)
+            if keys:
+                self._append(keys, features, self._signatures(features))
+                self._merge()
+                self.dirty += len(keys)
+            return counts
+
+    def update(self, source: str, results: Dict) -> str:
+        """
+        Indexes one (re-)analyzed repo: 'added', 'updated', or 'unchanged'
+        when its feature set is the indexed one.
+        """
+        key = repo_key(source)
+        tokens = feature_set(results)
+        with self._lock:
+            ids = self._intern(tokens)
+            slot = self._slot_of.get(key)
+            if slot is not None and np.array_equal(self._features[slot], ids):
+                return 'unchanged'
+            outcome = 'updated' if self._drop(key) else 'added'
+            self._append([key], [ids], self._signatures([ids]))
+            slot = self._n - 1
+            if len(ids):
+                for j, band_key in enumerate(self._band_keys[slot]):
+                    self._pending[j].setdefault(int(band_key), []).append(slot)
+                self._pending_count += 1
+            self._maybe_merge()
+            self.dirty += 1
+            return outcome
+
+    def remove(self, source: str) -> bool:
+        with self._lock:
+            removed = self._drop(repo_key(source))
+            if removed:
+                self.dirty += 1
+            return removed
+
+    def __contains__(self, source: str) -> bool:
+        return repo_key(source) in self._slot_of
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    # ----------------------------
+    # Queries
+    # ----------------------------
+
+    def _candidates(self, band_keys: np.ndarray, limit: int,
+                    exclude: Optional[int] = None) -> Tuple[np.ndarray, int]:
+        """
+        Live slots sharing a band with `band_keys`: the `limit` that share
+        the most bands, and how many there were in total.
+        """
+        found = []
+        for j in range(self.bands):
+            keys = self._sorted_keys[j]
+            lo = np.searchsorted(keys, band_keys[j], side='left')
+            hi = np.searchsorted(keys, band_keys[j], side='right')
+            if hi > lo:
+                found.append(self._sorted_slots[j][lo:hi])
+            extra = self._pending[j].get(int(band_keys[j]))
+            if extra:
+                found.append(np.array(extra, dtype=np.int64))
+        if not found:
+            return np.zeros(0, dtype=np.int64), 0
+        slots, hits = np.unique(np.concatenate(found), return_counts=True)
+        keep = self._alive[slots]
+        if exclude is not None:
+            keep &= slots != exclude
+        slots, hits = slots[keep], hits[keep]
+        if len(slots) > limit:
+            return slots[np.argpartition(-hits, limit - 1)[:limit]], len(slots)
+        return slots, len(slots)
+
+    def _rank(self, known: np.ndarray, size: int, slots: np.ndarray, k: int, min_score: float) -> List[Dict]:
+        """Exact Jaccard of the query against `slots`; the top k at or above min_score."""
+        if not len(slots) or not size:
+            return []
+        mark = np.zeros(len(self._names), dtype=np.int32)
+        mark[known] = 1
+        lens = self._sizes[slots]
+        flat = np.concatenate([self._features[s] for s in slots])
+        offsets = np.concatenate(([0], np.cumsum(lens)[:-1]))
+        shared = np.add.reduceat(mark[flat], offsets) if len(flat) else np.zeros(len(slots), dtype=np.int64)
+        scores = shared / (size + lens - shared)
+        order = np.lexsort((slots, -scores))
+        out = []
+        for i in order[:k]:
+            if scores[i] < min_score:
+                break
+            out.append({'repo': self._keys[slots[i]], 'jaccard': round(float(scores[i]), 4),
+                        'shared': int(shared[i]), 'features': int(lens[i])})
+        return out
+
+    def query(self, results: Dict, k: int = 10, min_score: float = 0.0) -> Dict:
+        """Top-k indexed repos most similar to a parse_repo output."""
+        with self._lock:
+            tokens = feature_set(results)
+            known, sig = self._query_features(tokens)
+            slots, total = (self._candidates(self._band_keys_of(sig[None, :])[0], self._rescore_limit(k))
+                            if tokens else (np.zeros(0, dtype=np.int64), 0))
+            return {'features': len(tokens), 'candidates': total,
+                    'results': self._rank(known, len(tokens), slots, k, min_score)}
+
+    def similar_to(self, source: str, k: int = 10, min_score: float = 0.0) -> Dict:
+        """Top-k repos most similar to an indexed one (itself excluded). KeyError if not indexed."""
+        with self._lock:
+            slot = self._slot_of[repo_key(source)]
+            known = self._features[slot]
+            slots, total = (self._candidates(self._band_keys[slot], self._rescore_limit(k), exclude=slot)
+                            if len(known) else (np.zeros(0, dtype=np.int64), 0))
+            return {'repo': self._keys[slot], 'features': int(len(known)), 'candidates': total,
+                    'results': self._rank(known, len(known), slots, k, min_score)}
+
+    @staticmethod
+    def _rescore_limit(k: int) -> int:
+        return max(RESCORE_MIN, RESCORE_PER_K * k)
+
+    def exact_query(self, results: Dict, k: int = 10, min_score: float = 0.0) -> Dict:
+        """query() by scoring every indexed repo (the linear baseline, for checks and benchmarks)."""
+        with self._lock:
+            tokens = feature_set(results)
+            known, _ = self._query_features(tokens)
+            slots = np.flatnonzero(self._alive[:self._n] & (self._sizes[:self._n] > 0))
+            return {'features': len(tokens), 'candidates': int(len(slots)),
+                    'results': self._rank(known, len(tokens), slots, k, min_score)}
+
+    def features_of(self, source: str) -> List[str]:
+        with self._lock:
+            return sorted(self._names[i] for i in self._features[self._slot_of[repo_key(source)]])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'repos': len(self._slot_of),
+                'slots': self._n,
+                'features': len(self._names),
+                'num_perm': self.num_perm,
+                'bands': self.bands,
+                'rows': self.rows,
+                'threshold': round((1.0 / self.bands) ** (1.0 / self.rows), 3),
+                'pending': self._pending_count,
+            }
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+
+    def save(self, path: str) -> None:
+        """Writes the live repos to `path` (.npz) atomically."""
+        with self._lock:
+            live = [s for s in range(self._n) if self._alive[s]]
+            features = [self._features[s] for s in live]
+            meta = {'version': INDEX_VERSION, 'num_perm': self.num_perm, 'bands': self.bands,
+                    'seed': self.seed, 'names': self._names, 'keys': [self._keys[s] for s in live]}
+            buf = io.BytesIO()
+            np.savez(buf,
+                     meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8),
+                     sigs=self._sigs[live],
+                     indptr=np.cumsum([0] + [len(f) for f in features]).astype(np.int64),
+                     indices=np.concatenate(features) if features else np.zeros(0, dtype=np.int32))
+            self.dirty = 0
+        fd, tmp = tempfile.mkstemp(prefix='.similarity-', dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(buf.getbuffer())
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'SimilarityIndex':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+            if meta.get('version') != INDEX_VERSION:
+                raise ValueError(f"{path}: similarity index version {meta.get('version')}, "
+                                 f"expected {INDEX_VERSION}; rebuild it")
+            index = cls(meta['num_perm'], meta['bands'], meta['seed'])
+            index._intern(meta['names'])
+            indptr, indices = data['indptr'], data['indices'].astype(np.int32)
+            features = [indices[indptr[i]:indptr[i + 1]] for i in range(len(meta['keys']))]
+            if features:
+                index._append(meta['keys'], features, data['sigs'])
+        index._merge()
+        return index
+
+    @classmethod
+    def open(cls, path: str, **kwargs) -> 'SimilarityIndex':
+        """load(path) if it exists, else a new empty index."""
+        return cls.load(path) if os.path.exists(path) else cls(**kwargs)
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+
+def read_batch_lines(paths: Sequence[str]) -> Iterable[Tuple[str, Dict]]:
+    """(source, results) of batch.py output files; error lines are skipped."""
+    for path in paths:
+        f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+        try:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                if 'results' in row and row.get('source'):
+                    yield row['source'], row['results']
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def print_matches(out: Dict) -> None:
+    print(f"{len(out['results'])} similar repos ({out['candidates']} candidates, "
+          f"{out['features']} features):")
+    for r in out['results']:
+        print(f"  {r['jaccard']:.3f}  {r['repo']}  ({r['shared']}/{r['features']} shared)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Similar-repository search over primitive feature sets.")
+    sub = ap.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help="build a new index from batch.py output")
+    p.add_argument('--index', required=True)
+    p.add_argument('--input', action='append', required=True)
+    p.add_argument('--num-perm', type=int, default=NUM_PERM)
+    p.add_argument('--bands', type=int, default=BANDS)
+
+    p = sub.add_parser('add', help="add or update repos from batch.py output")
+    p.add_argument('--index', required=True)
+    p.add_argument('--input', action='append', required=True)
+
+    p = sub.add_parser('query', help="top-k similar repos")
+    p.add_argument('--index', required=True)
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument('--repo', help="an indexed source (URL or path)")
+    group.add_argument('--results', help="a parse_repo JSON output (main.py --json), or - for stdin")
+    p.add_argument('-k', type=int, default=10)
+    p.add_argument('--min-score', type=float, default=0.0)
+    p.add_argument('--json', action='store_true')
+
+    p = sub.add_parser('stats', help="index size and parameters")
+    p.add_argument('--index', required=True)
+
+    args = ap.parse_args(argv)
+
+    if args.command in ('build', 'add'):
+        start = time.perf_counter()
+        if args.command == 'build':
+            index = SimilarityIndex(args.num_perm, args.bands)
+        else:
+            index = SimilarityIndex.open(args.index)
+        counts = index.add_many(read_batch_lines(args.input))
+        index.save(args.index)
+        print(f"{args.index}: {counts['added']} added, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged; {len(index)} repos ({time.perf_counter() - start:.2f}s)")
+        return 0
+
+    if not os.path.exists(args.index):
+        print(f"Index not found: {args.index}", file=sys.stderr)
+        return 2
+    index = SimilarityIndex.load(args.index)
+    if args.command == 'stats':
+        print(json.dumps(index.stats(), indent=2))
+        return 0
+
+    if args.repo:
+        if args.repo not in index:
+            print(f"Not indexed: {args.repo}", file=sys.stderr)
+            return 1
+        out = index.similar_to(args.repo, args.k, args.min_score)
+    else:
+        f = sys.stdin if args.results == '-' else open(args.results, 'r', encoding='utf-8')
+        with f:
+            out = index.query(json.load(f), args.k, args.min_score)
+    if args.json:
+        print(json.dumps(out, indent=2))
+    else:
+        print_matches(out)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
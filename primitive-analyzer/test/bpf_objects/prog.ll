@@ -0,0 +1,112 @@
+; Source of the BPF object fixtures, as clang -g -O2 -target bpf would emit
+; it for (roughly):
+;
+;   struct { __uint(type, BPF_MAP_TYPE_HASH); __uint(max_entries, 16);
+;            __type(key, __u64); __type(value, __u64); } counts SEC(".maps");
+;   struct { __uint(type, BPF_MAP_TYPE_RINGBUF); __uint(max_entries, 4096); } events SEC(".maps");
+;   struct bpf_map_def SEC("maps") legacy = { .type = BPF_MAP_TYPE_ARRAY, ... };
+;   char LICENSE[] SEC("license") = "GPL";
+;   extern void cgroup_rstat_flush(struct cgroup *cgrp) __ksym;
+;
+;   static __noinline __u64 now(void) { return bpf_ktime_get_ns(); }
+;   SEC("kprobe/do_sys_open") int probe(void *ctx)
+;   { __u64 id = bpf_get_current_pid_tgid() + now(); bpf_map_lookup_elem(&counts, &id); return 0; }
+;   SEC("xdp") int xdp_a(struct xdp_md *ctx) { cgroup_rstat_flush(0); return bpf_redirect(1, 0); }
+;   SEC("xdp") int xdp_b(struct xdp_md *ctx) { return bpf_redirect(2, 0); }
+;
+; Regenerate the objects (LLVM 14) with:
+;   llc -march=bpfel -filetype=obj prog.ll -o prog.bpfel.o && llvm-strip -g prog.bpfel.o
+;   llc -march=bpfeb -filetype=obj prog.ll -o prog.bpfeb.o && llvm-strip -g prog.bpfeb.o
+;   head -c 1000 prog.bpfel.o > truncated.o
+
+%struct.counts = type { [1 x i32]*, [16 x i32]*, i64*, i64* }
+%struct.events = type { [27 x i32]*, [4096 x i32]* }
+
+@counts = dso_local global %struct.counts zeroinitializer, section ".maps", align 8, !dbg !10
+@events = dso_local global %struct.events zeroinitializer, section ".maps", align 8, !dbg !30
+@legacy = dso_local global { i32, i32, i32, i32, i32 } { i32 2, i32 4, i32 8, i32 1, i32 0 }, section "maps", align 4
+@LICENSE = dso_local global [4 x i8] c"GPL\00", section "license", align 1
+
+declare extern_weak void @cgroup_rstat_flush(i8*) section ".ksyms"
+
+define internal i64 @now() noinline nounwind !dbg !50 {
+  %t = call i64 inttoptr (i64 5 to i64 ()*)(), !dbg !54
+  ret i64 %t, !dbg !54
+}
+
+define dso_local i32 @probe(i8* %ctx) nounwind section "kprobe/do_sys_open" !dbg !51 {
+  %key = alloca i64, align 8, !dbg !55
+  %id = call i64 inttoptr (i64 14 to i64 ()*)(), !dbg !55
+  %t = call i64 @now(), !dbg !55
+  %sum = add i64 %id, %t, !dbg !55
+  store volatile i64 %sum, i64* %key, align 8, !dbg !55
+  %k = bitcast i64* %key to i8*, !dbg !55
+  %v = call i8* inttoptr (i64 1 to i8* (i8*, i8*)*)(i8* bitcast (%struct.counts* @counts to i8*), i8* %k), !dbg !55
+  ret i32 0, !dbg !55
+}
+
+define dso_local i32 @xdp_a(i8* %ctx) nounwind section "xdp" !dbg !52 {
+  call void @cgroup_rstat_flush(i8* null), !dbg !56
+  %r = call i64 inttoptr (i64 23 to i64 (i32, i64)*)(i32 1, i64 0), !dbg !56
+  %ret = trunc i64 %r to i32, !dbg !56
+  ret i32 %ret, !dbg !56
+}
+
+define dso_local i32 @xdp_b(i8* %ctx) nounwind section "xdp" !dbg !53 {
+  %r = call i64 inttoptr (i64 23 to i64 (i32, i64)*)(i32 2, i64 0), !dbg !57
+  %ret = trunc i64 %r to i32, !dbg !57
+  ret i32 %ret, !dbg !57
+}
+
+!llvm.dbg.cu = !{!0}
+!llvm.module.flags = !{!2, !3}
+
+!0 = distinct !DICompileUnit(language: DW_LANG_C99, file: !1, producer: "hand-written", isOptimized: true, runtimeVersion: 0, emissionKind: FullDebug, globals: !4)
+!1 = !DIFile(filename: "prog.bpf.c", directory: "/src")
+!2 = !{i32 7, !"Dwarf Version", i32 5}
+!3 = !{i32 2, !"Debug Info Version", i32 3}
+!4 = !{!10, !30}
+
+!5 = !DIBasicType(name: "int", size: 32, encoding: DW_ATE_signed)
+!6 = !DIBasicType(name: "unsigned long long", size: 64, encoding: DW_ATE_unsigned)
+!7 = !DIDerivedType(tag: DW_TAG_typedef, name: "__u64", file: !1, line: 1, baseType: !6)
+!8 = !DIDerivedType(tag: DW_TAG_pointer_type, baseType: !7, size: 64)
+
+!10 = !DIGlobalVariableExpression(var: !11, expr: !DIExpression())
+!11 = distinct !DIGlobalVariable(name: "counts", scope: !0, file: !1, line: 3, type: !12, isLocal: false, isDefinition: true)
+!12 = distinct !DICompositeType(tag: DW_TAG_structure_type, file: !1, line: 3, size: 256, elements: !13)
+!13 = !{!14, !18, !22, !23}
+!14 = !DIDerivedType(tag: DW_TAG_member, name: "type", scope: !12, file: !1, line: 3, baseType: !15, size: 64)
+!15 = !DIDerivedType(tag: DW_TAG_pointer_type, baseType: !16, size: 64)
+!16 = !DICompositeType(tag: DW_TAG_array_type, baseType: !5, size: 32, elements: !17)
+!17 = !{!DISubrange(count: 1)}
+!18 = !DIDerivedType(tag: DW_TAG_member, name: "max_entries", scope: !12, file: !1, line: 3, baseType: !19, size: 64, offset: 64)
+!19 = !DIDerivedType(tag: DW_TAG_pointer_type, baseType: !20, size: 64)
+!20 = !DICompositeType(tag: DW_TAG_array_type, baseType: !5, size: 512, elements: !21)
+!21 = !{!DISubrange(count: 16)}
+!22 = !DIDerivedType(tag: DW_TAG_member, name: "key", scope: !12, file: !1, line: 3, baseType: !8, size: 64, offset: 128)
+!23 = !DIDerivedType(tag: DW_TAG_member, name: "value", scope: !12, file: !1, line: 3, baseType: !8, size: 64, offset: 192)
+
+!30 = !DIGlobalVariableExpression(var: !31, expr: !DIExpression())
+!31 = distinct !DIGlobalVariable(name: "events", scope: !0, file: !1, line: 5, type: !32, isLocal: false, isDefinition: true)
+!32 = distinct !DICompositeType(tag: DW_TAG_structure_type, file: !1, line: 5, size: 128, elements: !33)
+!33 = !{!34, !38}
+!34 = !DIDerivedType(tag: DW_TAG_member, name: "type", scope: !32, file: !1, line: 5, baseType: !35, size: 64)
+!35 = !DIDerivedType(tag: DW_TAG_pointer_type, baseType: !36, size: 64)
+!36 = !DICompositeType(tag: DW_TAG_array_type, baseType: !5, size: 864, elements: !37)
+!37 = !{!DISubrange(count: 27)}
+!38 = !DIDerivedType(tag: DW_TAG_member, name: "max_entries", scope: !32, file: !1, line: 5, baseType: !39, size: 64, offset: 64)
+!39 = !DIDerivedType(tag: DW_TAG_pointer_type, baseType: !40, size: 64)
+!40 = !DICompositeType(tag: DW_TAG_array_type, baseType: !5, size: 131072, elements: !41)
+!41 = !{!DISubrange(count: 4096)}
+
+!44 = !DISubroutineType(types: !45)
+!45 = !{!5, null}
+!50 = distinct !DISubprogram(name: "now", scope: !1, file: !1, line: 11, type: !44, scopeLine: 11, spFlags: DISPFlagLocalToUnit | DISPFlagDefinition | DISPFlagOptimized, unit: !0)
+!51 = distinct !DISubprogram(name: "probe", scope: !1, file: !1, line: 12, type: !44, scopeLine: 12, flags: DIFlagPrototyped, spFlags: DISPFlagDefinition | DISPFlagOptimized, unit: !0)
+!52 = distinct !DISubprogram(name: "xdp_a", scope: !1, file: !1, line: 14, type: !44, scopeLine: 14, flags: DIFlagPrototyped, spFlags: DISPFlagDefinition | DISPFlagOptimized, unit: !0)
+!53 = distinct !DISubprogram(name: "xdp_b", scope: !1, file: !1, line: 15, type: !44, scopeLine: 15, flags: DIFlagPrototyped, spFlags: DISPFlagDefinition | DISPFlagOptimized, unit: !0)
+!54 = !DILocation(line: 11, scope: !50)
+!55 = !DILocation(line: 13, scope: !51)
+!56 = !DILocation(line: 14, scope: !52)
+!57 = !DILocation(line: 15, scope: !53)
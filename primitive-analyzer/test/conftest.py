@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(TEST_DIR)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+FEATURES_YAML = os.path.join(APP_DIR, 'data', 'feature-versions.yaml')
+DUMMY_REPO = os.path.join(TEST_DIR, 'dummy_repo')
+
+
+@pytest.fixture(scope='session')
+def gt():
+    import main as analyzer
+    return analyzer.load_feature_sets(FEATURES_YAML)
@@ -0,0 +1,26 @@
+#include <linux/bpf.h>
+#include <bpf/bpf_helpers.h>
+
+/* Checked out with CRLF line endings (see ../.gitattributes) */
+struct {
+    __uint(type, BPF_MAP_TYPE_PERCPU_ARRAY);
+    __uint(max_entries, 1);
+} counters SEC(".maps");
+
+SEC("kprobe/do_sys_open")
+int trace_open(struct pt_regs *ctx)
+{
+    __u32 key = 0;
+    __u64 *val = bpf_map_lookup_elem(&counters, &key);
+
+    if (val)
+        __sync_fetch_and_add(val, 1);
+    bpf_get_current_pid_tgid ();
+    return 0;
+}
+
+SEC("tc")
+int classify(struct __sk_buff *skb)
+{
+    return bpf_redirect(skb->ifindex, BPF_F_INGRESS);
+}
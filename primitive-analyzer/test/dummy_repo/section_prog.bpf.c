@@ -0,0 +1,22 @@
+#include <linux/bpf.h>
+
+#define __section(NAME) __attribute__((section(NAME), used))
+
+struct bpf_map_def __section("maps") sock_map = {
+    .type = BPF_MAP_TYPE_SOCKMAP,
+    .max_entries = 64,
+};
+
+__section("sk_msg")
+int msg_verdict(struct sk_msg_md *msg)
+{
+    return bpf_msg_redirect_map(msg, &sock_map, 0, BPF_F_INGRESS);
+}
+
+__attribute__((section("xdp"), used))
+int xdp_pass(struct xdp_md *ctx)
+{
+    return bpf_xdp_adjust_head (ctx, 0) ? XDP_DROP : XDP_PASS;
+}
+
+char _license[] __section("license") = "GPL";
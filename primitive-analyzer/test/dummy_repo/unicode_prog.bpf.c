@@ -0,0 +1,21 @@
+#include <linux/bpf.h>
+#include <bpf/bpf_helpers.h>
+
+// Zähler für Pakete pro Schnittstelle — non-ASCII text takes the Unicode \w scan
+struct {
+    __uint(type, BPF_MAP_TYPE_LRU_HASH);
+    __uint(max_entries, 4096);
+} größe SEC(".maps");
+
+/* 'ébpf_ktime_get_ns' is one identifier, not a call of bpf_ktime_get_ns */
+static __always_inline int ébpf_ktime_get_ns(void) { return 0; }
+
+SEC("tracepoint/syscalls/sys_enter_execve")
+int trace_exec(void *ctx)
+{
+    __u64 ts = bpf_ktime_get_ns();
+    __u32 pid = bpf_get_current_pid_tgid() >> 32;
+
+    bpf_map_update_elem(&größe, &pid, &ts, BPF_ANY);
+    return ébpf_ktime_get_ns();
+}
@@ -0,0 +1,113 @@
+"""
+parse_repo on tar and zip archives (from a path, a non-seekable stream and
+the CLI's stdin) against the scan of the same tree on disk, and the error
+for input that is not an archive.
+"""
+
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import zipfile
+
+import pytest
+
+import main as analyzer
+from archives import ArchiveError
+from conftest import APP_DIR, DUMMY_REPO, FEATURES_YAML
+
+
+def tar_bytes(root, compress=True):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w:gz' if compress else 'w') as tar:
+        tar.add(root, arcname='.')
+    return buf.getvalue()
+
+
+def zip_bytes(root):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name in sorted(os.listdir(root)):
+            zf.write(os.path.join(root, name), f'repo/{name}')
+    return buf.getvalue()
+
+
+class Unseekable(io.RawIOBase):
+    """A pipe-like stream: read() only."""
+
+    def __init__(self, data):
+        self._buf = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self._buf.readinto(b)
+
+
+@pytest.fixture(scope='module')
+def on_disk(gt):
+    return analyzer.parse_repo(DUMMY_REPO, FEATURES_YAML, gt=gt)
+
+
+@pytest.mark.parametrize('kind', ['tar', 'tar.gz', 'zip'])
+def test_archive_matches_directory(tmp_path, gt, on_disk, kind):
+    data = zip_bytes(DUMMY_REPO) if kind == 'zip' else tar_bytes(DUMMY_REPO, kind == 'tar.gz')
+    path = tmp_path / f'repo.{kind}'
+    path.write_bytes(data)
+
+    assert analyzer.parse_repo(str(path), FEATURES_YAML, gt=gt) == on_disk
+    # Non-seekable streams too; a zip is buffered first
+    assert analyzer.parse_repo(Unseekable(data), FEATURES_YAML, gt=gt) == on_disk
+
+
+def test_archive_members_are_filtered_and_size_limited(tmp_path, gt):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w') as tar:
+        for name, text in [('a.bpf.c', 'bpf_ktime_get_ns();'), ('node_modules/b.c', 'bpf_ktime_get_ns();'),
+                           ('notes.txt', 'bpf_ktime_get_ns();'), ('big.h', 'x;' * 4096)]:
+            raw = text.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(raw)
+            tar.addfile(info, io.BytesIO(raw))
+    results = analyzer.parse_repo(io.BytesIO(buf.getvalue()), FEATURES_YAML, gt=gt, max_file_bytes=1024)
+    assert results['helpers'] == {'bpf_ktime_get_ns': 1}
+    assert results['skipped_files'] == [{'path': 'big.h', 'reason': 'too_large', 'size': 8192}]
+
+
+def test_not_an_archive(tmp_path, gt):
+    source = tmp_path / 'prog.c'
+    source.write_text('int x;\n')
+    with pytest.raises(ArchiveError, match='prog.c is not a directory or a readable tar/zip archive'):
+        analyzer.parse_repo(str(source), FEATURES_YAML, gt=gt)
+
+    truncated = tar_bytes(DUMMY_REPO)[:200]
+    with pytest.raises(ArchiveError):
+        analyzer.parse_repo(io.BytesIO(truncated), FEATURES_YAML, gt=gt)
+    with pytest.raises(ArchiveError):
+        analyzer.parse_repo(io.BytesIO(gzip.compress(b'not a tar' * 100)), FEATURES_YAML, gt=gt)
+
+
+def run_cli(args, stdin=None):
+    return subprocess.run([sys.executable, os.path.join(APP_DIR, 'main.py'), *args, '--features', FEATURES_YAML],
+                          input=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=APP_DIR)
+
+
+def test_cli_stdin_and_bad_input(tmp_path, on_disk):
+    proc = run_cli(['--repo', '-', '--json'], stdin=tar_bytes(DUMMY_REPO))
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout) == on_disk
+
+    source = tmp_path / 'prog.c'
+    source.write_text('int x;\n')
+    proc = run_cli(['--repo', str(source), '--json'])
+    assert proc.returncode == 2
+    assert b'is not a directory or a readable tar/zip archive' in proc.stderr
+    assert b'Traceback' not in proc.stderr
+
+    proc = run_cli(['--repo', '-', '--json'], stdin=b'garbage' * 100)
+    assert proc.returncode == 2
+    assert proc.stderr.startswith(b'stdin: not a readable tar or zip archive')
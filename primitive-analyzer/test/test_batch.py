@@ -0,0 +1,106 @@
+"""
+batch.py end to end on local sources: a run killed mid-batch resumes from
+its checkpoint without re-analyzing what was done, and a source that cannot
+be analyzed is reported and left out of the checkpoint while the rest of
+the batch goes on.
+"""
+
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+import main as analyzer
+from conftest import APP_DIR, DUMMY_REPO, FEATURES_YAML
+
+
+@pytest.fixture(scope='module')
+def expected(gt):
+    return analyzer.parse_repo(DUMMY_REPO, FEATURES_YAML, gt=gt)
+
+
+def start_batch(tmp_path, sources):
+    list_file = tmp_path / 'sources.txt'
+    list_file.write_text(''.join(f'{s}\n' for s in sources))
+    return subprocess.Popen(
+        [sys.executable, os.path.join(APP_DIR, 'batch.py'), '--input', str(list_file),
+         '--output', str(tmp_path / 'out.jsonl'), '--features', FEATURES_YAML,
+         '--concurrency', '1', '--workers', '1', '--no-file-cache'],
+        cwd=APP_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+
+
+def read_lines(path):
+    return path.read_text().splitlines() if path.exists() else []
+
+
+def repo_copies(tmp_path, names):
+    paths = []
+    for name in names:
+        shutil.copytree(DUMMY_REPO, tmp_path / name)
+        paths.append(str(tmp_path / name))
+    return paths
+
+
+def test_killed_batch_resumes_from_checkpoint(tmp_path, expected):
+    first, second, third = repo_copies(tmp_path, ['a', 'b', 'c'])
+    # Reading a FIFO blocks until a writer shows up, so the run hangs on
+    # this source's file, with the first two done, until it is killed
+    stuck = str(tmp_path / 'stuck')
+    os.mkdir(stuck)
+    os.mkfifo(os.path.join(stuck, 'prog.bpf.c'))
+    sources = [first, second, stuck, third]
+    checkpoint = tmp_path / 'out.jsonl.done'
+
+    proc = start_batch(tmp_path, sources)
+    try:
+        deadline = time.monotonic() + 60
+        while len(read_lines(checkpoint)) < 2:
+            assert proc.poll() is None, proc.stderr.read()
+            assert time.monotonic() < deadline, "batch made no progress"
+            time.sleep(0.05)
+        time.sleep(0.2)
+        assert proc.poll() is None
+    finally:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.communicate()
+    assert read_lines(checkpoint) == [first, second]
+
+    # The stuck source is now a repo like the others
+    shutil.rmtree(stuck)
+    shutil.copytree(DUMMY_REPO, stuck)
+    proc = start_batch(tmp_path, sources)
+    _, err = proc.communicate(timeout=120)
+    assert proc.returncode == 0, err
+    assert b'4 sources, 2 already done, 2 to analyze' in err
+
+    assert sorted(read_lines(checkpoint)) == sorted(sources)
+    records = [json.loads(ln) for ln in read_lines(tmp_path / 'out.jsonl')]
+    assert sorted(r['source'] for r in records) == sorted(sources)
+    for r in records:
+        assert r['results'] == expected
+
+
+def test_bad_source_is_skipped(tmp_path, expected):
+    first, last = repo_copies(tmp_path, ['a', 'b'])
+    notes = tmp_path / 'notes.txt'
+    notes.write_text('not a repo\n')
+    missing = str(tmp_path / 'missing.git')
+    sources = [first, str(notes), missing, last]
+
+    proc = start_batch(tmp_path, sources)
+    _, err = proc.communicate(timeout=120)
+    assert proc.returncode == 1, err
+    assert b'done: 2 ok, 2 failed' in err
+
+    records = {r['source']: r for r in map(json.loads, read_lines(tmp_path / 'out.jsonl'))}
+    assert records.keys() == set(sources)
+    assert records[first]['results'] == expected
+    assert records[last]['results'] == expected
+    assert 'not a directory or a readable tar/zip archive' in records[str(notes)]['error']
+    assert records[missing]['error']
+    assert read_lines(tmp_path / 'out.jsonl.done') == [first, last]
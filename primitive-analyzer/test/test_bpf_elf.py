@@ -0,0 +1,75 @@
+"""
+bpf_elf.py on committed llc-compiled objects (test/bpf_objects, built from
+prog.ll) in both byte orders: helper calls by id, kfunc calls by their
+extern symbol, map types from the BTF of ".maps" and from legacy "maps",
+and one SEC name per program. A truncated copy is a 'bad_object' and a
+non-BPF ELF a 'not_bpf', both skipped by parse_repo.
+"""
+
+import os
+import shutil
+from collections import Counter
+
+import pytest
+
+import main as analyzer
+from bpf_elf import ElfError, object_tokens
+from conftest import FEATURES_YAML, TEST_DIR
+
+OBJECTS = os.path.join(TEST_DIR, 'bpf_objects')
+
+EXPECTED_KEYS = Counter({
+    'bpf_get_current_pid_tgid(': 1, 'bpf_map_lookup_elem(': 1, 'bpf_redirect(': 2,
+    # called from the static subprogram in .text; the bpf-to-bpf call to it
+    # is not a helper call
+    'bpf_ktime_get_ns(': 1,
+    'cgroup_rstat_flush(': 1,
+    'BPF_MAP_TYPE_HASH': 1, 'BPF_MAP_TYPE_RINGBUF': 1, 'BPF_MAP_TYPE_ARRAY': 1,
+})
+EXPECTED_SECS = ['kprobe/do_sys_open', 'xdp', 'xdp', '.maps', '.maps', 'maps', 'license']
+
+
+def read(name):
+    with open(os.path.join(OBJECTS, name), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('name', ['prog.bpfel.o', 'prog.bpfeb.o'])
+def test_object_tokens(name):
+    keys, secs = object_tokens(read(name))
+    assert keys == EXPECTED_KEYS
+    assert secs == EXPECTED_SECS
+
+
+def test_unreadable_objects():
+    with pytest.raises(ElfError) as info:
+        object_tokens(read('truncated.o'))
+    assert info.value.reason == 'bad_object'
+
+    host = bytearray(read('prog.bpfel.o'))
+    host[18:20] = (62).to_bytes(2, 'little')  # e_machine = x86-64
+    with pytest.raises(ElfError) as info:
+        object_tokens(bytes(host))
+    assert info.value.reason == 'not_bpf'
+    with pytest.raises(ElfError) as info:
+        object_tokens(b'#include <linux/bpf.h>\n')
+    assert info.value.reason == 'not_bpf'
+
+
+def test_parse_repo_with_elf(tmp_path, gt):
+    shutil.copytree(OBJECTS, tmp_path / 'objects')
+    # Mapped from disk, like any object parse_repo reads
+    results = analyzer.parse_repo(str(tmp_path / 'objects'), FEATURES_YAML, gt=gt, elf=True)
+    assert results['helpers'] == {'bpf_ktime_get_ns': 2, 'bpf_get_current_pid_tgid': 2,
+                                  'bpf_map_lookup_elem': 2, 'bpf_redirect': 4}
+    assert results['kfuncs'] == {'cgroup_rstat_flush': 2}
+    assert results['map_types'] == {'BPF_MAP_TYPE_HASH': 2, 'BPF_MAP_TYPE_RINGBUF': 2,
+                                    'BPF_MAP_TYPE_ARRAY': 2}
+    assert results['program_types_inferred'] == {'BPF_PROG_TYPE_KPROBE': 2, 'BPF_PROG_TYPE_XDP': 4}
+    assert results['program_sections']['sec_full'] == {'kprobe/do_sys_open': 2, 'xdp': 4, '.maps': 4,
+                                                       'maps': 2, 'license': 2}
+    assert results['skipped_files'] == [{'path': 'truncated.o', 'reason': 'bad_object', 'size': 1000}]
+
+    # Without elf, objects are not candidates at all
+    plain = analyzer.parse_repo(str(tmp_path / 'objects'), FEATURES_YAML, gt=gt)
+    assert plain['helpers'] == {} and 'skipped_files' not in plain
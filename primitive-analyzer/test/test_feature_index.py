@@ -0,0 +1,93 @@
+"""
+The compiled feature index cached next to the YAML: reused while the YAML
+and INDEX_VERSION are unchanged, rebuilt (and rewritten) when either
+changes, and ignored when the file on disk is stale or corrupt.
+"""
+
+import json
+import shutil
+
+import pytest
+
+import feature_index
+from conftest import FEATURES_YAML
+from feature_index import index_path_for, load_feature_index, yaml_digest
+
+NEW_HELPER = 'bpf_test_only_helper'
+
+
+@pytest.fixture
+def features(tmp_path):
+    path = tmp_path / 'feature-versions.yaml'
+    shutil.copy(FEATURES_YAML, path)
+    return path
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    """Counts how often the YAML is compiled rather than loaded."""
+    calls = []
+    compile_index = feature_index.compile_feature_index
+
+    def counting(raw, digest):
+        calls.append(digest)
+        return compile_index(raw, digest)
+
+    monkeypatch.setattr(feature_index, 'compile_feature_index', counting)
+    return calls
+
+
+def stored_hash(features):
+    with open(index_path_for(str(features)), encoding='utf-8') as f:
+        return json.load(f)['hash']
+
+
+def test_reused_while_unchanged(features, compiles):
+    first = load_feature_index(str(features))
+    assert first['hash'] == yaml_digest(features.read_bytes())
+    assert stored_hash(features) == first['hash']
+    assert load_feature_index(str(features)) == first
+    assert len(compiles) == 1
+
+
+def test_rebuilt_when_the_yaml_changes(features, compiles):
+    before = load_feature_index(str(features))
+    assert NEW_HELPER not in before['helpers']
+
+    text = features.read_text()
+    features.write_text(text.replace('- name: helpers\n  features:\n',
+                                     f'- name: helpers\n  features:\n    - name: {NEW_HELPER}\n', 1))
+    after = load_feature_index(str(features))
+    assert NEW_HELPER in after['helpers']
+    assert after['hash'] != before['hash']
+    assert stored_hash(features) == after['hash']
+    assert len(compiles) == 2
+
+
+def test_rebuilt_when_the_index_version_changes(features, compiles, monkeypatch):
+    before = load_feature_index(str(features))
+    monkeypatch.setattr(feature_index, 'INDEX_VERSION', feature_index.INDEX_VERSION + 1)
+    after = load_feature_index(str(features))
+    assert after['hash'] != before['hash']
+    assert {k: v for k, v in after.items() if k != 'hash'} == {k: v for k, v in before.items() if k != 'hash'}
+    assert len(compiles) == 2
+
+
+@pytest.mark.parametrize('content', [
+    '{"hash": "0000"}',                 # stale: another YAML's index
+    '{"hash": "%s"}',                   # right hash, sections missing
+    '{"hash": "%s", "program_types": [',  # truncated write
+    '[]',
+    '\0\0\0',
+])
+def test_stale_or_corrupt_index_is_ignored(features, compiles, content):
+    expected = load_feature_index(str(features), use_cache=False)
+    index_file = index_path_for(str(features))
+    with open(index_file, 'w', encoding='utf-8') as f:
+        f.write(content.replace('%s', expected['hash']))
+
+    assert load_feature_index(str(features)) == expected
+    # Repaired on disk, so the next load is served from it
+    assert stored_hash(features) == expected['hash']
+    assert load_feature_index(str(features)) == expected
+    assert len(compiles) == 2
@@ -0,0 +1,98 @@
+"""
+The per-file result cache: parse_repo answers from it without changing its
+output, misses again for a file whose content changed or under a different
+feature index, and the LRU eviction keeps the trigger-maintained size total
+in step with the stored rows.
+"""
+
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+import file_cache
+import main as analyzer
+from conftest import DUMMY_REPO, FEATURES_YAML
+from file_cache import EVICT_TO, FileCache
+
+
+def scan(repo, gt, cache_path, features=FEATURES_YAML):
+    results = analyzer.parse_repo(repo, features, gt=gt, file_cache=cache_path)
+    return results, results.pop('file_cache')
+
+
+@pytest.fixture
+def repo(tmp_path):
+    shutil.copytree(DUMMY_REPO, tmp_path / 'repo')
+    return tmp_path / 'repo'
+
+
+def test_hits_misses_and_invalidation(tmp_path, gt, repo):
+    cache_path = str(tmp_path / 'cache.sqlite')
+    uncached = analyzer.parse_repo(str(repo), FEATURES_YAML, gt=gt)
+
+    results, stats = scan(str(repo), gt, cache_path)
+    assert results == uncached
+    assert stats['hits'] == 0 and stats['misses'] > 0
+    scanned = stats['misses']
+
+    results, stats = scan(str(repo), gt, cache_path)
+    assert results == uncached
+    assert stats == {'hits': scanned, 'misses': 0}
+
+    # A changed file misses; the rest still hit
+    source = sorted(repo.rglob('*.c'))[0]
+    source.write_text(source.read_text() + '\nvoid f(void) { bpf_get_prandom_u32(); }\n')
+    results, stats = scan(str(repo), gt, cache_path)
+    assert results == analyzer.parse_repo(str(repo), FEATURES_YAML, gt=gt)
+    assert stats == {'hits': scanned - 1, 'misses': 1}
+
+    # Another feature index (any change to the YAML) shares nothing
+    features = tmp_path / 'feature-versions.yaml'
+    features.write_text(open(FEATURES_YAML).read() + '\n# edited\n')
+    other_gt = analyzer.load_feature_sets(str(features))
+    assert other_gt['hash'] != gt['hash']
+    _, stats = scan(str(repo), other_gt, cache_path, str(features))
+    assert stats == {'hits': 0, 'misses': scanned}
+
+
+def stored(cache):
+    rows = dict(cache._conn.execute("SELECT key, size FROM file_counts"))
+    assert cache.size_bytes() == sum(rows.values())
+    return {key.split(':')[0] for key in rows}
+
+
+def test_lru_eviction_against_the_size_total(tmp_path, monkeypatch):
+    clock = iter(range(1, 1000))
+    monkeypatch.setattr(file_cache, 'time', SimpleNamespace(time=lambda: float(next(clock))))
+    counts = {'helpers': {'bpf_map_lookup_elem': 3}}
+    entry = len('{"helpers":{"bpf_map_lookup_elem":3}}')
+
+    cache = FileCache(str(tmp_path / 'cache.sqlite'), 'idx', max_bytes=4 * entry)
+    for digest in 'abcd':
+        cache.put(digest, counts)
+        cache.flush()
+    assert stored(cache) == set('abcd')
+
+    # Re-storing a key replaces its size in the total instead of adding to it
+    cache.put('d', {'helpers': {'bpf_map_lookup_elem': 3, 'x': 1}})
+    cache.put('d', counts)
+    cache.flush()
+    assert stored(cache) == set('abcd')
+
+    # 'a' is used again, so 'b' is now the least recently used
+    assert cache.get('a') == {'helpers': {'bpf_map_lookup_elem': 3}}
+    cache.put('e', counts)
+    cache.flush()
+    # Over the bound: evicted down to EVICT_TO of it, oldest first
+    assert stored(cache) == set('ade')
+    assert cache.size_bytes() <= 4 * entry * EVICT_TO
+    assert cache.get('b') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+    cache.close()
+
+    # The total survives reopening and other index hashes miss
+    cache = FileCache(str(tmp_path / 'cache.sqlite'), 'other', max_bytes=4 * entry)
+    assert cache.size_bytes() == 3 * entry
+    assert cache.get('a') is None
+    cache.close()
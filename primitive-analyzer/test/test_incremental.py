@@ -0,0 +1,76 @@
+"""
+incremental.py against a full scan across commits that add, change and
+delete files, including a skipped (binary) file.
+"""
+
+import json
+import shutil
+import subprocess
+
+import incremental
+from conftest import DUMMY_REPO, FEATURES_YAML
+
+
+def git(repo, *args):
+    subprocess.run(['git', '-C', str(repo), '-c', 'user.name=t', '-c', 'user.email=t@t', *args],
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+def commit_all(repo, message):
+    git(repo, 'add', '-A')
+    git(repo, 'commit', '-q', '-m', message)
+
+
+def run(repo, state, capsys, *extra):
+    code = incremental.main(['--repo', str(repo), '--state', str(state), '--features', FEATURES_YAML,
+                             '--report', '--check', *extra])
+    out, err = capsys.readouterr()
+    return code, (json.loads(out) if out else None), err
+
+
+def test_updates_match_full_scan(tmp_path, capsys):
+    repo = tmp_path / 'repo'
+    shutil.copytree(DUMMY_REPO, repo)
+    git(repo, 'init', '-q')
+    commit_all(repo, 'base')
+    state = tmp_path / 'state.json'
+
+    code, first, err = run(repo, state, capsys)
+    assert code == 0, err
+    assert first['incremental']['full_scan']
+
+    # The first file in path order now calls a helper that the base listed
+    # last, which moves it to the front of a full scan's key order
+    crlf = repo / 'crlf_prog.bpf.c'
+    crlf.write_bytes(b'int f(void) { return bpf_trace_printk(0, 0); }\r\n' + crlf.read_bytes())
+    (repo / 'blob.h').write_bytes(b'\0' * 64)
+    commit_all(repo, 'change the first file and add a binary')
+
+    code, second, err = run(repo, state, capsys)
+    assert code == 0, err
+    assert not second['incremental']['full_scan']
+    assert list(second['helpers'])[0] == 'bpf_trace_printk'
+    assert second['skipped_files'] == [{'path': 'blob.h', 'reason': 'binary', 'size': 64}]
+
+    # A later update keeps the skipped file it did not rescan
+    (repo / 'test_prog.bpf.c').unlink()
+    commit_all(repo, 'delete')
+    code, third, err = run(repo, state, capsys)
+    assert code == 0, err
+    assert third['incremental']['files_rescanned'] == 0
+    assert third['skipped_files'] == second['skipped_files']
+
+
+def test_refuses_other_scan_options(tmp_path, capsys):
+    repo = tmp_path / 'repo'
+    shutil.copytree(DUMMY_REPO, repo)
+    git(repo, 'init', '-q')
+    commit_all(repo, 'base')
+    state = tmp_path / 'state.json'
+
+    assert run(repo, state, capsys)[0] == 0
+    before = state.read_bytes()
+    code, out, err = run(repo, state, capsys, '--max-file-mb', '1')
+    assert code == 2 and out is None
+    assert 'refusing to update' in err
+    assert state.read_bytes() == before
@@ -0,0 +1,255 @@
+"""
+The job API of repo-organizer.py end to end, on file:// repos: phase
+transitions of a job, concurrent jobs for one URL sharing a single fetch
+and scan, and the clone and scan deadlines. Also /analyze-archive's
+responses to a good, a malformed and a too slow archive, and the job
+timings /metrics aggregates.
+"""
+
+import importlib.util
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+import threading
+import time
+
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+import mirror_cache
+from conftest import APP_DIR, DUMMY_REPO
+
+
+def make_remote(tmp_path, name, extra=None):
+    """A bare repo holding the dummy repo (plus `extra` files); returns its file:// URL."""
+    work = tmp_path / f'{name}-work'
+    shutil.copytree(DUMMY_REPO, work)
+    # A distinct commit per repo, so no test is answered by another's memo
+    (work / 'NAME').write_text(name)
+    for path, text in (extra or {}).items():
+        (work / path).write_text(text)
+    for args in (['init', '-q'], ['add', '-A'], ['commit', '-q', '-m', 'init']):
+        subprocess.run(['git', '-C', str(work), '-c', 'user.name=t', '-c', 'user.email=t@t', *args], check=True)
+    bare = tmp_path / f'{name}.git'
+    subprocess.run(['git', 'clone', '-q', '--bare', str(work), str(bare)], check=True)
+    return f'file://{bare}'
+
+
+@pytest.fixture(scope='module')
+def organizer(tmp_path_factory):
+    """repo-organizer.py loaded with file:// URLs allowed and state under a temp dir."""
+    base = tmp_path_factory.mktemp('organizer')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('ALLOW_FILE_URLS', '1')
+        mp.setenv('CLONE_BASE', str(base / 'repos'))
+        mp.setenv('EBPF_FILE_CACHE', 'off')
+        mp.setenv('SIMILARITY_INDEX', 'off')
+        mp.setenv('ANALYZER_WORKERS', '1')
+        spec = importlib.util.spec_from_file_location('repo_organizer', os.path.join(APP_DIR, 'repo-organizer.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    yield module
+    module.analyzer_pool.shutdown()
+
+
+@pytest.fixture
+def client(organizer):
+    return organizer.app.test_client()
+
+
+def poll(client, job_id, until, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(f'/jobs/{job_id}').get_json()
+        if until(status) or time.monotonic() > deadline:
+            return status
+        time.sleep(0.02)
+
+
+def submit(client, url):
+    resp = client.post('/jobs', json={'repo_url': url})
+    assert resp.status_code == 202
+    return resp.get_json()
+
+
+def test_job_phases(tmp_path, organizer, client, monkeypatch):
+    url = make_remote(tmp_path, 'phases')
+    release = threading.Event()
+    run_analyzer = organizer.run_analyzer
+
+    def held_scan(repo_path, timer):
+        release.wait(30)
+        return run_analyzer(repo_path, timer)
+
+    monkeypatch.setattr(organizer, 'run_analyzer', held_scan)
+    job = submit(client, url)
+    assert job['phase'] == 'queued' and job['started_at'] is None
+
+    scanning = poll(client, job['job_id'], lambda s: s['phase'] == 'scanning')
+    assert scanning['phase'] == 'scanning'
+    assert scanning['started_at'] is not None and scanning['finished_at'] is None
+    release.set()
+
+    done = poll(client, job['job_id'], lambda s: s['phase'] in ('done', 'failed'))
+    assert done['phase'] == 'done', done.get('error')
+    assert done['submitted_at'] <= done['started_at'] <= done['finished_at']
+    assert not done['result']['cached']
+    assert done['result']['results']['helpers']
+    assert client.get('/jobs/unknown').status_code == 404
+
+
+def test_concurrent_jobs_for_one_url_share_the_work(tmp_path, organizer, client, monkeypatch):
+    url = make_remote(tmp_path, 'dedup')
+    # The first job's scan waits until the second job is blocked on its
+    # result, so the two are known to overlap
+    follower_waiting = threading.Event()
+
+    class WatchedFuture(mirror_cache.Future):
+        def result(self, timeout=None):
+            follower_waiting.set()
+            return super().result(timeout)
+
+    scans = []
+    run_analyzer = organizer.run_analyzer
+
+    def counted_scan(repo_path, timer):
+        scans.append(repo_path)
+        assert follower_waiting.wait(30)
+        return run_analyzer(repo_path, timer)
+
+    monkeypatch.setattr(mirror_cache, 'Future', WatchedFuture)
+    monkeypatch.setattr(organizer, 'run_analyzer', counted_scan)
+    first = submit(client, url)
+    second = submit(client, url)
+    assert first['job_id'] != second['job_id']
+
+    results = [poll(client, job['job_id'], lambda s: s['phase'] in ('done', 'failed')) for job in (first, second)]
+    assert [r['phase'] for r in results] == ['done', 'done']
+    assert len(scans) == 1
+    # The second job got the first one's result, not a memo hit
+    assert not results[1]['result']['cached']
+    assert results[0]['result']['commit'] == results[1]['result']['commit']
+    assert results[0]['result']['results'] == results[1]['result']['results']
+
+
+def test_clone_deadline(tmp_path, organizer, client, monkeypatch):
+    url = make_remote(tmp_path, 'slow-clone')
+    # Stalls the remote side of every fetch. The hook is only honoured from
+    # global or system config, and local upload-pack drops GIT_CONFIG_COUNT.
+    hook = tmp_path / 'slow-pack.sh'
+    hook.write_text('#!/bin/sh\nsleep 5\nexec "$@"\n')
+    hook.chmod(0o755)
+    config = tmp_path / 'gitconfig'
+    config.write_text(f'[uploadpack]\n\tpackObjectsHook = {hook}\n')
+    monkeypatch.setenv('GIT_CONFIG_GLOBAL', str(config))
+    monkeypatch.setattr(organizer, 'CLONE_TIMEOUT', 1.0)
+
+    job = submit(client, url)
+    failed = poll(client, job['job_id'], lambda s: s['phase'] in ('done', 'failed'))
+    assert failed['phase'] == 'failed'
+    assert failed['error'] == 'clone phase exceeded its 1s deadline'
+    assert failed['finished_at'] - failed['started_at'] < 4
+    # A fetch killed part way is not kept as a mirror
+    assert not os.path.exists(organizer.mirror_cache.mirror_path(url))
+
+
+def test_scan_deadline(tmp_path, organizer, client, monkeypatch):
+    # Several MB of source, so a warm worker cannot finish within the deadline
+    url = make_remote(tmp_path, 'slow-scan', {'big.c': 'bpf_map_lookup_elem(&m, &k);\n' * 300000})
+    monkeypatch.setattr(organizer, 'SCAN_TIMEOUT', 0.05)
+
+    job = submit(client, url)
+    failed = poll(client, job['job_id'], lambda s: s['phase'] in ('done', 'failed'))
+    assert failed['phase'] == 'failed'
+    assert failed['error'] == 'scan phase exceeded its 0.05s deadline'
+
+    # The pool recovers: the next job scans normally
+    monkeypatch.setattr(organizer, 'SCAN_TIMEOUT', 60.0)
+    job = submit(client, url)
+    done = poll(client, job['job_id'], lambda s: s['phase'] in ('done', 'failed'))
+    assert done['phase'] == 'done', done.get('error')
+
+
+
+def tar_of(files):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w:gz') as tar:
+        for name, text in files.items():
+            raw = text.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(raw)
+            tar.addfile(info, io.BytesIO(raw))
+    return buf.getvalue()
+
+
+def test_analyze_archive(organizer, client, monkeypatch):
+    resp = client.post('/analyze-archive', data=tar_of({'p.bpf.c': 'bpf_ktime_get_ns();'}))
+    assert resp.status_code == 200
+    assert resp.get_json()['results']['helpers'] == {'bpf_ktime_get_ns': 1}
+
+    # Not an archive: the client's fault
+    resp = client.post('/analyze-archive', data=b'int x;\n' * 100)
+    assert resp.status_code == 400
+    assert resp.get_json()['error'].startswith('not a readable tar or zip archive')
+
+    # Held past the scan deadline: the worker is killed and the pool recovers
+    monkeypatch.setattr(organizer, 'SCAN_TIMEOUT', 0.05)
+    big = tar_of({'big.c': 'bpf_map_lookup_elem(&m, &k);\n' * 300000})
+    resp = client.post('/analyze-archive', data=big)
+    assert resp.status_code == 504
+    assert resp.get_json()['error'] == 'scan phase exceeded its 0.05s deadline'
+    monkeypatch.setattr(organizer, 'SCAN_TIMEOUT', 60.0)
+    assert client.post('/analyze-archive', data=big).status_code == 200
+
+
+def test_analyze_archive_worker_failure_is_a_server_error(organizer, client, monkeypatch):
+    def crash(data, timeout=None):
+        raise RuntimeError("analyzer worker crashed: killed")
+
+    monkeypatch.setattr(organizer.analyzer_pool, 'analyze_archive', crash)
+    resp = client.post('/analyze-archive', data=tar_of({'p.bpf.c': ''}))
+    assert resp.status_code == 500
+    assert 'worker crashed' in resp.get_json()['error']
+
+
+def metric_values(client):
+    resp = client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.content_type.startswith('text/plain')
+    return {(s.name, tuple(sorted(s.labels.items()))): s.value
+            for family in text_string_to_metric_families(resp.get_data(as_text=True)) for s in family.samples}
+
+
+def test_job_timings_feed_metrics(tmp_path, organizer, client):
+    url = make_remote(tmp_path, 'metrics')
+    before = metric_values(client)
+
+    def delta(name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        return metric_values(client).get(key, 0.0) - before.get(key, 0.0)
+
+    first = poll(client, submit(client, url)['job_id'], lambda s: s['phase'] in ('done', 'failed'))
+    assert first['phase'] == 'done', first.get('error')
+    timings = first['result']['timings']
+    assert set(timings['phases']) == {'queue_wait', 'resolve', 'fetch', 'materialize', 'walk', 'read', 'scan',
+                                      'store'}
+    assert timings['counters'] == {'result_memo_misses': 1, 'files_scanned': 4,
+                                   'bytes_read': timings['counters']['bytes_read']}
+    assert timings['counters']['bytes_read'] > 0
+
+    # Same commit again: answered by the result memo, nothing is scanned
+    second = poll(client, submit(client, url)['job_id'], lambda s: s['phase'] in ('done', 'failed'))
+    assert second['result']['cached']
+    assert 'scan' not in second['result']['timings']['phases']
+
+    assert delta('organizer_jobs_finished_total', outcome='done') == 2
+    assert delta('organizer_analysis_seconds_count', kind='repo') == 2
+    assert delta('organizer_phase_seconds_count', phase='resolve') == 2
+    assert delta('organizer_phase_seconds_count', phase='scan') == 1
+    assert delta('organizer_files_scanned_total') == 4
+    assert delta('organizer_bytes_read_total') == timings['counters']['bytes_read']
+    assert delta('organizer_cache_lookups_total', cache='result_memo', outcome='miss') == 1
+    assert delta('organizer_cache_lookups_total', cache='result_memo', outcome='hit') == 1
+    assert metric_values(client)[('organizer_jobs', (('state', 'running'),))] == 0
@@ -0,0 +1,139 @@
+"""
+MirrorCache against a local bare repository (file:// URL): first fetch,
+memo hit on an unchanged HEAD, refetch after a new commit, and a sparse
+fetch that writes only the analyzer's candidate files.
+"""
+
+import os
+import subprocess
+
+import pytest
+
+import main as analyzer
+from conftest import FEATURES_YAML
+from mirror_cache import MirrorCache, missing_objects
+
+INDEX_HASH = 'test-index'
+
+
+def git(repo, *args):
+    return subprocess.run(['git', '-C', str(repo), '-c', 'user.name=t', '-c', 'user.email=t@t', *args],
+                          check=True, stdout=subprocess.PIPE, text=True).stdout
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """(work tree, file:// URL of its bare remote) with one commit pushed."""
+    bare = tmp_path / 'remote.git'
+    work = tmp_path / 'work'
+    subprocess.run(['git', 'init', '-q', '--bare', str(bare)], check=True)
+    # Lets sparse mode fetch blobless and then ask for single blobs
+    git(bare, 'config', 'uploadpack.allowFilter', 'true')
+    git(bare, 'config', 'uploadpack.allowAnySHA1InWant', 'true')
+    subprocess.run(['git', 'clone', '-q', str(bare), str(work)], check=True, stderr=subprocess.DEVNULL)
+
+    (work / 'src').mkdir()
+    (work / 'src' / 'prog.bpf.c').write_text('SEC("xdp") int f(void *c) { return bpf_redirect(0, 0); }\n')
+    (work / 'src' / 'util.h').write_text('#define X 1\n')
+    (work / 'README.md').write_text('readme\n')
+    (work / 'logo.png').write_bytes(b'\x89PNG' + b'\0' * 4096)
+    (work / 'node_modules').mkdir()
+    (work / 'node_modules' / 'dep.c').write_text('int dep;\n')
+    commit_and_push(work, 'first')
+    return work, f'file://{bare}'
+
+
+def commit_and_push(work, message):
+    git(work, 'add', '-A')
+    git(work, 'commit', '-q', '-m', message)
+    git(work, 'push', '-q', 'origin', 'HEAD')
+
+
+class Scanner:
+    """A scan callback that records what it saw."""
+
+    def __init__(self):
+        self.trees = []
+
+    def __call__(self, workdir):
+        files = sorted(os.path.relpath(os.path.join(d, f), workdir).replace(os.sep, '/')
+                       for d, _, names in os.walk(workdir) for f in names)
+        self.trees.append(files)
+        return {'files': files}
+
+
+def test_fetch_memo_hit_and_refetch(tmp_path, remote):
+    work, url = remote
+    cache = MirrorCache(str(tmp_path / 'cache'))
+    scan = Scanner()
+
+    first = cache.analyze(url, INDEX_HASH, scan, str(tmp_path / 'work-base'))
+    assert not first['cached']
+    assert first['commit'] == git(work, 'rev-parse', 'HEAD').strip()
+    assert first['clone_log']
+    assert 'logo.png' in first['results']['files']
+    assert os.path.isdir(cache.mirror_path(url))
+
+    again = cache.analyze(url, INDEX_HASH, scan, str(tmp_path / 'work-base'))
+    assert again['cached'] and again['commit'] == first['commit']
+    assert again['results'] == first['results']
+    assert again['clone_log'] == ''
+    assert len(scan.trees) == 1
+
+    (work / 'src' / 'new.bpf.c').write_text('int g;\n')
+    commit_and_push(work, 'second')
+    third = cache.analyze(url, INDEX_HASH, scan, str(tmp_path / 'work-base'))
+    assert not third['cached']
+    assert third['commit'] == git(work, 'rev-parse', 'HEAD').strip() != first['commit']
+    assert 'src/new.bpf.c' in third['results']['files']
+    assert len(scan.trees) == 2
+    # Work directories are removed unless keep=True
+    assert os.listdir(tmp_path / 'work-base') == []
+
+
+def test_sparse_writes_only_candidates(tmp_path, remote):
+    _, url = remote
+    cache = MirrorCache(str(tmp_path / 'cache'))
+    scan = Scanner()
+
+    out = cache.analyze(url, INDEX_HASH, scan, str(tmp_path / 'work-base'), fetch='sparse')
+    assert out['fetch']['mode'] == 'sparse'
+    assert scan.trees == [['src/prog.bpf.c', 'src/util.h']]
+    assert out['fetch']['files_materialized'] == 2
+
+    # The blobs that were not written were never fetched either
+    mirror = cache.mirror_path(url, sparse=True)
+    listed = git(mirror, 'ls-tree', '-r', out['commit']).splitlines()
+    blobs = {line.split('\t')[1]: line.split()[2] for line in listed}
+    missing = missing_objects(mirror, out['commit'])
+    assert {blobs['logo.png'], blobs['README.md'], blobs['node_modules/dep.c']} <= missing
+    assert not {blobs['src/prog.bpf.c'], blobs['src/util.h']} & missing
+
+
+def test_sparse_resolves_symlinks_like_a_checkout(tmp_path, remote, gt):
+    work, url = remote
+    (work / 'docs').mkdir()
+    (work / 'docs' / 'prog.txt').write_text('int f(void) { return bpf_get_prandom_u32(); }\n')
+    links = {
+        'src/link.bpf.c': 'prog.bpf.c',             # a candidate
+        'src/alias.c': '../docs/prog.txt',          # a file sparse mode would not fetch
+        'src/chain.h': 'link.bpf.c',                # a link to a link
+        'via_dir.c': 'lib/prog.bpf.c',              # through a directory link
+        'lib': 'src',                               # a directory: never descended
+        'src/gone.c': 'missing.c',                  # dangling
+        'src/out.c': '../../outside.c',             # leaves the tree
+    }
+    for path, target in links.items():
+        os.symlink(target, work / path)
+    commit_and_push(work, 'links')
+
+    def scan(workdir):
+        return analyzer.parse_repo(workdir, FEATURES_YAML, gt=gt)
+
+    full = MirrorCache(str(tmp_path / 'full')).analyze(url, INDEX_HASH, scan, str(tmp_path / 'wb'))
+    sparse = MirrorCache(str(tmp_path / 'sparse')).analyze(url, INDEX_HASH, scan, str(tmp_path / 'wb'),
+                                                           fetch='sparse')
+    assert sparse['results'] == full['results']
+    # prog.bpf.c read through itself, link.bpf.c, chain.h and via_dir.c
+    assert full['results']['helpers']['bpf_redirect'] == 4
+    assert full['results']['helpers']['bpf_get_prandom_u32'] == 1
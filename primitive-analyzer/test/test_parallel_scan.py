@@ -0,0 +1,37 @@
+"""
+parse_repo(jobs=N) must produce the serial scan's JSON, key order
+included (see scan_files_parallel).
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import main as analyzer
+from conftest import APP_DIR, DUMMY_REPO, FEATURES_YAML
+
+sys.path.insert(0, os.path.join(APP_DIR, 'benchmarks'))
+
+import synth_repo  # noqa: E402
+
+
+def test_parallel_scan_matches_serial(tmp_path, monkeypatch, gt):
+    repo = tmp_path / 'repo'
+    shutil.copytree(DUMMY_REPO, repo / 'dummy')
+    synth_repo.generate(str(repo), synth_repo.SynthSpec(files=40, headers=1, header_kb=64), gt)
+    # A binary candidate, so skipped_files order is compared as well
+    (repo / 'dummy' / 'blob.h').write_bytes(b'\0' * 4096)
+
+    # Small repos stay serial; force the pool for this one
+    monkeypatch.setattr(analyzer, 'PARALLEL_MIN_BYTES', 0)
+    chunked = []
+    chunk_by_size = analyzer.chunk_by_size
+    monkeypatch.setattr(analyzer, 'chunk_by_size', lambda *a: chunked.append(1) or chunk_by_size(*a))
+
+    serial = analyzer.parse_repo(str(repo), FEATURES_YAML, gt=gt, jobs=1)
+    parallel = analyzer.parse_repo(str(repo), FEATURES_YAML, gt=gt, jobs=4)
+
+    assert chunked, "jobs=4 did not take the parallel path"
+    assert serial.get('skipped_files')
+    assert json.dumps(parallel, indent=2) == json.dumps(serial, indent=2)
@@ -0,0 +1,110 @@
+"""
+parse_repo output on test/dummy_repo, pinned byte for byte (values and key
+order) against test/expected/dummy_repo.json. The fixture covers a CRLF
+file, a non-ASCII file (Unicode \\w scan) and __section()/section attribute
+programs next to plain SEC() ones. A small loader source pins the
+sections counted on top of the original six (syscall commands, flags,
+kfuncs, ...), which the dummy repo barely touches.
+
+After an intended output change, regenerate the expected file with:
+
+  python -c "import json, main; print(json.dumps(main.parse_repo('test/dummy_repo',
+             'data/feature-versions.yaml'), indent=2))" > test/expected/dummy_repo.json
+"""
+
+import json
+import os
+
+import main as analyzer
+from conftest import DUMMY_REPO, FEATURES_YAML, TEST_DIR
+
+EXPECTED = os.path.join(TEST_DIR, 'expected', 'dummy_repo.json')
+
+
+def read(name: str) -> bytes:
+    with open(os.path.join(DUMMY_REPO, name), 'rb') as f:
+        return f.read()
+
+
+def test_fixture_line_endings_and_encoding():
+    # Guards against a checkout normalizing the fixture (see .gitattributes)
+    assert b'\r\n' in read('crlf_prog.bpf.c')
+    assert not read('unicode_prog.bpf.c').isascii()
+
+
+def test_parse_repo_matches_expected(gt):
+    results = analyzer.parse_repo(DUMMY_REPO, FEATURES_YAML, gt=gt)
+    with open(EXPECTED, 'r', encoding='utf-8') as f:
+        expected = f.read()
+    assert json.dumps(results, indent=2) + '\n' == expected
+
+
+def test_ascii_fast_path_matches_unicode_scan():
+    for name in ('test_prog.bpf.c', 'crlf_prog.bpf.c', 'section_prog.bpf.c'):
+        text = read(name).decode('ascii')
+        assert analyzer.RE_SCAN_ASCII.findall(text) == analyzer.RE_SCAN.findall(text)
+
+
+def test_non_ascii_identifier_is_not_a_helper_call(gt):
+    counts = analyzer.scan_text(read('unicode_prog.bpf.c').decode('utf-8'), gt)
+    # ébpf_ktime_get_ns() is called too, but is a different identifier
+    assert counts['helpers']['bpf_ktime_get_ns'] == 1
+    assert counts['map_types']['BPF_MAP_TYPE_LRU_HASH'] == 1
+
+
+def test_section_attribute_programs(gt):
+    counts = analyzer.scan_text(read('section_prog.bpf.c').decode('ascii'), gt)
+    assert list(counts['sec_full']) == ['maps', 'sk_msg', 'xdp', 'license']
+    assert counts['program_types_inferred'] == {'BPF_PROG_TYPE_SK_MSG': 1, 'BPF_PROG_TYPE_XDP': 1}
+
+
+def test_crlf_counts_like_lf(gt):
+    raw = read('crlf_prog.bpf.c').decode('ascii')
+    assert analyzer.scan_text(raw, gt) == analyzer.scan_text(raw.replace('\r\n', '\n'), gt)
+
+
+def test_objects_only_with_elf(tmp_path, gt):
+    # A host object, as in any build tree: ignored unless asked for
+    (tmp_path / 'prog.bpf.c').write_bytes(read('test_prog.bpf.c'))
+    with open('/bin/true', 'rb') as f:
+        (tmp_path / 'main.o').write_bytes(f.read())
+
+    plain = analyzer.parse_repo(str(tmp_path), FEATURES_YAML, gt=gt)
+    assert 'skipped_files' not in plain
+    with_elf = analyzer.parse_repo(str(tmp_path), FEATURES_YAML, gt=gt, elf=True)
+    assert [(e['path'], e['reason']) for e in with_elf['skipped_files']] == [('main.o', 'not_bpf')]
+    del with_elf['skipped_files']
+    assert with_elf == plain
+
+
+EXTRA_SECTIONS_SOURCE = '''
+int load(void) {
+    bpf(BPF_MAP_CREATE, &attr, sizeof(attr));
+    bpf(BPF_MAP_CREATE, &attr, sizeof(attr));
+    link.type = BPF_LINK_TYPE_XDP;
+    opts.flags = BPF_F_ALLOW_OVERRIDE | BPF_F_REPLACE;
+    order = BPF_CGROUP_ITER_ORDER_UNSPEC;
+    switch (skops->op) { case BPF_SOCK_OPS_VOID: break; }
+    bpf_setsockopt(skops, SOL_TCP, TCP_BPF_IW, &v, sizeof(v));
+    cgroup_rstat_flush(cgrp);
+    /* kfuncs only count where they are called */
+    void *p = &bpf_lookup_user_key;
+    return 0;
+}
+'''
+
+
+def test_extra_sections(tmp_path, gt):
+    (tmp_path / 'loader.c').write_text(EXTRA_SECTIONS_SOURCE)
+    results = analyzer.parse_repo(str(tmp_path), FEATURES_YAML, gt=gt)
+    assert list(results)[6:] == list(analyzer.EXTRA_TOKEN_KINDS)
+    assert {kind: results[kind] for kind in analyzer.EXTRA_TOKEN_KINDS} == {
+        'syscall_commands': {'BPF_MAP_CREATE': 2},
+        'link_type': {'BPF_LINK_TYPE_XDP': 1},
+        'flags': {'BPF_F_ALLOW_OVERRIDE': 1, 'BPF_F_REPLACE': 1},
+        'argument_constants': {'BPF_CGROUP_ITER_ORDER_UNSPEC': 1},
+        'sock_ops': {'BPF_SOCK_OPS_VOID': 1},
+        'sock_opt_types': {'TCP_BPF_IW': 1},
+        'kfuncs': {'cgroup_rstat_flush': 1},
+    }
+    assert results['helpers'] == {'bpf_setsockopt': 1}
@@ -0,0 +1,91 @@
+"""
+reader.py's chunking and skip policy. With the chunk size forced down to a
+few bytes, mapped files are cut inside SEC("...") literals, next to
+multi-byte UTF-8 and \\r\\n, and around delimiter-free runs longer than a
+chunk, and still scan exactly like the whole file. Binary and oversized
+files are skipped and reported with their reason.
+"""
+
+import functools
+
+import pytest
+
+import main as analyzer
+import reader
+from conftest import DUMMY_REPO, FEATURES_YAML
+
+SOURCE = (
+    '// crème brûlée;}\r\n'
+    'SEC("kprobe/do_sys_open;}") int probe(void *ctx) {\r\n'
+    '    __u64 id = bpf_get_current_pid_tgid(); /* é; } */\r\n'
+    '    bpf_map_lookup_elem(&counts, &id);\r\n'
+    '}\r\n'
+    'struct { __uint(type, BPF_MAP_TYPE_LRU_HASH); } counts SEC(".maps");\n'
+    + 'int ' + 'very_long_identifier_' * 40 + ' = BPF_ANY;\n'
+    + 'SEC("xdp") int x(struct xdp_md *ctx) { bpf_redirect(1, 0); return XDP_PASS; }\n'
+) * 3
+
+
+def small_chunks(monkeypatch, size):
+    """Maps any file over `size` bytes and scans it `size` bytes at a time."""
+    monkeypatch.setattr(reader, 'CHUNK_BYTES', size)
+    monkeypatch.setattr(analyzer, 'iter_chunks', functools.partial(reader.iter_chunks, chunk_bytes=size))
+
+
+@pytest.mark.parametrize('size', [1, 7, 16, 64, 1000])
+def test_chunks_split_only_after_delimiters(size):
+    raw = SOURCE.encode()
+    chunks = list(reader.iter_chunks(raw, size))
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(raw)
+    assert all(end == start for (_, end), (start, _) in zip(chunks, chunks[1:]))
+    for _, end in chunks[:-1]:
+        assert raw[end - 1:end] in reader.CHUNK_DELIMS
+    # Every chunk decodes on its own and the tokens are those of the whole text
+    tokens = [t for start, end in chunks for t in analyzer.RE_SCAN.findall(raw[start:end].decode())]
+    assert tokens == analyzer.RE_SCAN.findall(SOURCE)
+
+
+@pytest.mark.parametrize('size', [1, 7, 16, 64, 1000])
+def test_mapped_scan_matches_whole_file(tmp_path, monkeypatch, gt, size):
+    path = tmp_path / 'prog.bpf.c'
+    path.write_bytes(SOURCE.encode())
+    expected = analyzer.scan_text(SOURCE, gt)
+    assert expected['helpers']['bpf_redirect'] == 3
+
+    small_chunks(monkeypatch, size)
+    with reader.open_buffer(str(path)) as buf:
+        assert isinstance(buf, reader.mmap.mmap)
+        assert analyzer.scan_buffer(buf, gt) == expected
+
+
+@pytest.mark.parametrize('size', [16, 256])
+def test_parse_repo_with_small_chunks(monkeypatch, gt, size):
+    expected = analyzer.parse_repo(DUMMY_REPO, FEATURES_YAML, gt=gt)
+    small_chunks(monkeypatch, size)
+    assert analyzer.parse_repo(DUMMY_REPO, FEATURES_YAML, gt=gt) == expected
+
+
+@pytest.mark.parametrize('chunk', [reader.CHUNK_BYTES, 64])
+def test_skip_reasons(tmp_path, monkeypatch, gt, chunk):
+    # Both the read and the mapped path apply the policy
+    small_chunks(monkeypatch, chunk)
+    call = b'bpf_get_prandom_u32();\n'
+    limit = 2 * reader.SNIFF_BYTES
+    late = reader.SNIFF_BYTES // len(call) + 1
+    (tmp_path / 'ok.c').write_bytes(call)
+    (tmp_path / 'blob.h').write_bytes(call * 10 + b'\0' + call)
+    # NUL bytes past the sniff window do not make a binary
+    (tmp_path / 'late_nul.c').write_bytes(call * late + b'\0')
+    (tmp_path / 'big.c').write_bytes(call * (limit // len(call) + 1))
+
+    results = analyzer.parse_repo(str(tmp_path), FEATURES_YAML, gt=gt, max_file_bytes=limit)
+    assert results['helpers'] == {'bpf_get_prandom_u32': 1 + late}
+    assert sorted(results['skipped_files'], key=lambda e: e['path']) == [
+        {'path': 'big.c', 'reason': 'too_large', 'size': len(call) * (limit // len(call) + 1)},
+        {'path': 'blob.h', 'reason': 'binary', 'size': len(call) * 11 + 1},
+    ]
+
+    with pytest.raises(reader.SkipFile) as info:
+        with reader.open_buffer(str(tmp_path / 'blob.h')):
+            pass
+    assert (info.value.reason, info.value.size) == ('binary', len(call) * 11 + 1)
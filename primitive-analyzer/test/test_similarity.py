@@ -0,0 +1,106 @@
+"""
+SimilarityIndex on synthetic feature sets: repos added one by one with
+update() (pending band entries, then merged) answer queries like an
+index built in one go with add_many() and find the close matches the
+exact linear scan finds, re-analyzed and removed repos stop matching
+under their old features, and a saved index loads back with the same
+answers.
+"""
+
+import random
+
+import pytest
+
+import similarity
+from similarity import SimilarityIndex, feature_set, repo_key
+
+HELPERS = [f'bpf_helper_{i}' for i in range(40)]
+MAPS = [f'BPF_MAP_TYPE_{i}' for i in range(12)]
+
+
+def results_of(helpers=(), maps=(), attach=(), progs=()):
+    return {'helpers': {h: 1 for h in helpers}, 'map_types': {m: 2 for m in maps},
+            'attach_types': {a: 1 for a in attach}, 'program_types_inferred': {p: 1 for p in progs}}
+
+
+def corpus(n, seed=0):
+    rng = random.Random(seed)
+    return [(f'https://github.com/o/repo{i}', results_of(rng.sample(HELPERS, rng.randint(3, 15)),
+                                                        rng.sample(MAPS, rng.randint(1, 4))))
+            for i in range(n)]
+
+
+def near_copy(results, drop=1):
+    helpers = sorted(results['helpers'])[drop:]
+    return results_of(helpers, results['map_types'])
+
+
+def test_feature_set_and_repo_key():
+    results = results_of(['bpf_redirect'], ['BPF_MAP_TYPE_HASH'], ['xdp'], ['BPF_PROG_TYPE_XDP'])
+    results['helpers']['bpf_unused'] = 0
+    assert feature_set(results) == ['attach:xdp', 'helper:bpf_redirect', 'map:BPF_MAP_TYPE_HASH',
+                                    'prog:BPF_PROG_TYPE_XDP']
+    assert repo_key('https://github.com/o/r.git/') == repo_key(' https://github.com/o/r') == 'https://github.com/o/r'
+
+
+def test_incremental_updates_match_a_bulk_build(monkeypatch):
+    # Keep some updates pending between merges
+    monkeypatch.setattr(similarity, 'MERGE_MIN', 16)
+    repos = corpus(120)
+    bulk = SimilarityIndex()
+    assert bulk.add_many(repos) == {'added': 120, 'updated': 0, 'unchanged': 0}
+
+    incremental = SimilarityIndex()
+    assert [incremental.update(source, results) for source, results in repos] == ['added'] * 120
+    assert len(incremental) == len(bulk) == 120
+    assert incremental.stats()['pending'] > 0
+
+    for source, results in repos[::7]:
+        query = near_copy(results)
+        found = incremental.query(query, k=5)
+        assert found == bulk.query(query, k=5)
+        # LSH finds the close matches the linear scan does (weak ones it may miss)
+        assert (incremental.query(query, k=5, min_score=0.7)['results']
+                == incremental.exact_query(query, k=5, min_score=0.7)['results'])
+        top = found['results'][0]
+        assert top['repo'] == source
+        assert top['jaccard'] == pytest.approx(len(feature_set(query)) / len(feature_set(results)), abs=1e-4)
+        assert incremental.similar_to(source, k=3)['results'] == bulk.similar_to(source, k=3)['results']
+
+
+def test_reanalyzed_and_removed_repos():
+    repos = corpus(50, seed=1)
+    index = SimilarityIndex()
+    index.add_many(repos)
+    source, old = repos[0]
+    new = results_of(['bpf_redirect', 'bpf_xdp_adjust_head', 'bpf_fib_lookup'], ['BPF_MAP_TYPE_DEVMAP'])
+
+    assert index.update(source, old) == 'unchanged'
+    assert index.update(source + '.git', new) == 'updated'
+    assert len(index) == 50
+    assert index.features_of(source) == feature_set(new)
+    assert index.query(new, k=1)['results'][0] == {'repo': source, 'jaccard': 1.0, 'shared': 4, 'features': 4}
+    assert all(r['repo'] != source for r in index.query(old, k=10)['results'])
+
+    other, other_results = repos[1]
+    assert index.remove(other) and not index.remove(other)
+    assert other not in index and len(index) == 49
+    assert all(r['repo'] != other for r in index.query(other_results, k=10)['results'])
+    with pytest.raises(KeyError):
+        index.similar_to(other)
+
+
+def test_save_and_load(tmp_path):
+    index = SimilarityIndex()
+    repos = corpus(60, seed=2)
+    index.add_many(repos[:40])
+    for source, results in repos[40:]:
+        index.update(source, results)
+    index.remove(repos[3][0])
+    path = str(tmp_path / 'sim.npz')
+    index.save(path)
+
+    loaded = SimilarityIndex.load(path)
+    assert len(loaded) == 59
+    for _, results in repos[::5]:
+        assert loaded.query(results, k=5) == index.query(results, k=5)
@@ -0,0 +1,73 @@
+"""
+Phase timings: parse_repo charges its work to the load_index, walk, read
+and scan phases and counts the files and bytes it scanned, serially and
+with a process pool alike, and the CLI's --profile prints that breakdown
+to stderr without touching the results on stdout.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+import main as analyzer
+from conftest import APP_DIR, DUMMY_REPO, FEATURES_YAML
+from timing import PhaseTimer, format_breakdown
+
+DUMMY_FILES = sorted(os.listdir(DUMMY_REPO))
+DUMMY_BYTES = sum(os.path.getsize(os.path.join(DUMMY_REPO, name)) for name in DUMMY_FILES)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_parse_repo_phases_and_counters(monkeypatch, jobs):
+    # Scan even the small dummy repo with the pool when asked to
+    monkeypatch.setattr(analyzer, 'PARALLEL_MIN_BYTES', 0)
+    timer = PhaseTimer()
+    analyzer.parse_repo(DUMMY_REPO, FEATURES_YAML, timer=timer, jobs=jobs)
+    timings = timer.as_dict()
+
+    assert list(timings['phases']) == ['load_index', 'walk', 'read', 'scan']
+    assert all(seconds >= 0 for seconds in timings['phases'].values())
+    assert timings['counters'] == {'files_scanned': len(DUMMY_FILES), 'bytes_read': DUMMY_BYTES}
+    assert timings['total'] > 0
+
+
+def test_merge_adds_worker_breakdowns():
+    timer = PhaseTimer()
+    timer.add('fetch', 1.5)
+    timer.merge({'phases': {'scan': 2.0, 'fetch': 0.5}, 'counters': {'files_scanned': 3}})
+    timer.merge({'phases': {'scan': 1.0}, 'counters': {'files_scanned': 2, 'bytes_read': 10}})
+    timer.merge(None)
+    timings = timer.as_dict()
+    assert timings['phases'] == {'fetch': 2.0, 'scan': 3.0}
+    assert timings['counters'] == {'files_scanned': 5, 'bytes_read': 10}
+
+    table = format_breakdown({'total': 4.0, 'phases': timings['phases'], 'counters': timings['counters']})
+    assert table.splitlines() == [
+        'Profile (4.000 s total):',
+        '  fetch              2.000 s   50.0%',
+        '  scan               3.000 s   75.0%',
+        '  files_scanned            5',
+        '  bytes_read              10',
+        '  (phase times are summed over parallel workers)',
+        '  scan rate            0.0 MB/s',
+    ]
+
+
+def test_cli_profile(gt):
+    proc = subprocess.run([sys.executable, os.path.join(APP_DIR, 'main.py'), '--repo', DUMMY_REPO,
+                           '--features', FEATURES_YAML, '--json', '--profile'],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=APP_DIR, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout) == analyzer.parse_repo(DUMMY_REPO, FEATURES_YAML, gt=gt)
+
+    lines = proc.stderr.splitlines()
+    assert re.fullmatch(r'Profile \([\d.]+ s total\):', lines[0])
+    phases = [m.group(1) for m in map(re.compile(r'  (\w+) +[\d.]+ s +[\d.]+%').fullmatch, lines) if m]
+    assert phases == ['load_index', 'walk', 'read', 'scan', 'serialize']
+    assert f'  files_scanned  {len(DUMMY_FILES):>11}' in lines
+    assert f'  bytes_read     {DUMMY_BYTES:>11}' in lines
+    assert re.fullmatch(r'  scan rate +[\d.]+ MB/s', lines[-1])
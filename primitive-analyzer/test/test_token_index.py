@@ -0,0 +1,108 @@
+"""
+Token indexes: a repo's index survives a save/load round trip unchanged,
+and recounting it gives exactly parse_repo's output, whether the index
+was built by a serial or a pooled scan and under the YAML it was built
+with or a newer one. Files that are not indexes are rejected.
+"""
+
+import json
+import shutil
+
+import pytest
+
+import main as analyzer
+import recount
+from conftest import DUMMY_REPO, FEATURES_YAML
+from token_index import FORMAT_VERSION, MAGIC, TokenIndex, TokenIndexError
+
+NEW_KFUNC = 'bpf_test_only_kfunc'
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """The dummy repo plus a skipped binary and a call only a newer YAML knows."""
+    root = tmp_path / 'repo'
+    shutil.copytree(DUMMY_REPO, root)
+    (root / 'blob.h').write_bytes(b'\0\1\2')
+    (root / 'later.bpf.c').write_text(f'int f(void) {{ return {NEW_KFUNC}(1) + bpf_ktime_get_ns(); }}\n')
+    return str(root)
+
+
+@pytest.fixture
+def newer_yaml(tmp_path):
+    path = tmp_path / 'feature-versions.yaml'
+    text = open(FEATURES_YAML, encoding='utf-8').read()
+    path.write_text(text.replace('- name: kfuncs\n  features:\n',
+                                 f'- name: kfuncs\n  features:\n    - name: {NEW_KFUNC}\n', 1))
+    return str(path)
+
+
+def build_index(repo, gt, jobs):
+    index = TokenIndex({'source': repo})
+    results = analyzer.parse_repo(repo, FEATURES_YAML, gt=gt, jobs=jobs, token_index=index)
+    return index, results
+
+
+def test_round_trip(tmp_path, gt, repo):
+    index, _ = build_index(repo, gt, 1)
+    path = str(tmp_path / 'repo.tokidx')
+    assert index.save(path) > 0
+    loaded = TokenIndex.load(path)
+
+    assert loaded.meta == index.meta
+    assert loaded.meta['skipped_files'] == [{'path': 'blob.h', 'reason': 'binary', 'size': 3}]
+    # The dummy repo's four sources and later.bpf.c; blob.h was skipped
+    assert loaded.files == index.files == 5
+    assert loaded.strings == index.strings
+    assert list(loaded.ints) == list(index.ints)
+    assert list(loaded.iter_entries()) == list(index.iter_entries())
+    # Only feature-shaped tokens are kept
+    tokens = {tok for entries, _ in loaded.iter_entries() for (tok, _), _ in entries}
+    assert 'bpf_ktime_get_ns' in tokens and 'BPF_MAP_TYPE_LRU_HASH' in tokens
+    assert 'ctx' not in tokens
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_recount_matches_parse_repo(tmp_path, monkeypatch, gt, repo, newer_yaml, jobs):
+    # Scan the small repo with the pool too
+    monkeypatch.setattr(analyzer, 'PARALLEL_MIN_BYTES', 0)
+    index, results = build_index(repo, gt, jobs)
+    path = str(tmp_path / 'repo.tokidx')
+    index.save(path)
+    loaded = TokenIndex.load(path)
+
+    assert recount.recount_index(loaded, gt) == results
+    assert NEW_KFUNC not in results['kfuncs']
+
+    # Under a YAML that learned a kfunc, without reading the repo again
+    newer = analyzer.load_feature_sets(newer_yaml)
+    recounted = recount.recount_index(loaded, newer)
+    assert recounted == analyzer.parse_repo(repo, newer_yaml, gt=newer)
+    assert recounted['kfuncs'][NEW_KFUNC] == 1
+
+
+def test_recount_cli(tmp_path, gt, repo, newer_yaml, capsys):
+    index_dir = tmp_path / 'indexes'
+    index_dir.mkdir()
+    build_index(repo, gt, 1)[0].save(str(index_dir / 'repo.tokidx'))
+    (index_dir / 'broken.tokidx').write_bytes(b'not an index')
+    out = tmp_path / 'recount.jsonl'
+
+    assert recount.main([str(index_dir), '--features', newer_yaml, '--output', str(out)]) == 1
+    [record] = [json.loads(ln) for ln in out.read_text().splitlines()]
+    assert record['source'] == repo
+    newer = analyzer.load_feature_sets(newer_yaml)
+    assert record['results'] == analyzer.parse_repo(repo, newer_yaml, gt=newer)
+    err = capsys.readouterr().err
+    assert 'broken.tokidx: not a token index' in err
+    assert 'recounted 1 repos (5 files)' in err and '1 unreadable' in err
+
+
+def test_rejects_other_files():
+    with pytest.raises(TokenIndexError, match='not a token index'):
+        TokenIndex.from_bytes(b'PK\3\4 zip data')
+    data = TokenIndex({'source': 'x'}).to_bytes().replace(f'"version":{FORMAT_VERSION}'.encode(),
+                                                          f'"version":{FORMAT_VERSION + 1}'.encode())
+    assert data.startswith(MAGIC)
+    with pytest.raises(TokenIndexError, match='unsupported token index version'):
+        TokenIndex.from_bytes(data)
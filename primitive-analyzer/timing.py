@@ -0,0 +1,88 @@
+"""
+Phase timing for analyses
+
+A PhaseTimer accumulates wall time per named phase (walk, read, scan,
+fetch, ...) and plain counters (files scanned, bytes read, cache hits)
+for one analysis. Timers from worker processes travel back as dicts and
+are merged into the caller's with merge().
+
+Phases and counters keep the order they were first recorded in, so a
+breakdown reads in pipeline order.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._start = time.perf_counter()
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed_iter(self, iterable: Iterable[T], phase: str) -> Iterator[T]:
+        """Yields from `iterable`, charging the time spent producing items to `phase`."""
+        it = iter(iterable)
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add(phase, clock() - start)
+                return
+            self.add(phase, clock() - start)
+            yield item
+
+    def merge(self, other: Optional[Dict]) -> None:
+        """Adds a timer's as_dict() output (e.g. from a worker) to this one."""
+        if not other:
+            return
+        for phase, seconds in other.get('phases', {}).items():
+            self.add(phase, seconds)
+        for name, n in other.get('counters', {}).items():
+            self.count(name, n)
+
+    def as_dict(self) -> Dict:
+        return {
+            'total': round(time.perf_counter() - self._start, 6),
+            'phases': {k: round(v, 6) for k, v in self.phases.items()},
+            'counters': dict(self.counters),
+        }
+
+
+def format_breakdown(timings: Dict) -> str:
+    """Human-readable table of an as_dict() breakdown, as printed by --profile."""
+    total = timings.get('total') or 0.0
+    lines = [f"Profile ({total:.3f} s total):"]
+    for phase, seconds in timings.get('phases', {}).items():
+        share = f"{100 * seconds / total:5.1f}%" if total else "     -"
+        lines.append(f"  {phase:<14} {seconds:9.3f} s  {share}")
+    counters = timings.get('counters', {})
+    for name, n in counters.items():
+        lines.append(f"  {name:<14} {n:>11}")
+    if total and sum(timings.get('phases', {}).values()) > total * 1.01:
+        lines.append("  (phase times are summed over parallel workers)")
+    scan_s = timings.get('phases', {}).get('scan')
+    if scan_s and counters.get('bytes_read'):
+        lines.append(f"  {'scan rate':<14} {counters['bytes_read'] / 1e6 / scan_s:9.1f} MB/s")
+    return '\n'.join(lines)
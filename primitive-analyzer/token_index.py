@@ -0,0 +1,208 @@
+"""
+Per-repo inverted token index
+
+Records, for every scanned file, the identifier tokens the scanner saw
+(with their counts, in first-seen order) and the file's SEC()/section()
+strings. That is everything count_file needs, so a repo's full parse_repo
+output can be recomputed from its index under a newer feature YAML
+without cloning or reading the repo again (see recount.py).
+
+Only tokens that can ever be a feature are kept: called names (helpers,
+kfuncs) and upper-case constants containing an underscore, the shape of
+every plain name in feature-versions.yaml. Everything else a scanner sees
+(locals, comment words) is dropped.
+
+Tokens and SEC strings are interned into one string table; the per-file
+records are flat uint32 runs:
+
+  n_entries, (token_id << 1 | is_call, count) * n_entries, n_secs, sec_id * n_secs
+
+On disk an index is MAGIC, a little-endian uint32 header length, a JSON
+header (format version, repo metadata, table sizes), then one zlib stream
+holding the string lengths, the UTF-8 string blob and the record ints.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b'EBTI'
+FORMAT_VERSION = 1
+SUFFIX = '.tokidx'
+
+
+def index_filename(source: str) -> str:
+    """A stable, filesystem-safe index file name for a corpus source (URL or path)."""
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', source.rstrip('/'))[-80:].strip('_.') or 'repo'
+    return f"{slug}-{hashlib.sha1(source.encode('utf-8')).hexdigest()[:10]}{SUFFIX}"
+
+
+class TokenIndexError(ValueError):
+    """Raised for files that are not token indexes or use another format version."""
+
+
+def is_index_key(key: str) -> bool:
+    """Whether a RE_SCAN key is kept in the index (see the module docstring)."""
+    if key[-1] == '(':
+        return True
+    return '_' in key and key.isupper()
+
+
+def _uint32s() -> array:
+    ints = array('I')
+    if ints.itemsize != 4:
+        ints = array('L')
+    return ints
+
+
+class TokenIndex:
+    def __init__(self, meta: Optional[Dict] = None):
+        self.meta: Dict = dict(meta or {})
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.ints = _uint32s()
+        self.files = 0
+
+    def intern(self, s: str) -> int:
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    # ----------------------------
+    # Building
+    # ----------------------------
+
+    def add_file(self, keys: Dict[str, int], secs: List[str]) -> None:
+        """Adds one file's RE_SCAN keys (first-seen order) and SEC strings."""
+        # "foo(" and "foo (" are the same call; count_file strips the space
+        entries: Dict[Tuple[str, int], int] = {}
+        for key, n in keys.items():
+            if not is_index_key(key):
+                continue
+            if key[-1] == '(':
+                tok, call = key[:-1].rstrip(), 1
+            else:
+                tok, call = key, 0
+            entries[(tok, call)] = entries.get((tok, call), 0) + n
+        self._append(entries.items(), secs)
+
+    def _append(self, entries, secs: List[str]) -> None:
+        ints = self.ints
+        intern = self.intern
+        start = len(ints)
+        ints.append(0)
+        for (tok, call), n in entries:
+            ints.append(intern(tok) << 1 | call)
+            ints.append(n)
+        ints[start] = (len(ints) - start - 1) // 2
+        ints.append(len(secs))
+        ints.extend(intern(sec) for sec in secs)
+        self.files += 1
+
+    def extend(self, other: 'TokenIndex') -> None:
+        """Appends another index's files (e.g. from a worker), re-interning its strings."""
+        for entries, secs in other.iter_entries():
+            self._append(entries, secs)
+
+    # ----------------------------
+    # Reading
+    # ----------------------------
+
+    def iter_entries(self) -> Iterator[Tuple[List[Tuple[Tuple[str, int], int]], List[str]]]:
+        """Yields ([((token, is_call), count), ...], secs) per file, in scan order."""
+        ints = self.ints
+        strings = self.strings
+        pos = 0
+        for _ in range(self.files):
+            n = ints[pos]
+            pos += 1
+            entries = [((strings[ints[i] >> 1], ints[i] & 1), ints[i + 1])
+                       for i in range(pos, pos + 2 * n, 2)]
+            pos += 2 * n
+            n_secs = ints[pos]
+            pos += 1
+            secs = [strings[i] for i in ints[pos:pos + n_secs]]
+            pos += n_secs
+            yield entries, secs
+
+    def iter_files(self) -> Iterator[Tuple[Counter, List[str]]]:
+        """Yields (RE_SCAN-style keys, secs) per file, ready for count_file."""
+        for entries, secs in self.iter_entries():
+            yield Counter({(tok + '(' if call else tok): n for (tok, call), n in entries}), secs
+
+    # ----------------------------
+    # On-disk format
+    # ----------------------------
+
+    def to_bytes(self) -> bytes:
+        encoded = [s.encode('utf-8', 'surrogatepass') for s in self.strings]
+        lengths = _uint32s()
+        lengths.extend(len(b) for b in encoded)
+        ints = self.ints
+        if sys.byteorder == 'big':
+            lengths.byteswap()
+            ints = array(ints.typecode, ints)
+            ints.byteswap()
+        header = json.dumps({
+            'version': FORMAT_VERSION,
+            'meta': self.meta,
+            'files': self.files,
+            'strings': len(encoded),
+            'blob_bytes': sum(map(len, encoded)),
+        }, separators=(',', ':')).encode('utf-8')
+        body = zlib.compress(lengths.tobytes() + b''.join(encoded) + ints.tobytes(), 6)
+        return MAGIC + struct.pack('<I', len(header)) + header + body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TokenIndex':
+        if data[:4] != MAGIC:
+            raise TokenIndexError("not a token index")
+        (header_len,) = struct.unpack_from('<I', data, 4)
+        header = json.loads(data[8:8 + header_len])
+        if header.get('version') != FORMAT_VERSION:
+            raise TokenIndexError(f"unsupported token index version {header.get('version')}")
+        body = zlib.decompress(data[8 + header_len:])
+
+        lengths = _uint32s()
+        split = 4 * header['strings']
+        lengths.frombytes(body[:split])
+        ints = _uint32s()
+        ints.frombytes(body[split + header['blob_bytes']:])
+        if sys.byteorder == 'big':
+            lengths.byteswap()
+            ints.byteswap()
+
+        index = cls(header['meta'])
+        pos = split
+        for n in lengths:
+            index.strings.append(body[pos:pos + n].decode('utf-8', 'surrogatepass'))
+            pos += n
+        index.ids = {s: i for i, s in enumerate(index.strings)}
+        index.ints = ints
+        index.files = header['files']
+        return index
+
+    def save(self, path: str) -> int:
+        """Writes the index atomically; returns its size in bytes."""
+        data = self.to_bytes()
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    @classmethod
+    def load(cls, path: str) -> 'TokenIndex':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
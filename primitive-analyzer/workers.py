@@ -0,0 +1,185 @@
+"""
+Warm analyzer worker pool
+
+Long-lived processes that import parse_repo and load the compiled feature
+index once, so each analysis only pays for the scan itself. Results come
+back as plain dicts through the executor rather than JSON on stdout.
+
+Workers are started with the "spawn" method: the Flask service that owns
+the pool is multi-threaded, and forking a threaded process is unsafe.
+"""
+
+from __future__ import annotations
+
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Set
+
+import main as analyzer
+from timing import PhaseTimer
+from token_index import TokenIndex
+
+# Per-process state, filled in by _init_worker.
+_features_path: Optional[str] = None
+_file_cache: Optional[str] = None
+_gt: Optional[Dict] = None
+
+
+def _init_worker(features_path: str, file_cache: Optional[str]) -> None:
+    global _features_path, _file_cache, _gt
+    _features_path = features_path
+    _file_cache = file_cache
+    _gt = analyzer.load_feature_sets(features_path)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _analyze(repo_path: str, token_index_path: Optional[str] = None,
+             source: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    timer = PhaseTimer()
+    token_index = TokenIndex({'source': source or repo_path}) if token_index_path else None
+    results = analyzer.parse_repo(repo_path, _features_path, gt=_gt, file_cache=_file_cache, timer=timer,
+                                  token_index=token_index)
+    if token_index is not None:
+        with timer.phase('write_index'):
+            token_index.save(token_index_path)
+    results['timings'] = timer.as_dict()
+    return results
+
+
+def _analyze_archive(data: bytes) -> Dict[str, Dict[str, int]]:
+    timer = PhaseTimer()
+    results = analyzer.parse_repo(io.BytesIO(data), _features_path, gt=_gt, file_cache=_file_cache,
+                                  timer=timer)
+    results['timings'] = timer.as_dict()
+    return results
+
+
+def default_worker_count() -> int:
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+class AnalyzerPool:
+    """
+    Fixed-size pool of warm analyzer processes. `file_cache` is the path of
+    the shared per-file result cache, or None to scan every file.
+
+    Results carry the worker's phase breakdown under 'timings' (see
+    timing.py); callers that store results should pop it first.
+
+    A scan that outlives its timeout keeps its process busy, so the pool
+    retires that executor: new work goes to a fresh one at once, and the
+    old one's processes are killed as soon as its other scans finish (or
+    after the same timeout).
+    """
+
+    def __init__(self, features_path: str, workers: Optional[int] = None,
+                 file_cache: Optional[str] = None):
+        self.features_path = features_path
+        self.workers = workers or default_worker_count()
+        self.file_cache = file_cache
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Unfinished futures per executor, including retired ones
+        self._inflight: Dict[ProcessPoolExecutor, Set[Future]] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.features_path, self.file_cache),
+                )
+            return self._executor
+
+    def _reset(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self) -> None:
+        """Starts every worker now instead of on the first requests."""
+        executor = self._get_executor()
+        for fut in [executor.submit(_ping) for _ in range(self.workers)]:
+            fut.result()
+
+    def analyze(self, repo_path: str, timeout: Optional[float] = None,
+                token_index_path: Optional[str] = None,
+                source: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Scans a checked-out repo. With `token_index_path`, the worker also
+        writes the repo's token index there, labelled with `source`.
+        """
+        return self._run(_analyze, (repo_path, token_index_path, source), timeout)
+
+    def analyze_archive(self, data: bytes, timeout: Optional[float] = None) -> Dict[str, Dict[str, int]]:
+        """Scans an in-memory tar/zip archive without writing it to disk."""
+        return self._run(_analyze_archive, (data,), timeout)
+
+    def _run(self, fn, args: tuple, timeout: Optional[float]) -> Dict[str, Dict[str, int]]:
+        executor = self._get_executor()
+        try:
+            fut = executor.submit(fn, *args)
+            self._track(executor, fut)
+            return fut.result(timeout=timeout)
+        except FutureTimeout:
+            if not fut.cancel():
+                self._retire(executor, fut, timeout)
+            raise
+        except BrokenProcessPool as e:
+            # A worker died (OOM, segfault); start a fresh pool next time.
+            self._reset(executor)
+            raise RuntimeError(f"analyzer worker crashed: {e}") from e
+
+    def _track(self, executor: ProcessPoolExecutor, fut: Future) -> None:
+        with self._lock:
+            self._inflight.setdefault(executor, set()).add(fut)
+
+        def done(f: Future) -> None:
+            with self._lock:
+                self._inflight.get(executor, set()).discard(f)
+
+        fut.add_done_callback(done)
+
+    def _retire(self, executor: ProcessPoolExecutor, stuck: Future, grace: float) -> None:
+        """Replaces `executor`, whose worker is stuck on `stuck`, and kills it in the background."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        threading.Thread(target=self._reap, args=(executor, stuck, grace),
+                         name='analyzer-reaper', daemon=True).start()
+
+    def _reap(self, executor: ProcessPoolExecutor, stuck: Future, grace: float) -> None:
+        deadline = time.monotonic() + grace
+        while True:
+            with self._lock:
+                others = [f for f in self._inflight.get(executor, ()) if f is not stuck]
+            left = deadline - time.monotonic()
+            if not others or left <= 0:
+                break
+            wait(others, timeout=left)
+        # No public API kills a busy worker before Python 3.14
+        # (ProcessPoolExecutor.kill_workers)
+        for proc in list((getattr(executor, '_processes', None) or {}).values()):
+            proc.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._inflight.pop(executor, None)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._inflight.pop(executor, None)
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,322 @@
+"""
+Corpus analytics over a sparse repo x feature matrix
+
+The latest primitive analysis of every repo is loaded in one query and
+turned into a CSR matrix X (repos x features): one column per helper, map
+type, attach type and inferred program type. The columns come from the
+primitive analyzer's feature index (data/feature-versions.yaml) so they are
+stable and ordered as the YAML ranks them; names only seen in the data are
+appended after them. Per-repo totals (totalHelpers, ...) are kept as a
+dense repos x 5 array.
+
+Every statistic is a matrix product over X or a one-hot category matrix:
+
+ - per-category averages:        onehot(category) @ totals / repos per category
+ - feature frequency:            column sums of X (uses) and of X > 0 (repos)
+ - feature co-occurrence:        X[:, rows].T @ (X[:, cols] > 0)
+
+Results are cached. Each call first reads one row, the analytics_version
+counter, which triggers on primitive_analysis and repos bump whenever an
+analysis is written or deleted or a repo is re-categorized (see the
+20251208000000_analytics_version migration). The matrix and cached results
+are only rebuilt when it moves. The triggers see every writer, including
+the server's category updates, and the check never scans either table.
+
+All methods block on the database: run them with db.run().
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from db import Database
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FEATURES_YAML = os.path.normpath(
+    os.path.join(HERE, "..", "primitive-analyzer", "data", "feature-versions.yaml"))
+
+# Feature family -> (primitive_analysis JSON column, feature-versions.yaml section)
+FAMILIES = OrderedDict([
+    ("helpers", ("helpers", "helpers")),
+    ("map_types", ("mapTypes", "map_types")),
+    ("attach_types", ("attachTypes", "attach_types")),
+    ("program_types", ("programTypesInferred", "program_types")),
+])
+
+# Per-repo totals: response key -> primitive_analysis column
+TOTALS = OrderedDict([
+    ("helpers", "totalHelpers"),
+    ("maps", "totalMaps"),
+    ("programs", "totalPrograms"),
+    ("programTypes", "totalProgramTypes"),
+    ("attachPoints", "totalAttachPoints"),
+])
+# Labels of the category feature heatmap (CategoryFeatureHeatmap.tsx)
+HEATMAP_FEATURES = OrderedDict([
+    ("helpers", "Helpers"),
+    ("maps", "Maps"),
+    ("programTypes", "Program Types"),
+    ("attachPoints", "Attach Points"),
+])
+
+UNCATEGORIZED = "UNCATEGORIZED"
+
+VERSION_SQL = 'SELECT version FROM analytics_version WHERE id = 1'
+
+LATEST_SQL = (
+    'SELECT DISTINCT ON (p."repoId") p."repoId", r.category, '
+    + ", ".join(f'p."{c}"' for c in TOTALS.values()) + ", "
+    + ", ".join(f'p."{col}"' for col, _ in FAMILIES.values())
+    + ' FROM primitive_analysis p JOIN repos r ON r.id = p."repoId"'
+    ' ORDER BY p."repoId", p."analyzedAt" DESC, p.id DESC'
+)
+
+
+def load_feature_vocabulary(path: Optional[str]) -> Dict[str, List[str]]:
+    """Feature names per family in YAML order; empty when the YAML is unavailable."""
+    vocab: Dict[str, List[str]] = {family: [] for family in FAMILIES}
+    if not path or not os.path.exists(path):
+        return vocab
+    import yaml
+
+    with open(path, "rb") as f:
+        data = yaml.safe_load(f) or []
+    sections = {s.get("name"): s.get("features") or [] for s in data if isinstance(s, dict)}
+    for family, (_, section) in FAMILIES.items():
+        for feature in sections.get(section, []):
+            name = feature.get("name") if isinstance(feature, dict) else feature
+            if name:
+                vocab[family].append(str(name))
+    return vocab
+
+
+class CorpusMatrix:
+    """The repo x feature matrix of one version of the data."""
+
+    def __init__(self, rows: Sequence[tuple], vocab: Dict[str, List[str]]):
+        start = time.perf_counter()
+        n_totals = len(TOTALS)
+        self.repo_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        names, codes = np.unique(np.array([str(r[1] or UNCATEGORIZED) for r in rows], dtype=object),
+                                 return_inverse=True)
+        self.categories: List[str] = [str(c) for c in names]
+        self.category_codes = codes.astype(np.int64)
+        self.totals = np.array([[r[2 + i] or 0 for i in range(n_totals)] for r in rows],
+                               dtype=np.float64).reshape(len(rows), n_totals)
+
+        # Columns: the YAML vocabulary, then names only seen in the data
+        column: Dict[Tuple[str, str], int] = {}
+        row_idx: List[int] = []
+        col_idx: List[int] = []
+        values: List[float] = []
+        for f, family in enumerate(FAMILIES):
+            for name in vocab.get(family, []):
+                column.setdefault((family, name), len(column))
+            for i, r in enumerate(rows):
+                counts = r[2 + n_totals + f]
+                if not isinstance(counts, dict):
+                    continue
+                for name, count in counts.items():
+                    try:
+                        count = float(count)
+                    except (TypeError, ValueError):
+                        continue
+                    if count:
+                        row_idx.append(i)
+                        col_idx.append(column.setdefault((family, str(name)), len(column)))
+                        values.append(count)
+        self.features: List[Tuple[str, str]] = list(column)
+        families = np.array([family for family, _ in self.features], dtype=object)
+        self.family_columns: Dict[str, np.ndarray] = {
+            family: np.flatnonzero(families == family) for family in FAMILIES}
+        self.X = sp.csr_matrix((np.array(values, dtype=np.float64), (row_idx, col_idx)),
+                               shape=(len(rows), len(self.features)))
+        self.X.sum_duplicates()
+        self.present = (self.X > 0).astype(np.float64)
+        self._row_of = {int(repo_id): i for i, repo_id in enumerate(self.repo_ids)}
+        self.build_seconds = time.perf_counter() - start
+
+    def rows_for(self, repo_ids: Optional[Sequence[int]]) -> Optional[np.ndarray]:
+        """Matrix rows of `repo_ids` (those with an analysis), or None for all repos."""
+        if repo_ids is None:
+            return None
+        return np.array(sorted({self._row_of[r] for r in repo_ids if r in self._row_of}), dtype=np.int64)
+
+    def category_onehot(self, rows: Optional[np.ndarray] = None) -> sp.csr_matrix:
+        """categories x repos indicator matrix (restricted to `rows`)."""
+        codes = self.category_codes if rows is None else self.category_codes[rows]
+        n = len(codes)
+        return sp.csr_matrix((np.ones(n), (codes, np.arange(n))), shape=(len(self.categories), n))
+
+
+class CorpusAnalytics:
+    def __init__(self, db: Database, features_yaml: Optional[str] = DEFAULT_FEATURES_YAML,
+                 max_results: int = 256):
+        self.db = db
+        self.features_yaml = features_yaml
+        self.max_results = max_results
+        self._vocab: Optional[Dict[str, List[str]]] = None
+        self._version: Optional[int] = None
+        self._matrix: Optional[CorpusMatrix] = None
+        self._built_at: Optional[float] = None
+        self._results: "OrderedDict[tuple, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "rebuilds": 0}
+
+    # ----------------------------
+    # Versioned matrix and result cache
+    # ----------------------------
+
+    def _current(self) -> CorpusMatrix:
+        """The matrix of the current data; rebuilt (and results dropped) when the version moved."""
+        conn = self.db.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(VERSION_SQL)
+                row = cur.fetchone()
+                if row is None:
+                    raise RuntimeError("analytics_version has no row; apply the analytics_version migration")
+                version = row[0]
+                if version == self._version and self._matrix is not None:
+                    return self._matrix
+                cur.execute(LATEST_SQL)
+                rows = cur.fetchall()
+        finally:
+            self.db.putconn(conn)
+        if self._vocab is None:
+            self._vocab = load_feature_vocabulary(self.features_yaml)
+        self._matrix = CorpusMatrix(rows, self._vocab)
+        self._version = version
+        self._built_at = time.time()
+        self._results.clear()
+        self.stats["rebuilds"] += 1
+        return self._matrix
+
+    def _cached(self, key: tuple, compute):
+        with self._lock:
+            m = self._current()
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._results[key]
+            self.stats["misses"] += 1
+            result = compute(m)
+            self._results[key] = result
+            if len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            return result
+
+    def status(self) -> Dict:
+        with self._lock:
+            m = self._current()
+            return {
+                "version": self._version,
+                "repos": len(m.repo_ids),
+                "features": {family: int(len(cols)) for family, cols in m.family_columns.items()},
+                "nonZero": int(m.X.nnz),
+                "density": round(m.X.nnz / max(1, m.X.shape[0] * m.X.shape[1]), 6),
+                "buildSeconds": round(m.build_seconds, 6),
+                "builtAt": self._built_at,
+                "cache": {**self.stats, "entries": len(self._results)},
+            }
+
+    # ----------------------------
+    # Statistics
+    # ----------------------------
+
+    def category_averages(self, categories: Optional[Sequence[str]] = None) -> Dict:
+        """Average totals per category, as the server's /repos/categories/averages returns them."""
+        key = ("category_averages", tuple(sorted(categories)) if categories else None)
+        return self._cached(key, lambda m: self._category_averages(m, categories))
+
+    @staticmethod
+    def _category_averages(m: CorpusMatrix, categories: Optional[Sequence[str]]) -> Dict:
+        onehot = m.category_onehot()
+        counts = np.asarray(onehot.sum(axis=1)).ravel()
+        sums = onehot @ m.totals
+        wanted = set(categories) if categories else None
+        out = {}
+        for c, category in enumerate(m.categories):
+            if counts[c] == 0 or (wanted is not None and category not in wanted):
+                continue
+            avg = np.round(sums[c] / counts[c], 2)
+            out[category] = {**{k: float(v) for k, v in zip(TOTALS, avg)}, "count": int(counts[c])}
+        return {"categories": out}
+
+    def category_features(self, categories: Optional[Sequence[str]] = None) -> List[Dict]:
+        """CategoryFeatureHeatmap data: [{category, feature, value}] of the category averages."""
+        averages = self.category_averages(categories)["categories"]
+        return [{"category": category, "feature": label, "value": avg[k]}
+                for category, avg in averages.items() for k, label in HEATMAP_FEATURES.items()]
+
+    def feature_frequency(self, family: Optional[str] = None, top: int = 50,
+                          repo_ids: Optional[Sequence[int]] = None) -> Dict:
+        """
+        Per family, the `top` features by number of repos using them, with
+        their total uses and share of repos.
+        """
+        families = [family] if family else list(FAMILIES)
+        key = ("feature_frequency", tuple(families), top,
+               tuple(sorted(set(repo_ids))) if repo_ids is not None else None)
+        return self._cached(key, lambda m: self._feature_frequency(m, families, top, repo_ids))
+
+    @staticmethod
+    def _feature_frequency(m: CorpusMatrix, families: List[str], top: int,
+                           repo_ids: Optional[Sequence[int]]) -> Dict:
+        rows = m.rows_for(repo_ids)
+        X = m.X if rows is None else m.X[rows]
+        P = m.present if rows is None else m.present[rows]
+        n = X.shape[0]
+        uses = np.asarray(X.sum(axis=0)).ravel()
+        repos = np.asarray(P.sum(axis=0)).ravel()
+        out = {}
+        for family in families:
+            cols = m.family_columns[family]
+            # Most repos first, then most uses, then YAML order
+            order = np.lexsort((cols, -uses[cols], -repos[cols]))
+            order = [i for i in order if repos[cols[i]] > 0][:top]
+            out[family] = [{"feature": m.features[cols[i]][1], "repos": int(repos[cols[i]]),
+                            "uses": int(uses[cols[i]]), "share": round(float(repos[cols[i]]) / n, 4) if n else 0.0}
+                           for i in order]
+        return {"repos": int(n), "families": out}
+
+    def cooccurrence(self, row_family: str, col_family: str, top: int = 10,
+                     weight: str = "uses", repo_ids: Optional[Sequence[int]] = None) -> Dict:
+        """
+        Heatmap of the `top` `row_family` features (by uses) against every
+        `col_family` feature that co-occurs with them. weight="uses" sums a
+        row feature's uses over the repos that also have the column feature
+        (HelpersProgramTypesHeatmap's measure); weight="repos" counts repos
+        that have both.
+        """
+        key = ("cooccurrence", row_family, col_family, top, weight,
+               tuple(sorted(set(repo_ids))) if repo_ids is not None else None)
+        return self._cached(key, lambda m: self._cooccurrence(m, row_family, col_family, top, weight, repo_ids))
+
+    @staticmethod
+    def _cooccurrence(m: CorpusMatrix, row_family: str, col_family: str, top: int, weight: str,
+                      repo_ids: Optional[Sequence[int]]) -> Dict:
+        rows = m.rows_for(repo_ids)
+        rcols = m.family_columns[row_family]
+        ccols = m.family_columns[col_family]
+        source = m.X if weight == "uses" else m.present
+        A = source[:, rcols] if rows is None else source[rows][:, rcols]
+        B = m.present[:, ccols] if rows is None else m.present[rows][:, ccols]
+        # Top row features by uses over the selection
+        uses = np.asarray((m.X[:, rcols] if rows is None else m.X[rows][:, rcols]).sum(axis=0)).ravel()
+        top_rows = [i for i in np.lexsort((np.arange(len(rcols)), -uses)) if uses[i] > 0][:top]
+        C = (A[:, top_rows].T @ B).toarray() if top_rows else np.zeros((0, len(ccols)))
+        used_cols = np.flatnonzero(C.sum(axis=0) > 0)
+        row_names = [m.features[rcols[i]][1] for i in top_rows]
+        col_names = [m.features[ccols[j]][1] for j in used_cols]
+        values = C[:, used_cols]
+        return {
+            "rows": row_names,
+            "columns": col_names,
+            "values": [[int(v) if float(v).is_integer() else float(v) for v in row] for row in values],
+        }
@@ -0,0 +1,78 @@
+"""
+Pooled, non-blocking Postgres access
+
+psycopg2 is blocking, so all database work runs on a small thread pool
+(`await db.run(fn, ...)`) and never on the event loop. Each of those
+threads checks connections out of one process-wide ThreadedConnectionPool
+with as many connections as there are threads, so a checkout never fails
+for lack of a free connection. Connections are opened as needed, up to
+that size, and kept open once returned.
+
+DATABASE_URL is parsed once. A prisma-style `?schema=` (or POSTGRES_SCHEMA)
+becomes the connection's search_path through the startup options, so it
+costs no extra round-trip and is set once per connection, not per request.
+"""
+
+import asyncio
+import threading
+import urllib.parse as up
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, TypeVar
+
+from psycopg2.pool import ThreadedConnectionPool
+
+T = TypeVar("T")
+
+
+def parse_database_url(url: str, schema: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """
+    (DSN, schema). psycopg2 doesn't support the prisma-style ?schema=public
+    in the URI, so query params are stripped and the schema kept apart.
+    """
+    parsed = up.urlparse(url)
+    qs = up.parse_qs(parsed.query)
+    schema = schema or qs.get("schema", [None])[0]
+    dsn = up.urlunparse((parsed.scheme, parsed.netloc, parsed.path, "", "", parsed.fragment))
+    return dsn, schema
+
+
+class Database:
+    def __init__(self, url: str, schema: Optional[str] = None, min_conns: int = 1, max_conns: int = 10):
+        self.dsn, self.schema = parse_database_url(url, schema)
+        self.min_conns = min_conns
+        self.max_conns = max_conns
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._pool_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_conns, thread_name_prefix="db")
+
+    @property
+    def pool(self) -> ThreadedConnectionPool:
+        # Created on first use (on a DB thread), not at import
+        with self._pool_lock:
+            if self._pool is None:
+                kwargs = {"options": f"-c search_path={self.schema}"} if self.schema else {}
+                self._pool = ThreadedConnectionPool(self.min_conns, self.max_conns, self.dsn, **kwargs)
+                # psycopg2 only keeps `minconn` idle connections and closes any
+                # other one when it is returned, which would reconnect on most
+                # checkouts under concurrency. min_conns are opened up front;
+                # every connection opened after that is kept.
+                self._pool.minconn = self.max_conns
+            return self._pool
+
+    def getconn(self):
+        return self.pool.getconn()
+
+    def putconn(self, conn) -> None:
+        # Connections broken by a server restart or network error are dropped
+        self.pool.putconn(conn, close=bool(conn.closed))
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Runs blocking `fn(*args)` on a DB thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
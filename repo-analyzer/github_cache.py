@@ -0,0 +1,138 @@
+"""
+Conditional-request cache for GitHub API responses
+
+Successful GitHub responses are stored in SQLite with their ETag and
+Last-Modified validators. The next request for the same URL (and Accept
+type) sends If-None-Match / If-Modified-Since; GitHub answers 304 when
+nothing changed, which costs no rate-limit budget and no body download,
+and the stored response is served instead.
+
+The database is bounded by the total size of the stored bodies; past the
+bound the least recently used entries are evicted. It runs in WAL mode so
+several service processes can share one file.
+
+All methods block (on disk, or on another process's write lock for up to
+the busy timeout), so async callers run them off the event loop, e.g.
+with asyncio.to_thread. One connection is shared by those threads and
+used by one of them at a time.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Response headers kept with a cached body (commit counting reads "link")
+STORED_HEADERS = ("content-type", "link", "etag", "last-modified")
+
+
+def default_cache_path() -> Optional[str]:
+    """GITHUB_CACHE if set ("off" disables the cache), else a per-user default."""
+    path = os.getenv("GITHUB_CACHE")
+    if path == "off":
+        return None
+    return path or os.path.join(os.path.expanduser("~"), ".cache", "ebpfinsight", "github-cache.sqlite")
+
+
+def cache_key(request: httpx.Request) -> str:
+    return f"{request.url} {request.headers.get('accept', '')}"
+
+
+class CachedResponse:
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers that revalidate this response."""
+        out = {}
+        if "etag" in self.headers:
+            out["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            out["If-Modified-Since"] = self.headers["last-modified"]
+        return out
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(self.status, headers=self.headers, content=self.body, request=request)
+
+
+class GitHubCache:
+    """Stored GitHub responses keyed by URL and Accept type."""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " status INTEGER NOT NULL,"
+            " headers TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._conn.execute("SELECT status, headers, body FROM responses WHERE key = ?",
+                                     (key,)).fetchone()
+        if row is None:
+            return None
+        status, headers, body = row
+        return CachedResponse(status, dict(line.split(": ", 1) for line in headers.splitlines()), body)
+
+    def touch(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+
+    def put(self, key: str, response: httpx.Response) -> None:
+        """Stores a 200 response that carries a validator; others are ignored."""
+        if response.status_code != 200:
+            return
+        headers = {h: response.headers[h] for h in STORED_HEADERS if h in response.headers}
+        if "etag" not in headers and "last-modified" not in headers:
+            return
+        body = response.content
+        with self._lock, self._conn:
+            # A replaced entry's body no longer counts towards the total
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, status, headers, body, size, last_used)"
+                " VALUES (?,?,?,?,?,?)",
+                (key, response.status_code, "\n".join(f"{h}: {v}" for h, v in headers.items()),
+                 body, len(body), time.time()),
+            )
+            self._size += len(body) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS running"
+            "  FROM responses)"
+            " WHERE running > ?)",
+            (self.max_bytes,),
+        )
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,209 @@
+"""
+Rate-limit-aware scheduling of GitHub API requests
+
+Every GitHub request waits for a slot from one RateLimitScheduler. The
+scheduler tracks the primary rate limit from the X-RateLimit-Limit /
+-Remaining / -Reset headers of each response and hands out slots so the
+remaining budget is used without going over:
+
+ - slots are granted one at a time in priority order (interactive before
+   bulk), first come first served within a priority
+ - interactive requests only wait when the budget is exhausted
+ - bulk requests leave BULK_RESERVE requests for interactive ones, and
+   once fewer than PACE_BELOW requests are left they are spaced evenly
+   over the time remaining until the reset, instead of running the
+   budget dry and failing for the rest of the window
+ - a 403/429 rate-limit response pauses all requests (Retry-After, the
+   reset time, or exponential backoff for secondary limits) before the
+   request is retried
+
+Requests in flight count against the budget until their response
+headers arrive, so concurrent requests cannot overshoot it.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Requests bulk work leaves to interactive requests
+BULK_RESERVE = 50
+# Below this many spare requests, bulk requests are paced until the reset
+PACE_BELOW = 200
+# Budget assumed until the first response reports the real one
+# (GitHub's authenticated core limit)
+DEFAULT_LIMIT = 5000
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+def is_rate_limited(response: httpx.Response) -> bool:
+    """Whether a 403/429 is a (primary or secondary) rate limit, not a denial."""
+    if response.status_code == 429:
+        return True
+    if response.status_code != 403:
+        return False
+    if response.headers.get("x-ratelimit-remaining") == "0" or "retry-after" in response.headers:
+        return True
+    return "rate limit" in response.text.lower()
+
+
+def retry_delay(response: httpx.Response, attempt: int, now: Optional[float] = None) -> float:
+    """Seconds to wait before retrying a rate-limited response."""
+    now = time.time() if now is None else now
+    retry_after = response.headers.get("retry-after")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    reset = response.headers.get("x-ratelimit-reset")
+    if response.headers.get("x-ratelimit-remaining") == "0" and reset and reset.isdigit():
+        return max(1.0, int(reset) - now + 1)
+    # Secondary limits without a hint: exponential backoff with jitter
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class RateLimitScheduler:
+    def __init__(self, bulk_reserve: int = BULK_RESERVE, pace_below: int = PACE_BELOW):
+        self.bulk_reserve = bulk_reserve
+        self.pace_below = pace_below
+        self.limit = DEFAULT_LIMIT
+        self.remaining = DEFAULT_LIMIT
+        self.reset_at = 0.0          # epoch seconds; 0 = not known yet
+        self.paused_until = 0.0      # monotonic
+        self.inflight = 0
+        self.retries = 0
+        self._last_bulk = 0.0        # monotonic start of the last paced bulk request
+        self._queue: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+
+    # ----------------------------
+    # Slots
+    # ----------------------------
+
+    def _delay(self, priority: int) -> float:
+        """Seconds the queue head of `priority` must still wait (<= 0: go now)."""
+        now = time.monotonic()
+        if self.paused_until > now:
+            return self.paused_until - now
+        to_reset = self.reset_at - time.time()
+        if to_reset <= -1.0 and self.reset_at:
+            # The window has rolled over (reset times are whole seconds, so
+            # allow one more); the next response reports the new budget
+            self.remaining = self.limit
+            self.reset_at = 0.0
+        spare = self.remaining - self.inflight
+        if priority == BULK:
+            spare -= self.bulk_reserve
+        if spare <= 0:
+            # Nothing left for this priority until the reset (or until an
+            # in-flight response reports a fresher count)
+            return max(to_reset, 0.0) + 1.0 if self.reset_at else 1.0
+        if priority == BULK and spare < self.pace_below and to_reset > 0:
+            return self._last_bulk + to_reset / spare - now
+        return 0.0
+
+    async def acquire(self, priority: int = INTERACTIVE) -> None:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        entry = (priority, next(self._seq))
+        heapq.heappush(self._queue, entry)
+        granted = False
+        try:
+            async with self._cond:
+                while True:
+                    timeout = None
+                    if self._queue[0] == entry:
+                        timeout = self._delay(priority)
+                        if timeout <= 0:
+                            break
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                self.inflight += 1
+                granted = True
+                if priority == BULK:
+                    self._last_bulk = time.monotonic()
+        finally:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            try:
+                await self._notify()
+            except BaseException:
+                # Cancelled after the slot was granted: the caller never
+                # sees it, so it would never be released
+                if granted:
+                    self.inflight -= 1
+                raise
+
+    async def release(self, response: Optional[httpx.Response]) -> None:
+        """Frees a slot and updates the budget from the response headers."""
+        self.inflight -= 1
+        if response is not None:
+            self.update(response.headers)
+        await self._notify()
+
+    async def pause(self, seconds: float) -> None:
+        """Holds back every request for `seconds` (after a rate-limit response)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        await self._notify()
+
+    async def _notify(self) -> None:
+        if self._cond is not None:
+            async with self._cond:
+                self._cond.notify_all()
+
+    def update(self, headers: httpx.Headers) -> None:
+        try:
+            remaining = int(headers["x-ratelimit-remaining"])
+            reset = float(headers["x-ratelimit-reset"])
+        except (KeyError, ValueError):
+            return
+        if headers.get("x-ratelimit-resource", "core") != "core":
+            return
+        try:
+            self.limit = int(headers.get("x-ratelimit-limit", self.limit))
+        except ValueError:
+            pass
+        if reset > self.reset_at:
+            # A new window: take its count as is
+            self.reset_at = reset
+            self.remaining = remaining
+        elif reset == self.reset_at:
+            # Responses can arrive out of order; the lowest count is the latest
+            self.remaining = min(self.remaining, remaining)
+
+    # ----------------------------
+    # Reporting
+    # ----------------------------
+
+    def queue_depth(self) -> Dict[str, int]:
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _ in self._queue:
+            depth[PRIORITY_NAMES[priority]] += 1
+        return depth
+
+    def stats(self) -> Dict:
+        now = time.time()
+        return {
+            "queue": self.queue_depth(),
+            "inflight": self.inflight,
+            "budget": {
+                "limit": self.limit,
+                "remaining": self.remaining,
+                "resetAt": int(self.reset_at) if self.reset_at else None,
+                "resetIn": round(max(0.0, self.reset_at - now), 1) if self.reset_at else None,
+            },
+            "pausedFor": round(max(0.0, self.paused_until - time.monotonic()), 1),
+            "retries": self.retries,
+        }
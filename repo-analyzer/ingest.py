@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Bulk ingest of repo profiles (server/seed/repo_profile.csv) into `analysis`
+
+The CSV is streamed into a temporary staging table with COPY, exactly as
+it is on disk, in fixed-size chunks: memory use does not depend on the
+size of the file. Everything else happens in SQL, in the same transaction:
+values are cast (bad numbers and dates become NULL, as in the seed
+script), repo_slug is mapped to repos.id through the repo URL, and a
+single statement adds an analysis row for every repo whose values differ
+from its latest one, or that has none, as repo-analyzer's store_analyses
+does. Existing rows are never rewritten. A row whose updated_at is older
+than the latest analysis' "repoUpdatedAt" is stale and skipped. The
+README bodies of the inserted rows go to `readmes` once per content hash,
+in the same statement, so skipped rows leave none behind. Slugs that
+appear more than once keep their last row.
+
+Repos missing from `repos` are skipped and counted, or created with
+--create-repos (name, url and description only; categories are the seed
+script's job).
+
+Usage:
+  python ingest.py [server/seed/repo_profile.csv] [--create-repos] [--json]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import BinaryIO, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from db import Database
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.normpath(os.path.join(HERE, "..", "server", "seed", "repo_profile.csv"))
+
+COPY_CHUNK = 1024 * 1024
+
+# CSV column -> SQL expression casting its staged text value {c}
+CAST_INT = "CASE WHEN btrim({c}) ~ '^-?[0-9]{{1,9}}$' THEN btrim({c})::int END"
+CAST_TIME = "pg_temp.try_timestamptz({c})"
+CAST_TEXT = "NULLIF({c}, '')"
+PROFILE_COLUMNS = {
+    "repo_slug": None,
+    "stars": CAST_INT,
+    "forks": CAST_INT,
+    "watchers": CAST_INT,
+    "issues": CAST_INT,
+    "language": CAST_TEXT,
+    "description": CAST_TEXT,
+    "created_at": CAST_TIME,
+    "updated_at": CAST_TIME,
+    "commits": CAST_INT,
+    "readme_text": CAST_TEXT,
+}
+
+STAGING = "ingest_repo_profile"
+# A date check by pattern still lets 2023-13-45 through to a cast that
+# aborts the whole ingest; this returns NULL for anything Postgres rejects.
+# Created per ingest in the session's temp schema.
+TRY_TIMESTAMPTZ_SQL = """
+CREATE OR REPLACE FUNCTION pg_temp.try_timestamptz(value text) RETURNS timestamptz
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+  RETURN NULLIF(btrim(value), '')::timestamptz;
+EXCEPTION WHEN others THEN
+  RETURN NULL;
+END $$
+"""
+# Same key as repo-analyzer's readme_hash()
+README_HASH = "encode(sha256(convert_to({c}, 'UTF8')), 'hex')"
+
+UPSERT_SQL = f"""
+WITH staged AS (
+  SELECT DISTINCT ON (r.id)
+    r.id AS repo_id, r.url, {{values}}
+  FROM {STAGING} s JOIN repos r ON r.url = 'https://github.com/' || btrim(s.repo_slug)
+  ORDER BY r.id, s.ingest_line DESC
+),
+src AS (
+  SELECT staged.*, {README_HASH.format(c="readme_text")} AS readme_hash FROM staged
+),
+latest AS (
+  SELECT DISTINCT ON (a."repoId") a.*
+  FROM analysis a JOIN src ON a."repoId" = src.repo_id
+  ORDER BY a."repoId", a."analyzedAt" DESC, a.id DESC
+),
+classified AS (
+  SELECT src.*, l."analyzedAt" AS latest_at, l."defaultBranch" AS default_branch,
+    CASE
+      WHEN l.id IS NULL THEN 'new'
+      WHEN src.updated_at < l."repoUpdatedAt" THEN 'stale'
+      WHEN (l.stars, l.forks, l.watchers, l.issues, l.language, l.commits, l."readmeHash",
+            l."repoCreatedAt", l."repoUpdatedAt", l."cloneUrl")
+           IS NOT DISTINCT FROM
+           (src.stars, src.forks, src.watchers, src.issues, src.language, src.commits, src.readme_hash,
+            src.created_at, src.updated_at, src.url) THEN 'unchanged'
+      ELSE 'changed'
+    END AS outcome
+  FROM src LEFT JOIN latest l ON l."repoId" = src.repo_id
+),
+inserted AS (
+  -- Never earlier than the row it follows, so it becomes the latest
+  INSERT INTO analysis("repoId", stars, forks, watchers, issues, language, commits, "readmeHash",
+                       "repoCreatedAt", "repoUpdatedAt", "cloneUrl", "defaultBranch", "analyzedAt")
+  SELECT repo_id, stars, forks, watchers, issues, language, commits, readme_hash,
+         created_at, updated_at, url, COALESCE(default_branch, 'main'),
+         GREATEST(COALESCE(updated_at, now()), latest_at)
+  FROM classified
+  WHERE outcome IN ('new', 'changed')
+  RETURNING 1
+),
+-- README bodies of the inserted rows only, stored once per content hash
+-- (see db/migrations). The foreign key from "readmeHash" is checked at the
+-- end of the statement, after both inserts.
+stored AS (
+  INSERT INTO readmes(hash, body)
+  SELECT DISTINCT ON (readme_hash) readme_hash, readme_text
+  FROM classified
+  WHERE outcome IN ('new', 'changed') AND readme_hash IS NOT NULL
+  ON CONFLICT (hash) DO NOTHING
+  RETURNING 1
+)
+SELECT (SELECT count(*) FROM inserted),
+       (SELECT count(*) FROM stored),
+       count(*) FILTER (WHERE outcome = 'new'),
+       count(*) FILTER (WHERE outcome = 'changed'),
+       count(*) FILTER (WHERE outcome = 'unchanged'),
+       count(*) FILTER (WHERE outcome = 'stale')
+FROM classified
+"""
+
+CREATE_REPOS_SQL = f"""
+INSERT INTO repos(name, url, description)
+SELECT DISTINCT ON (slug) split_part(slug, '/', 2), 'https://github.com/' || slug, description
+FROM (SELECT btrim(repo_slug) AS slug, {{description}} AS description, ingest_line FROM {STAGING} s) p
+WHERE slug LIKE '%/%'
+ORDER BY slug, ingest_line DESC
+ON CONFLICT (url) DO NOTHING
+"""
+
+UNMATCHED_SQL = f"""
+SELECT count(DISTINCT btrim(s.repo_slug)) FROM {STAGING} s
+WHERE NOT EXISTS (SELECT 1 FROM repos r WHERE r.url = 'https://github.com/' || btrim(s.repo_slug))
+"""
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def read_header(f: BinaryIO) -> List[str]:
+    """Reads the header line, leaving `f` at the first data row."""
+    line = f.readline().decode("utf-8-sig")
+    header = next(csv.reader([line]), [])
+    if "repo_slug" not in header:
+        raise ValueError("CSV has no repo_slug column")
+    if len(set(header)) != len(header):
+        raise ValueError("CSV has duplicate column names")
+    return header
+
+
+class Progress:
+    """Read-through file wrapper that reports copy progress on stderr."""
+
+    def __init__(self, f: BinaryIO, total: int, quiet: bool = False):
+        self.f = f
+        self.total = total
+        self.quiet = quiet
+        self.done = 0
+        self.start = time.perf_counter()
+        self._last = self.start
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.f.read(size)
+        self.done += len(chunk)
+        now = time.perf_counter()
+        if not self.quiet and (now - self._last >= 1.0 or not chunk):
+            self._last = now
+            pct = 100.0 * self.done / self.total if self.total else 100.0
+            mb_s = self.done / (now - self.start) / 1e6 if now > self.start else 0.0
+            print(f"\rcopying {self.done / 1e6:8.1f} MB ({pct:5.1f}%)  {mb_s:6.1f} MB/s",
+                  end="" if chunk else "\n", file=sys.stderr, flush=True)
+        return chunk
+
+
+def ingest(db: Database, path: str, create_repos: bool = False, quiet: bool = False) -> Dict:
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    conn = db.getconn()
+    try:
+        with conn, conn.cursor() as cur, open(path, "rb") as f:
+            header = read_header(f)
+            # Staged as text, cast in SQL: one pass over the file and no
+            # per-row work in Python
+            cur.execute(
+                f"CREATE TEMP TABLE {STAGING} (ingest_line bigserial, "
+                + ", ".join(f"{quote_ident(c)} text" for c in header)
+                + ") ON COMMIT DROP"
+            )
+            t = time.perf_counter()
+            source = Progress(f, os.fstat(f.fileno()).st_size, quiet)
+            cur.copy_expert(
+                f"COPY {STAGING} ({', '.join(quote_ident(c) for c in header)}) "
+                "FROM STDIN WITH (FORMAT csv, ENCODING 'UTF8')",
+                source, size=COPY_CHUNK,
+            )
+            staged = cur.rowcount
+            if staged < 0:
+                cur.execute(f"SELECT count(*) FROM {STAGING}")
+                (staged,) = cur.fetchone()
+            timings["copy"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            cur.execute(f"ANALYZE {STAGING}")
+            cur.execute(TRY_TIMESTAMPTZ_SQL)
+
+            def value(col: str) -> str:
+                if col in header:
+                    return PROFILE_COLUMNS[col].format(c="s." + quote_ident(col))
+                return "NULL"
+
+            created = 0
+            if create_repos:
+                cur.execute(CREATE_REPOS_SQL.format(description=value("description")))
+                created = cur.rowcount
+            cur.execute(UNMATCHED_SQL)
+            (unmatched,) = cur.fetchone()
+            values = ", ".join(f"{value(c)} AS {c}" for c in PROFILE_COLUMNS if c != "repo_slug")
+            cur.execute(UPSERT_SQL.format(values=values))
+            inserted, readmes, new, changed, unchanged, stale = cur.fetchone()
+            timings["upsert"] = time.perf_counter() - t
+    finally:
+        db.putconn(conn)
+    elapsed = time.perf_counter() - start
+    return {
+        "file": path,
+        "bytes": source.done,
+        "rows": staged,
+        "inserted": inserted,
+        "newRepos": new,
+        "changed": changed,
+        "unchanged": unchanged,
+        "stale": stale,
+        "readmesStored": readmes,
+        "reposCreated": created,
+        "unmatchedSlugs": unmatched,
+        "timings": {k: round(v, 3) for k, v in timings.items()},
+        "seconds": round(elapsed, 3),
+        "rowsPerSecond": round(staged / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Bulk-load repo profiles into the analysis table.")
+    ap.add_argument("csv", nargs="?", default=DEFAULT_CSV, help="repo_profile.csv (default: the server seed)")
+    ap.add_argument("--create-repos", action="store_true", help="insert repos missing from the repos table")
+    ap.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = ap.parse_args(argv)
+
+    load_dotenv()
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        print("DATABASE_URL not set", file=sys.stderr)
+        return 2
+    db = Database(url, os.getenv("POSTGRES_SCHEMA"), min_conns=1, max_conns=1)
+    try:
+        summary = ingest(db, args.csv, create_repos=args.create_repos, quiet=args.json)
+    except (OSError, ValueError) as e:
+        print(f"ingest failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{summary['rows']} rows in {summary['seconds']:.2f} s ({summary['rowsPerSecond']} rows/s): "
+              f"{summary['inserted']} inserted ({summary['newRepos']} new repos, {summary['changed']} changed), "
+              f"{summary['unchanged']} unchanged, {summary['stale']} stale, "
+              f"{summary['readmesStored']} new READMEs, "
+              f"{summary['reposCreated']} repos created, {summary['unmatchedSlugs']} unmatched slugs")
+        print(f"  copy {summary['timings']['copy']:.2f} s, upsert {summary['timings']['upsert']:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,18 +1,105 @@
+import asyncio
+import hashlib
+import json
 import os
 import re
-from datetime import datetime
-from typing import Optional
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Literal, Optional, Tuple
 
 import httpx
 import psycopg2
-from fastapi import FastAPI, HTTPException
+from psycopg2.extras import execute_values
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
 from pydantic import BaseModel, HttpUrl
 from dotenv import load_dotenv
 
+from analytics import DEFAULT_FEATURES_YAML, FAMILIES, CorpusAnalytics
+from db import Database
+from github_cache import DEFAULT_MAX_BYTES as DEFAULT_GITHUB_CACHE_MAX_BYTES
+from github_cache import GitHubCache, cache_key, default_cache_path
+from github_scheduler import (BULK, INTERACTIVE, MAX_RETRIES, RateLimitScheduler, is_rate_limited,
+                              retry_delay)
+
 load_dotenv()
 
-app = FastAPI(title="Analyzer Service")
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+DATABASE_URL = os.getenv("DATABASE_URL")
+POSTGRES_SCHEMA = os.getenv("POSTGRES_SCHEMA")
+GITHUB_API_BASE = os.getenv("GITHUB_API_BASE", "https://api.github.com").rstrip("/")
+# Pooled connections to the GitHub API, shared by all requests
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", "20"))
+# Repos of one /analyze-batch request analyzed at the same time (upper bound)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_REPOS = int(os.getenv("BATCH_MAX_REPOS", "500"))
+# Stored GitHub responses revalidated with ETag/Last-Modified (see github_cache.py)
+GITHUB_CACHE_PATH = default_cache_path()
+GITHUB_CACHE_MAX_BYTES = int(os.getenv("GITHUB_CACHE_MAX_BYTES", str(DEFAULT_GITHUB_CACHE_MAX_BYTES)))
+
+if not DATABASE_URL:
+    raise RuntimeError("DATABASE_URL not set for analyzer service")
+
+# Pooled connections, used from DB threads only (see db.py)
+db = Database(DATABASE_URL, POSTGRES_SCHEMA,
+              min_conns=int(os.getenv("DB_POOL_MIN", "1")),
+              max_conns=int(os.getenv("DB_POOL_MAX", "10")))
+
+# Repo x feature matrix of the latest primitive analyses (see analytics.py)
+analytics = CorpusAnalytics(db, os.getenv("FEATURES_YAML", DEFAULT_FEATURES_YAML))
+
+# One client for the whole process: keep-alive connections (and their TLS
+# sessions) are reused across analyses instead of a handshake per request.
+_http_client: Optional[httpx.AsyncClient] = None
+_github_cache: Optional[GitHubCache] = None
+# Paces every GitHub request against the rate limit (see github_scheduler.py)
+scheduler = RateLimitScheduler(
+    bulk_reserve=int(os.getenv("GITHUB_BULK_RESERVE", "50")),
+    pace_below=int(os.getenv("GITHUB_PACE_BELOW", "200")),
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        headers = {"Accept": "application/vnd.github+json"}
+        if GITHUB_TOKEN:
+            headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
+        _http_client = httpx.AsyncClient(
+            base_url=GITHUB_API_BASE,
+            headers=headers,
+            timeout=20.0,
+            limits=httpx.Limits(max_connections=GITHUB_MAX_CONNECTIONS,
+                                max_keepalive_connections=GITHUB_MAX_CONNECTIONS,
+                                keepalive_expiry=60.0),
+        )
+    return _http_client
+
+
+def get_github_cache() -> Optional[GitHubCache]:
+    global _github_cache
+    if _github_cache is None and GITHUB_CACHE_PATH:
+        _github_cache = GitHubCache(GITHUB_CACHE_PATH, GITHUB_CACHE_MAX_BYTES)
+    return _github_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_http_client()
+    get_github_cache()
+    try:
+        yield
+    finally:
+        if _http_client is not None:
+            await _http_client.aclose()
+        if _github_cache is not None:
+            _github_cache.close()
+        db.close()
+
+
+app = FastAPI(title="Analyzer Service", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -22,35 +109,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-DATABASE_URL = os.getenv("DATABASE_URL")
-POSTGRES_SCHEMA = os.getenv("POSTGRES_SCHEMA")
+# Per-phase timings: GitHub subrequests, DB steps and the whole request.
+# Each /analyze response carries its own breakdown; /metrics aggregates them.
+PHASE_SECONDS = Histogram(
+    "analyzer_phase_seconds",
+    "Time spent per /analyze phase",
+    ["phase"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0),
+)
+GITHUB_CACHE_LOOKUPS = Counter(
+    "analyzer_github_cache_lookups_total",
+    "GitHub requests answered from the conditional cache (hit) or downloaded (miss)",
+    ["outcome"],
+)
+GITHUB_RETRIES = Counter(
+    "analyzer_github_retries_total",
+    "GitHub requests retried after a 403/429 rate-limit response",
+    ["status"],
+)
+GITHUB_QUEUE_DEPTH = Gauge("analyzer_github_queue_depth", "GitHub requests waiting for a slot", ["priority"])
+for _name in ("interactive", "bulk"):
+    GITHUB_QUEUE_DEPTH.labels(_name).set_function(lambda name=_name: scheduler.queue_depth()[name])
+ANALYSIS_WRITES = Counter(
+    "analyzer_analysis_writes_total",
+    "Analyses stored as a new row (inserted) or matching the repo's latest row (unchanged)",
+    ["outcome"],
+)
+README_BYTES = Counter(
+    "analyzer_readme_bytes_total",
+    "README bytes of stored analyses, written as a new body (stored) "
+    "or already kept under their hash (deduplicated)",
+    ["outcome"],
+)
+Gauge("analyzer_github_rate_remaining", "GitHub rate-limit budget left in the current window") \
+    .set_function(lambda: scheduler.remaining)
+Gauge("analyzer_github_rate_limit", "GitHub rate-limit budget per window") \
+    .set_function(lambda: scheduler.limit)
 
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL not set for analyzer service")
 
-# Simple postgres connection helper
-
-def get_conn():
-    # psycopg2 doesn't support the prisma-style ?schema=public in URI
-    # Strip query params and capture schema separately, then set search_path
-    import urllib.parse as up
-    parsed = up.urlparse(DATABASE_URL)
-    qs = up.parse_qs(parsed.query)
-    schema = POSTGRES_SCHEMA or qs.get("schema", [None])[0]
-    # rebuild DSN without query
-    dsn_no_query = up.urlunparse((parsed.scheme, parsed.netloc, parsed.path, "", "", parsed.fragment))
-    conn = psycopg2.connect(dsn_no_query)
-    if schema:
-        with conn.cursor() as cur:
-            cur.execute(f"SET search_path TO {schema}")
-    return conn
+@contextmanager
+def timed(timings: Dict[str, float], phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        timings[phase] = round(timings.get(phase, 0.0) + seconds, 6)
+        PHASE_SECONDS.labels(phase).observe(seconds)
+
 
 class AnalyzeRequest(BaseModel):
     repoUrl: HttpUrl
     repoId: Optional[int] = None
+    # "bulk" for one repo of a larger refresh; interactive requests overtake it
+    priority: Literal["interactive", "bulk"] = "interactive"
+
 
-GITHUB_API_BASE = "https://api.github.com"
+class AnalyzeBatchRequest(BaseModel):
+    repoUrls: List[HttpUrl]
+    # Lowered to BATCH_CONCURRENCY if larger
+    concurrency: Optional[int] = None
 
 _repo_re = re.compile(r"https?://github.com/(?P<owner>[^/]+)/(?P<repo>[^/#?]+)")
 
@@ -60,128 +178,489 @@ def parse_owner_repo(url: str):
         raise ValueError("Invalid GitHub URL")
     return m.group("owner"), m.group("repo")
 
-async def fetch_repo_metadata(owner: str, repo: str):
-    headers = {"Accept": "application/vnd.github+json"}
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        # Repo info
-        r = await client.get(f"{GITHUB_API_BASE}/repos/{owner}/{repo}", headers=headers)
-        if r.status_code == 404:
-            raise HTTPException(status_code=404, detail="Repo not found on GitHub")
-        if r.status_code == 401:
-            raise HTTPException(status_code=401, detail="Unauthorized to GitHub API. Ensure GITHUB_TOKEN is set and valid.")
-        r.raise_for_status()
-        info = r.json()
-
-        # Readme (raw markdown)
-        readme_text = None
-        rr = await client.get(
-            f"{GITHUB_API_BASE}/repos/{owner}/{repo}/readme",
-            headers={**headers, "Accept": "application/vnd.github.raw"},
-        )
-        if rr.status_code == 200:
-            readme_text = rr.text
-
-        # Commits count via Link header pagination (best-effort)
-        commits = None
-        cr = await client.get(
-            f"{GITHUB_API_BASE}/repos/{owner}/{repo}/commits",
-            params={"per_page": 1, "sha": info.get("default_branch", "main")},
-            headers=headers,
-        )
-        if cr.status_code == 200:
-            link = cr.headers.get("link")
-            if link and "rel=\"last\"" in link:
-                # format: <...&page=345>; rel="last"
-                try:
-                    last_url = [p for p in link.split(",") if 'rel="last"' in p][0]
-                    # extract page number
-                    import urllib.parse as up
-                    start = last_url.find("<") + 1
-                    end = last_url.find(">")
-                    last_href = last_url[start:end]
-                    q = up.urlparse(last_href).query
-                    qs = up.parse_qs(q)
-                    commits = int(qs.get("page", [None])[0] or 1)
-                except Exception:
-                    commits = None
-            else:
-                # If only one page, count is length of response (0 or 1)
-                try:
-                    commits = len(cr.json())
-                except Exception:
-                    commits = None
-
-        # Parse timestamps
-        created_at = info.get("created_at")
-        updated_at = info.get("updated_at")
+async def github_get(client: httpx.AsyncClient, path: str, timings: Dict[str, float], phase: str,
+                     cache_stats: Dict[str, int], params: Optional[Dict] = None,
+                     headers: Optional[Dict[str, str]] = None, priority: int = INTERACTIVE) -> httpx.Response:
+    """
+    GET through the conditional cache: a stored response is revalidated
+    with its ETag/Last-Modified and served again on 304. `cache_stats`
+    counts hits (304s) and misses (full downloads).
+
+    The request waits for a scheduler slot at `priority` (time charged to
+    'github_queue') and is retried after rate-limit responses. Cache reads
+    and writes are blocking SQLite calls and run on worker threads.
+    """
+    request = client.build_request("GET", path, params=params, headers=headers)
+    cache = get_github_cache()
+    key = cache_key(request)
+    cached = await asyncio.to_thread(cache.get, key) if cache is not None else None
+    if cached is not None:
+        request.headers.update(cached.validators())
+    for attempt in range(MAX_RETRIES + 1):
+        with timed(timings, "github_queue"):
+            await scheduler.acquire(priority)
+        r = None
         try:
-            created_dt = datetime.fromisoformat(created_at.replace("Z", "+00:00")) if created_at else None
-        except Exception:
-            created_dt = None
+            with timed(timings, phase):
+                r = await client.send(request)
+        finally:
+            await scheduler.release(r)
+        if attempt == MAX_RETRIES or not is_rate_limited(r):
+            break
+        GITHUB_RETRIES.labels(str(r.status_code)).inc()
+        scheduler.retries += 1
+        await r.aclose()
+        await scheduler.pause(retry_delay(r, attempt))
+    if cached is not None and r.status_code == 304:
+        await r.aclose()
+        await asyncio.to_thread(cache.touch, key)
+        cache_stats["hits"] += 1
+        GITHUB_CACHE_LOOKUPS.labels("hit").inc()
+        return cached.to_response(request)
+    cache_stats["misses"] += 1
+    GITHUB_CACHE_LOOKUPS.labels("miss").inc()
+    if cache is not None:
+        await asyncio.to_thread(cache.put, key, r)
+    return r
+
+
+async def fetch_readme(client: httpx.AsyncClient, owner: str, repo: str,
+                       timings: Dict[str, float], cache_stats: Dict[str, int],
+                       priority: int = INTERACTIVE) -> Optional[str]:
+    """The raw README markdown, or None if the repo has none."""
+    rr = await github_get(client, f"/repos/{owner}/{repo}/readme", timings, "github_readme", cache_stats,
+                          headers={"Accept": "application/vnd.github.raw"}, priority=priority)
+    if rr.status_code == 200:
+        return rr.text
+    return None
+
+
+async def fetch_commit_count(client: httpx.AsyncClient, owner: str, repo: str, branch: str,
+                             timings: Dict[str, float], cache_stats: Dict[str, int],
+                             priority: int = INTERACTIVE) -> Optional[int]:
+    """Commits on `branch`, via Link header pagination (best-effort)."""
+    cr = await github_get(client, f"/repos/{owner}/{repo}/commits", timings, "github_commits", cache_stats,
+                          params={"per_page": 1, "sha": branch}, priority=priority)
+    if cr.status_code != 200:
+        return None
+    link = cr.headers.get("link")
+    if link and "rel=\"last\"" in link:
+        # format: <...&page=345>; rel="last"
         try:
-            updated_dt = datetime.fromisoformat(updated_at.replace("Z", "+00:00")) if updated_at else None
+            last_url = [p for p in link.split(",") if 'rel="last"' in p][0]
+            # extract page number
+            import urllib.parse as up
+            start = last_url.find("<") + 1
+            end = last_url.find(">")
+            last_href = last_url[start:end]
+            q = up.urlparse(last_href).query
+            qs = up.parse_qs(q)
+            return int(qs.get("page", [None])[0] or 1)
         except Exception:
-            updated_dt = None
-
-        data = {
-            "stars": info.get("stargazers_count"),
-            "forks": info.get("forks_count"),
-            "watchers": info.get("subscribers_count") or info.get("watchers_count"),
-            "issues": info.get("open_issues_count"),
-            "language": info.get("language"),
-            "commits": commits,
-            "readmeText": readme_text,
-            "cloneUrl": info.get("clone_url"),
-            "defaultBranch": info.get("default_branch"),
-            "repoCreatedAt": created_dt,
-            "repoUpdatedAt": updated_dt,
-        }
-        return data
+            return None
+    # If only one page, count is length of response (0 or 1)
+    try:
+        return len(cr.json())
+    except Exception:
+        return None
+
+
+async def fetch_repo_metadata(owner: str, repo: str, timings: Optional[Dict[str, float]] = None,
+                              cache_stats: Optional[Dict[str, int]] = None, priority: int = INTERACTIVE):
+    if timings is None:
+        timings = {}
+    if cache_stats is None:
+        cache_stats = {"hits": 0, "misses": 0}
+    client = get_http_client()
+    # Repo info
+    r = await github_get(client, f"/repos/{owner}/{repo}", timings, "github_repo", cache_stats,
+                         priority=priority)
+    if r.status_code == 404:
+        raise HTTPException(status_code=404, detail="Repo not found on GitHub")
+    if r.status_code == 401:
+        raise HTTPException(status_code=401, detail="Unauthorized to GitHub API. Ensure GITHUB_TOKEN is set and valid.")
+    r.raise_for_status()
+    info = r.json()
+
+    # Readme and commit count only need the repo info (for the default
+    # branch); fetch them concurrently. Their timings overlap.
+    readme_text, commits = await asyncio.gather(
+        fetch_readme(client, owner, repo, timings, cache_stats, priority),
+        fetch_commit_count(client, owner, repo, info.get("default_branch", "main"), timings, cache_stats,
+                           priority),
+    )
+
+    # Parse timestamps
+    created_at = info.get("created_at")
+    updated_at = info.get("updated_at")
+    try:
+        created_dt = datetime.fromisoformat(created_at.replace("Z", "+00:00")) if created_at else None
+    except Exception:
+        created_dt = None
+    try:
+        updated_dt = datetime.fromisoformat(updated_at.replace("Z", "+00:00")) if updated_at else None
+    except Exception:
+        updated_dt = None
+
+    data = {
+        "stars": info.get("stargazers_count"),
+        "forks": info.get("forks_count"),
+        "watchers": info.get("subscribers_count") or info.get("watchers_count"),
+        "issues": info.get("open_issues_count"),
+        "language": info.get("language"),
+        "commits": commits,
+        "readmeText": readme_text,
+        "cloneUrl": info.get("clone_url"),
+        "defaultBranch": info.get("default_branch"),
+        "repoCreatedAt": created_dt,
+        "repoUpdatedAt": updated_dt,
+    }
+    return data
+
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/scheduler")
+def scheduler_stats():
+    """GitHub request queue depth per priority and the current rate-limit budget."""
+    return scheduler.stats()
+
+
+def storage_stats() -> Dict:
+    conn = db.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*), COUNT(DISTINCT \"repoId\") FROM analysis")
+            rows, repos = cur.fetchone()
+            cur.execute("SELECT COUNT(*), COALESCE(SUM(octet_length(body)), 0) FROM readmes")
+            readmes, stored = cur.fetchone()
+            # What the READMEs would take stored inline with every analysis
+            cur.execute("SELECT COALESCE(SUM(octet_length(r.body)), 0) FROM analysis a"
+                        " JOIN readmes r ON r.hash = a.\"readmeHash\"")
+            (referenced,) = cur.fetchone()
+            cur.execute("SELECT pg_total_relation_size('analysis'), pg_total_relation_size('readmes')")
+            analysis_bytes, readmes_bytes = cur.fetchone()
+    finally:
+        db.putconn(conn)
+    return {
+        "analysis": {"rows": rows, "repos": repos, "tableBytes": analysis_bytes},
+        "readmes": {"count": readmes, "bodyBytes": int(stored), "referencedBytes": int(referenced),
+                    "savedBytes": int(referenced) - int(stored), "tableBytes": readmes_bytes},
+    }
+
+
+@app.get("/storage")
+async def storage():
+    """
+    Analysis/README storage: rows, and README bytes kept once per hash vs.
+    what inline copies would take. Rows skipped as unchanged are counted in
+    /metrics (analyzer_analysis_writes_total).
+    """
+    return await db.run(storage_stats)
+
+
+def _csv_param(value: Optional[str]) -> Optional[List[str]]:
+    items = [v.strip() for v in value.split(",")] if value else []
+    return [v for v in items if v] or None
+
+
+def _repo_ids_param(value: Optional[str]) -> Optional[List[int]]:
+    items = _csv_param(value)
+    if items is None:
+        return None
+    try:
+        return [int(v) for v in items]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="repoIds must be comma-separated integers")
+
+
+def _family_param(value: str) -> str:
+    if value not in FAMILIES:
+        raise HTTPException(status_code=400, detail=f"Unknown feature family {value!r}; one of {list(FAMILIES)}")
+    return value
+
+
+@app.get("/analytics/status")
+async def analytics_status():
+    """Size and version of the repo x feature matrix and its result cache."""
+    return await db.run(analytics.status)
+
+
+@app.get("/analytics/category-averages")
+async def analytics_category_averages(categories: Optional[str] = None):
+    """Average primitive totals per category (comma-separated `categories` filter)."""
+    return await db.run(analytics.category_averages, _csv_param(categories))
+
+
+@app.get("/analytics/category-features")
+async def analytics_category_features(categories: Optional[str] = None):
+    """Category feature heatmap cells: [{category, feature, value}]."""
+    return await db.run(analytics.category_features, _csv_param(categories))
+
+
+@app.get("/analytics/feature-frequency")
+async def analytics_feature_frequency(family: Optional[str] = None, top: int = Query(50, ge=1, le=1000),
+                                      repoIds: Optional[str] = None):
+    """Most used features per family, over all repos or the given `repoIds`."""
+    if family is not None:
+        _family_param(family)
+    return await db.run(analytics.feature_frequency, family, top, _repo_ids_param(repoIds))
+
+
+@app.get("/analytics/cooccurrence")
+async def analytics_cooccurrence(rows: str = "helpers", columns: str = "program_types",
+                                 top: int = Query(10, ge=1, le=500),
+                                 weight: Literal["uses", "repos"] = "uses", repoIds: Optional[str] = None):
+    """Heatmap of the top `rows` features against the `columns` features they co-occur with."""
+    return await db.run(analytics.cooccurrence, _family_param(rows), _family_param(columns), top, weight,
+                        _repo_ids_param(repoIds))
+
+
+ANALYSIS_COLUMNS = (
+    "repoId", "stars", "forks", "watchers", "issues", "language", "commits",
+    "readmeHash", "cloneUrl", "defaultBranch", "repoCreatedAt", "repoUpdatedAt", "analyzedAt",
+)
+INSERT_ANALYSIS_SQL = (
+    "INSERT INTO analysis(" + ",".join(f'"{c}"' for c in ANALYSIS_COLUMNS) + ") VALUES %s RETURNING id"
+)
+# Columns that make up an analysis' content (everything but the repo and when)
+CONTENT_COLUMNS = ANALYSIS_COLUMNS[1:-1]
+LATEST_ANALYSIS_SQL = (
+    'SELECT DISTINCT ON ("repoId") "repoId", id, ' + ",".join(f'"{c}"' for c in CONTENT_COLUMNS)
+    + ' FROM analysis WHERE "repoId" = ANY(%s) ORDER BY "repoId", "analyzedAt" DESC, id DESC'
+)
+
+
+def readme_hash(text: Optional[str]) -> Optional[str]:
+    """Key of a README body in the readmes table (matches the migration's sha256)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest() if text is not None else None
+
+
+def content_hash(values: Tuple) -> str:
+    """Hash of an analysis' CONTENT_COLUMNS values, equal for equal content."""
+    def norm(v):
+        if isinstance(v, datetime):
+            # Stored as TIMESTAMP(3): compare in UTC, rounded to milliseconds
+            if v.tzinfo is not None:
+                v = v.astimezone(timezone.utc).replace(tzinfo=None)
+            v += timedelta(microseconds=500)
+            return v.replace(microsecond=v.microsecond // 1000 * 1000).isoformat(timespec="milliseconds")
+        return v
+    return hashlib.sha256(json.dumps([norm(v) for v in values]).encode("utf-8")).hexdigest()
+
+
+def content_values(meta: Dict) -> Tuple:
+    return (
+        meta.get("stars"),
+        meta.get("forks"),
+        meta.get("watchers"),
+        meta.get("issues"),
+        meta.get("language"),
+        meta.get("commits"),
+        readme_hash(meta.get("readmeText")),
+        meta.get("cloneUrl"),
+        meta.get("defaultBranch"),
+        meta.get("repoCreatedAt"),
+        meta.get("repoUpdatedAt"),
+    )
+
+
+def store_analyses(items: List[Tuple[str, Optional[int], Dict]],
+                   timings: Dict[str, float]) -> List[Optional[Tuple[int, bool]]]:
+    """
+    Stores one analysis per (repo URL, repo id or None, metadata) in a
+    single transaction. Returns (analysis id, changed) in order, or None
+    where the repo id was not given and the URL is not in the repos table.
+
+    An analysis whose content hashes the same as the repo's latest row is
+    not inserted again: that row's "analyzedAt" is bumped instead
+    (changed=False). README bodies go to `readmes`, once per content hash.
+    Missing repo ids, latest rows and known READMEs are each looked up in
+    one query, and new rows go in one INSERT. Blocking: run it with db.run().
+    """
+    with timed(timings, "db_connect"):
+        conn = db.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            repo_ids = [repo_id for _, repo_id, _ in items]
+            lookup = [url for url, repo_id, _ in items if repo_id is None]
+            if lookup:
+                with timed(timings, "db_lookup"):
+                    cur.execute("SELECT url, id FROM repos WHERE url = ANY(%s)", (lookup,))
+                    found = dict(cur.fetchall())
+                repo_ids = [repo_id if repo_id is not None else found.get(url)
+                            for (url, _, _), repo_id in zip(items, repo_ids)]
+            known = sorted({repo_id for repo_id in repo_ids if repo_id is not None})
+            if not known:
+                return [None] * len(items)
+
+            with timed(timings, "db_lookup"):
+                cur.execute(LATEST_ANALYSIS_SQL, (known,))
+                latest = {row[0]: (row[1], content_hash(row[2:])) for row in cur.fetchall()}
+
+            # Decide per item: reuse the latest row, or insert (once per
+            # repo and content, should a batch name a repo twice)
+            analyzed_at = datetime.utcnow()
+            results: List = [None] * len(items)
+            rows, row_items, readmes, unchanged = [], {}, {}, []
+            for i, ((_, _, meta), repo_id) in enumerate(zip(items, repo_ids)):
+                if repo_id is None:
+                    continue
+                values = content_values(meta)
+                key = (repo_id, content_hash(values))
+                if repo_id in latest and latest[repo_id][1] == key[1]:
+                    results[i] = (latest[repo_id][0], False)
+                    unchanged.append(latest[repo_id][0])
+                    continue
+                if key not in row_items:
+                    row_items[key] = []
+                    rows.append((repo_id,) + values + (analyzed_at,))
+                    if values[6] is not None:
+                        readmes[values[6]] = meta["readmeText"]
+                row_items[key].append(i)
+
+            if unchanged:
+                with timed(timings, "db_update"):
+                    cur.execute('UPDATE analysis SET "analyzedAt" = %s WHERE id = ANY(%s)',
+                                (analyzed_at, sorted(set(unchanged))))
+            new_readme_bytes = 0
+            if readmes:
+                with timed(timings, "db_readme"):
+                    cur.execute("SELECT hash FROM readmes WHERE hash = ANY(%s)", (list(readmes),))
+                    stored = {h for (h,) in cur.fetchall()}
+                    missing = [(h, body) for h, body in readmes.items() if h not in stored]
+                    if missing:
+                        execute_values(cur, "INSERT INTO readmes(hash, body) VALUES %s"
+                                            " ON CONFLICT (hash) DO NOTHING", missing, page_size=len(missing))
+                        new_readme_bytes = sum(len(body.encode("utf-8")) for _, body in missing)
+            if rows:
+                with timed(timings, "db_insert"):
+                    ids = [r[0] for r in execute_values(cur, INSERT_ANALYSIS_SQL, rows,
+                                                        page_size=len(rows), fetch=True)]
+                for new_id, indices in zip(ids, row_items.values()):
+                    for i in indices:
+                        results[i] = (new_id, True)
+    finally:
+        db.putconn(conn)
+
+    ANALYSIS_WRITES.labels("inserted").inc(len(rows))
+    ANALYSIS_WRITES.labels("unchanged").inc(sum(1 for r in results if r is not None) - len(rows))
+    readme_bytes = sum(len(meta["readmeText"].encode("utf-8")) for (_, _, meta), r in zip(items, results)
+                       if r is not None and meta.get("readmeText") is not None)
+    README_BYTES.labels("stored").inc(new_readme_bytes)
+    README_BYTES.labels("deduplicated").inc(readme_bytes - new_readme_bytes)
+    return results
+
+
+def error_result(e: Exception) -> Optional[Dict]:
+    """The per-repo batch result for an analysis that raised `e`, if it is an expected failure."""
+    if isinstance(e, HTTPException):
+        return {"status": "error", "statusCode": e.status_code, "detail": e.detail}
+    if isinstance(e, ValueError):
+        return {"status": "error", "statusCode": 400, "detail": str(e)}
+    if isinstance(e, httpx.HTTPStatusError):
+        return {"status": "error", "statusCode": 502, "detail": f"GitHub API returned {e.response.status_code}"}
+    if isinstance(e, httpx.HTTPError):
+        return {"status": "error", "statusCode": 502, "detail": f"GitHub API request failed: {e}"}
+    if isinstance(e, psycopg2.Error):
+        return {"status": "error", "statusCode": 500, "detail": f"Database error: {e}"}
+    return None
+
+
+async def analyze_repo(repo_url: str, repo_id: Optional[int] = None, priority: int = INTERACTIVE) -> Dict:
+    """
+    Fetches one repo's metadata and stores it as a new analysis row
+    ("created"), or bumps the latest row when nothing changed ("unchanged").
+    """
+    timings: Dict[str, float] = {}
+    cache_stats = {"hits": 0, "misses": 0}
+    started = time.perf_counter()
+    owner, repo = parse_owner_repo(repo_url)
+    meta = await fetch_repo_metadata(owner, repo, timings, cache_stats, priority)
+
+    # If repoId not provided, it is looked up by URL
+    (stored,) = await db.run(store_analyses, [(repo_url, repo_id, meta)], timings)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Repository not found in DB")
+    analysis_id, changed = stored
+
+    total = time.perf_counter() - started
+    PHASE_SECONDS.labels("total").observe(total)
+    timings["total"] = round(total, 6)
+    return {"status": "created" if changed else "unchanged", "analysisId": analysis_id,
+            "timings": timings, "githubCache": cache_stats}
+
 
 @app.post("/analyze")
 async def analyze(payload: AnalyzeRequest):
-    owner, repo = parse_owner_repo(str(payload.repoUrl))
-    meta = await fetch_repo_metadata(owner, repo)
-
-    # If repoId not provided, attempt to look it up by URL
-    repo_id = payload.repoId
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            if repo_id is None:
-                cur.execute("SELECT id FROM repos WHERE url = %s LIMIT 1", (str(payload.repoUrl),))
-                row = cur.fetchone()
-                if not row:
-                    raise HTTPException(status_code=404, detail="Repository not found in DB")
-                repo_id = row[0]
-
-            cur.execute(
-                """
-                INSERT INTO analysis(
-                  "repoId","stars","forks","watchers","issues","language","commits",
-                  "readmeText","cloneUrl","defaultBranch","repoCreatedAt","repoUpdatedAt","analyzedAt"
-                )
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                RETURNING id
-                """,
-                (
-                    repo_id,
-                    meta.get("stars"),
-                    meta.get("forks"),
-                    meta.get("watchers"),
-                    meta.get("issues"),
-                    meta.get("language"),
-                    meta.get("commits"),
-                    meta.get("readmeText"),
-                    meta.get("cloneUrl"),
-                    meta.get("defaultBranch"),
-                    meta.get("repoCreatedAt"),
-                    meta.get("repoUpdatedAt"),
-                    datetime.utcnow(),
-                ),
-            )
-            new_id = cur.fetchone()[0]
-            conn.commit()
-
-    return {"status": "created", "analysisId": new_id}
+    priority = BULK if payload.priority == "bulk" else INTERACTIVE
+    return await analyze_repo(str(payload.repoUrl), payload.repoId, priority)
+
+
+@app.post("/analyze-batch")
+async def analyze_batch(payload: AnalyzeBatchRequest):
+    """
+    Analyzes many repos, at most `concurrency` (capped at BATCH_CONCURRENCY)
+    at a time over the shared GitHub client. One repo failing does not fail
+    the batch: results are in request order, each either /analyze's response
+    or {"status": "error", "statusCode", "detail"}. Batches are bulk work for
+    the GitHub scheduler, so interactive /analyze calls overtake them.
+
+    All analyses are stored together once the metadata is in (one
+    transaction, unchanged ones only bumped as in /analyze), so per-repo
+    timings cover the GitHub requests and the DB phases are reported in
+    the batch's timings.
+    """
+    if len(payload.repoUrls) > BATCH_MAX_REPOS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_REPOS} repos per batch")
+    concurrency = max(1, min(payload.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+    gate = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async def fetch(url: str) -> Tuple[Dict, Optional[Dict]]:
+        timings: Dict[str, float] = {}
+        cache_stats = {"hits": 0, "misses": 0}
+        async with gate:
+            fetch_started = time.perf_counter()
+            try:
+                owner, repo = parse_owner_repo(url)
+                meta = await fetch_repo_metadata(owner, repo, timings, cache_stats, BULK)
+            except Exception as e:
+                result = error_result(e)
+                if result is None:
+                    raise
+                return {"repoUrl": url, **result}, None
+            timings["total"] = round(time.perf_counter() - fetch_started, 6)
+        return {"repoUrl": url, "status": "created", "timings": timings, "githubCache": cache_stats}, meta
+
+    fetched = await asyncio.gather(*(fetch(str(url)) for url in payload.repoUrls))
+
+    # All rows of the batch are written in one transaction and round-trip
+    db_timings: Dict[str, float] = {}
+    pending = [(result, meta) for result, meta in fetched if meta is not None]
+    if pending:
+        try:
+            stored = await db.run(store_analyses, [(r["repoUrl"], None, meta) for r, meta in pending], db_timings)
+        except psycopg2.Error as e:
+            failure = error_result(e)
+            for result, _ in pending:
+                result.update(failure)
+        else:
+            for (result, _), row in zip(pending, stored):
+                if row is None:
+                    result.update(status="error", statusCode=404, detail="Repository not found in DB")
+                else:
+                    result.update(analysisId=row[0], status="created" if row[1] else "unchanged")
+
+    results = [result for result, _ in fetched]
+    total = time.perf_counter() - started
+    PHASE_SECONDS.labels("batch_total").observe(total)
+    return {
+        "results": results,
+        "concurrency": concurrency,
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "githubCache": {k: sum(r.get("githubCache", {}).get(k, 0) for r in results) for k in ("hits", "misses")},
+        "timings": {**db_timings, "total": round(total, 6)},
+    }
@@ -0,0 +1,13 @@
+import os
+import sys
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(TEST_DIR)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# main.py reads its configuration at import. The pool connects lazily, so
+# no database is needed until a test stores something.
+os.environ.setdefault("DATABASE_URL", "postgresql://test@localhost:1/test")
+os.environ["GITHUB_CACHE"] = "off"
+os.environ.pop("GITHUB_TOKEN", None)
@@ -0,0 +1,106 @@
+"""
+analytics.CorpusAnalytics against a real Postgres, with the schema built
+from the server's Prisma migrations: the matrix is rebuilt exactly when
+the analytics_version triggers fire. Skipped unless TEST_DATABASE_URL
+names a database the role can create schemas in.
+"""
+
+import json
+import os
+import uuid
+
+import psycopg2
+import pytest
+
+from analytics import CorpusAnalytics
+from db import Database
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "..", "..", "server", "prisma", "migrations")
+
+
+def migration_sql(name):
+    with open(os.path.join(MIGRATIONS, name, "migration.sql"), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def db():
+    schema = f"test_analytics_{uuid.uuid4().hex[:8]}"
+    admin = psycopg2.connect(TEST_DATABASE_URL)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}; SET search_path = {schema};")
+        cur.execute(migration_sql("0_init"))
+        cur.execute(migration_sql("20251208000000_analytics_version"))
+    database = Database(TEST_DATABASE_URL, schema, min_conns=1, max_conns=1)
+    try:
+        yield database
+    finally:
+        database.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+
+def execute(db, sql, args=()):
+    conn = db.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(sql, args)
+            return cur.fetchall() if cur.description else None
+    finally:
+        db.putconn(conn)
+
+
+def add_repo(db, name, category):
+    return execute(db, 'INSERT INTO repos(name, url, category) VALUES (%s, %s, %s) RETURNING id',
+                   (name, f"https://github.com/x/{name}", category))[0][0]
+
+
+def add_analysis(db, repo_id, helpers):
+    execute(db, 'INSERT INTO primitive_analysis("repoId", "totalHelpers", helpers) VALUES (%s, %s, %s)',
+            (repo_id, sum(helpers.values()), json.dumps(helpers)))
+
+
+def test_rebuilds_follow_the_triggers(db):
+    a = add_repo(db, "a", "OBSERVABILITY")
+    b = add_repo(db, "b", "OBSERVABILITY")
+    add_analysis(db, a, {"bpf_map_lookup_elem": 2})
+    add_analysis(db, b, {"bpf_map_lookup_elem": 1, "bpf_ktime_get_ns": 1})
+    analytics = CorpusAnalytics(db, features_yaml=None)
+
+    averages = analytics.category_averages()["categories"]
+    assert averages["OBSERVABILITY"]["count"] == 2
+    assert averages["OBSERVABILITY"]["helpers"] == 2.0
+    version = analytics.status()["version"]
+    analytics.category_averages()
+    assert analytics.stats == {"hits": 1, "misses": 1, "rebuilds": 1}
+
+    # Columns the matrix does not read leave it alone
+    execute(db, "UPDATE repos SET description = 'x', name = 'a2' WHERE id = %s", (a,))
+    add_repo(db, "no-analysis-yet", "RUNTIME_SECURITY")
+    assert analytics.status()["version"] == version
+    assert analytics.stats["rebuilds"] == 1
+
+    # A re-categorization (the server's PATCH /repos/:id) moves the version
+    execute(db, "UPDATE repos SET category = 'DEFENSIVE_SECURITY' WHERE id = %s", (b,))
+    averages = analytics.category_averages()["categories"]
+    assert analytics.stats["rebuilds"] == 2
+    assert {k: v["count"] for k, v in averages.items()} == {"DEFENSIVE_SECURITY": 1, "OBSERVABILITY": 1}
+
+    # So does a new analysis, and a deleted one
+    add_analysis(db, a, {"bpf_map_lookup_elem": 5})
+    assert analytics.category_averages()["categories"]["OBSERVABILITY"]["helpers"] == 5.0
+    execute(db, 'DELETE FROM primitive_analysis WHERE "totalHelpers" = 5')
+    assert analytics.category_averages()["categories"]["OBSERVABILITY"]["helpers"] == 2.0
+    assert analytics.stats["rebuilds"] == 4
+
+    # A bulk write is one statement, so one bump
+    before = analytics.status()["version"]
+    execute(db, 'INSERT INTO primitive_analysis("repoId", "totalHelpers")'
+                ' SELECT %s, n FROM generate_series(1, 50) n', (a,))
+    assert analytics.status()["version"] == before + 1
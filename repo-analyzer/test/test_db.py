@@ -0,0 +1,77 @@
+"""
+db.Database against a real Postgres: concurrent checkouts from the pool,
+connections returned (or dropped when broken), and the schema from the
+URL applied as search_path. Skipped unless TEST_DATABASE_URL names a
+database the role can create schemas in.
+"""
+
+import asyncio
+import os
+import uuid
+
+import psycopg2
+import pytest
+
+from db import Database
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+
+@pytest.fixture
+def schema():
+    name = f"test_db_{uuid.uuid4().hex[:8]}"
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {name}")
+        cur.execute(f"CREATE TABLE {name}.marker (v int)")
+    try:
+        yield name
+    finally:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {name} CASCADE")
+        conn.close()
+
+
+def backend(db: Database, seconds: float):
+    conn = db.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT pg_backend_pid(), current_schema(), pg_sleep(%s)", (seconds,))
+            return cur.fetchone()[:2]
+    finally:
+        db.putconn(conn)
+
+
+def test_concurrent_checkouts_share_the_pool(schema):
+    db = Database(f"{TEST_DATABASE_URL}?schema={schema}", min_conns=1, max_conns=4)
+
+    async def run():
+        return await asyncio.gather(*(db.run(backend, db, 0.05) for _ in range(40)))
+
+    try:
+        results = asyncio.run(run())
+        pids = {pid for pid, _ in results}
+        assert {s for _, s in results} == {schema}
+        # Never more connections than DB threads, and all of them returned
+        assert 1 < len(pids) <= 4
+        assert not db.pool._used
+        assert len(db.pool._pool) == len(pids)
+        # A second round reuses the same connections
+        assert {pid for pid, _ in asyncio.run(run())} <= pids
+    finally:
+        db.close()
+
+
+def test_broken_connection_is_dropped(schema):
+    db = Database(TEST_DATABASE_URL, schema, min_conns=1, max_conns=2)
+    try:
+        conn = db.getconn()
+        pid = conn.get_backend_pid()
+        conn.close()
+        db.putconn(conn)
+        assert backend(db, 0)[0] != pid
+        assert backend(db, 0)[1] == schema
+    finally:
+        db.close()
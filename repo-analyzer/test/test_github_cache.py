@@ -0,0 +1,64 @@
+"""GitHubCache: size accounting, eviction, and use from worker threads."""
+
+import asyncio
+
+import httpx
+
+from github_cache import GitHubCache
+
+
+def response(body: bytes, etag: str = '"v1"') -> httpx.Response:
+    return httpx.Response(200, headers={"etag": etag, "content-type": "application/json"}, content=body)
+
+
+def stored_bytes(cache: GitHubCache) -> int:
+    return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+
+def test_overwrite_is_counted_once(tmp_path):
+    cache = GitHubCache(str(tmp_path / "cache.sqlite"), max_bytes=1000)
+    cache.put("a", response(b"x" * 300))
+    cache.put("a", response(b"y" * 200, '"v2"'))
+    cache.put("b", response(b"z" * 100))
+    assert cache._size == stored_bytes(cache) == 300
+    got = cache.get("a")
+    assert got.body == b"y" * 200 and got.validators() == {"If-None-Match": '"v2"'}
+
+    # Repeated refreshes of one entry never push the cache over its bound
+    for i in range(20):
+        cache.put("b", response(b"z" * 100, f'"{i}"'))
+    assert cache.get("a") is not None
+    assert cache._size == stored_bytes(cache) == 300
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = GitHubCache(str(tmp_path / "cache.sqlite"), max_bytes=250)
+    cache.put("old", response(b"o" * 100))
+    cache.put("new", response(b"n" * 100))
+    cache.touch("old")
+    cache.put("newest", response(b"w" * 100))
+    assert cache.get("new") is None
+    assert cache.get("old") is not None and cache.get("newest") is not None
+    assert cache._size == stored_bytes(cache) == 200
+
+
+def test_responses_without_validators_are_not_stored(tmp_path):
+    cache = GitHubCache(str(tmp_path / "cache.sqlite"))
+    cache.put("a", httpx.Response(200, content=b"body"))
+    cache.put("b", httpx.Response(404, headers={"etag": '"x"'}, content=b"nope"))
+    assert cache.get("a") is None and cache.get("b") is None
+
+
+def test_shared_by_worker_threads(tmp_path):
+    cache = GitHubCache(str(tmp_path / "cache.sqlite"))
+
+    async def run():
+        keys = [f"k{i}" for i in range(50)]
+        await asyncio.gather(*(asyncio.to_thread(cache.put, k, response(k.encode())) for k in keys))
+        found = await asyncio.gather(*(asyncio.to_thread(cache.get, k) for k in keys))
+        await asyncio.gather(*(asyncio.to_thread(cache.touch, k) for k in keys))
+        return [f.body for f in found]
+
+    assert asyncio.run(run()) == [f"k{i}".encode() for i in range(50)]
+    assert cache._size == stored_bytes(cache)
+    cache.close()
@@ -0,0 +1,239 @@
+"""
+The GitHub client of main.py against an in-process fake of the API
+(httpx.MockTransport), through the FastAPI app: one pooled client for
+every request, commit counting from Link pagination, how GitHub errors
+map onto /analyze and /analyze-batch responses, and the per-phase
+timings of a response and /metrics.
+"""
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client.parser import text_string_to_metric_families
+
+import main
+from github_cache import GitHubCache
+
+COMMITS = "https://api.github.com/repos/{}/commits"
+REPO_ETAG = '"repo-v1"'
+
+
+class FakeGitHub:
+    """Repos by "owner/name"; anything unknown is a 404."""
+
+    def __init__(self):
+        self.repos = {}
+        self.requests = []
+        # path -> list of responses (or exceptions) served before the normal one
+        self.overrides = {}
+
+    def add(self, full_name, commits=None, readme="# readme\n", status=200):
+        self.repos[full_name] = {"status": status, "commits": commits, "readme": readme}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        queued = self.overrides.get(request.url.path)
+        if queued:
+            item = queued.pop(0)
+            if isinstance(item, Exception):
+                raise item
+            return item
+        parts = request.url.path.strip("/").split("/")
+        repo = self.repos.get("/".join(parts[1:3]))
+        if repo is None:
+            return httpx.Response(404, json={"message": "Not Found"})
+        if len(parts) == 3:
+            if repo["status"] != 200:
+                return httpx.Response(repo["status"], json={"message": "error"})
+            if request.headers.get("if-none-match") == REPO_ETAG:
+                return httpx.Response(304)
+            return httpx.Response(200, headers={"etag": REPO_ETAG}, json={
+                "stargazers_count": 5, "forks_count": 1, "watchers_count": 5, "open_issues_count": 0,
+                "language": "C", "clone_url": f"https://github.com/{parts[1]}/{parts[2]}.git",
+                "default_branch": "main", "created_at": "2020-01-02T03:04:05Z",
+                "updated_at": "2024-05-06T07:08:09Z",
+            })
+        if parts[3] == "readme":
+            if repo["readme"] is None:
+                return httpx.Response(404, json={"message": "Not Found"})
+            return httpx.Response(200, text=repo["readme"])
+        if parts[3] == "commits":
+            return repo["commits"] or httpx.Response(200, json=[{"sha": "a"}])
+        return httpx.Response(404)
+
+
+@pytest.fixture(scope="module")
+def github():
+    return FakeGitHub()
+
+
+@pytest.fixture(scope="module")
+def clients(github):
+    """Every httpx.AsyncClient main.py creates, each backed by the fake."""
+    created = []
+    transport = httpx.MockTransport(github)
+
+    class MockedAsyncClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            super().__init__(transport=transport, **kwargs)
+            created.append(self)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(httpx, "AsyncClient", MockedAsyncClient)
+        mp.setattr(main, "_http_client", None)
+        yield created
+
+
+@pytest.fixture(scope="module")
+def app_client(clients):
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """Replaces the database write; collects the metadata it was given."""
+    metas = []
+
+    def store_analyses(items, timings):
+        metas.extend(meta for _, _, meta in items)
+        return [(len(metas) - len(items) + i + 1, True) for i in range(len(items))]
+
+    monkeypatch.setattr(main, "store_analyses", store_analyses)
+    return metas
+
+
+@pytest.fixture(autouse=True)
+def reset(github):
+    github.repos.clear()
+    github.requests.clear()
+    github.overrides.clear()
+
+
+def test_one_pooled_client_for_all_requests(github, clients, app_client, stored):
+    for name in ("a/one", "a/two", "a/three"):
+        github.add(name)
+
+    assert app_client.post("/analyze", json={"repoUrl": "https://github.com/a/one", "repoId": 1}).status_code == 200
+    assert app_client.post("/analyze", json={"repoUrl": "https://github.com/a/two", "repoId": 2}).status_code == 200
+    batch = app_client.post("/analyze-batch", json={"repoUrls": [f"https://github.com/{n}" for n in github.repos],
+                                                    "concurrency": 3})
+    assert batch.status_code == 200 and batch.json()["failed"] == 0
+
+    assert len(clients) == 1
+    assert not clients[0].is_closed
+    # Repo info, README and commits for each of the five analyses
+    assert len(github.requests) == 15
+    assert {str(r.url.copy_with(query=None)) for r in github.requests} >= {
+        "https://api.github.com/repos/a/one", "https://api.github.com/repos/a/one/readme", COMMITS.format("a/one")}
+    assert all(r.headers["accept"] for r in github.requests)
+    assert [m["readmeText"] for m in stored] == ["# readme\n"] * 5
+
+
+@pytest.mark.parametrize("response, expected", [
+    (httpx.Response(200, json=[{"sha": "a"}], headers={
+        "link": '<https://api.github.com/repositories/1/commits?per_page=1&sha=main&page=2>; rel="next", '
+                '<https://api.github.com/repositories/1/commits?per_page=1&sha=main&page=345>; rel="last"'}), 345),
+    (httpx.Response(200, json=[{"sha": "a"}]), 1),
+    (httpx.Response(200, json=[]), 0),
+    # An empty repository
+    (httpx.Response(409, json={"message": "Git Repository is empty."}), None),
+])
+def test_commit_count_from_pagination(github, app_client, stored, response, expected):
+    github.add("p/repo", commits=response)
+    assert app_client.post("/analyze", json={"repoUrl": "https://github.com/p/repo", "repoId": 1}).status_code == 200
+    (commits_request,) = [r for r in github.requests if r.url.path.endswith("/commits")]
+    assert commits_request.url.params["per_page"] == "1"
+    assert commits_request.url.params["sha"] == "main"
+    assert stored[-1]["commits"] == expected
+
+
+def test_missing_readme_is_none(github, app_client, stored):
+    github.add("p/noreadme", readme=None)
+    assert app_client.post("/analyze", json={"repoUrl": "https://github.com/p/noreadme", "repoId": 1}).status_code == 200
+    assert stored[-1]["readmeText"] is None
+
+
+def test_analyze_error_mapping(github, app_client, stored):
+    github.add("e/denied", status=401)
+    r = app_client.post("/analyze", json={"repoUrl": "https://github.com/e/missing", "repoId": 1})
+    assert r.status_code == 404 and r.json()["detail"] == "Repo not found on GitHub"
+    r = app_client.post("/analyze", json={"repoUrl": "https://github.com/e/denied", "repoId": 1})
+    assert r.status_code == 401
+    assert stored == []
+
+
+def test_batch_error_mapping(github, app_client, stored):
+    github.add("b/ok")
+    github.add("b/broken", status=500)
+    github.add("b/unreachable")
+    github.overrides["/repos/b/unreachable"] = [httpx.ConnectError("connection refused")]
+    urls = ["https://github.com/b/ok", "https://github.com/b/missing", "https://github.com/b/broken",
+            "https://github.com/b/unreachable", "https://gitlab.com/b/elsewhere"]
+
+    body = app_client.post("/analyze-batch", json={"repoUrls": urls}).json()
+    results = {r["repoUrl"]: r for r in body["results"]}
+    assert [r["repoUrl"] for r in body["results"]] == urls
+    assert results[urls[0]]["status"] == "created"
+    assert (results[urls[1]]["statusCode"], results[urls[1]]["detail"]) == (404, "Repo not found on GitHub")
+    assert (results[urls[2]]["statusCode"], results[urls[2]]["detail"]) == (502, "GitHub API returned 500")
+    assert results[urls[3]]["statusCode"] == 502
+    assert results[urls[3]]["detail"].startswith("GitHub API request failed")
+    assert (results[urls[4]]["statusCode"], results[urls[4]]["detail"]) == (400, "Invalid GitHub URL")
+    assert body["failed"] == 4
+    assert len(stored) == 1
+
+
+def test_rate_limited_request_is_retried(github, app_client, stored):
+    github.add("r/repo")
+    github.overrides["/repos/r/repo"] = [httpx.Response(429, headers={"retry-after": "0"},
+                                                        json={"message": "slow down"})]
+    retries = main.scheduler.retries
+
+    r = app_client.post("/analyze", json={"repoUrl": "https://github.com/r/repo", "repoId": 1})
+    assert r.status_code == 200, r.text
+    assert main.scheduler.retries == retries + 1
+    assert len([req for req in github.requests if req.url.path == "/repos/r/repo"]) == 2
+    stats = app_client.get("/scheduler").json()
+    assert stats["retries"] == main.scheduler.retries
+    assert stats["inflight"] == 0
+
+
+def test_conditional_cache_hit(github, app_client, stored, monkeypatch, tmp_path):
+    cache = GitHubCache(str(tmp_path / "github-cache.sqlite"))
+    monkeypatch.setattr(main, "_github_cache", cache)
+    github.add("c/repo")
+
+    first = app_client.post("/analyze", json={"repoUrl": "https://github.com/c/repo", "repoId": 1}).json()
+    second = app_client.post("/analyze", json={"repoUrl": "https://github.com/c/repo", "repoId": 1}).json()
+    # Only the repo info carries an ETag in the fake
+    assert first["githubCache"] == {"hits": 0, "misses": 3}
+    assert second["githubCache"] == {"hits": 1, "misses": 2}
+    assert stored[0] == stored[1]
+    revalidated = [r for r in github.requests if r.url.path == "/repos/c/repo"][1]
+    assert revalidated.headers["if-none-match"] == REPO_ETAG
+    cache.close()
+
+
+def phase_counts(app_client):
+    resp = app_client.get("/metrics")
+    assert resp.status_code == 200
+    return {s.labels["phase"]: s.value for family in text_string_to_metric_families(resp.text)
+            for s in family.samples if s.name == "analyzer_phase_seconds_count"}
+
+
+def test_timings_and_metrics(github, app_client, stored):
+    github.add("t/repo")
+    before = phase_counts(app_client)
+
+    r = app_client.post("/analyze", json={"repoUrl": "https://github.com/t/repo", "repoId": 1})
+    assert r.status_code == 200, r.text
+    timings = r.json()["timings"]
+    phases = {"github_queue", "github_repo", "github_readme", "github_commits", "total"}
+    assert set(timings) == phases
+    assert all(seconds >= 0 for seconds in timings.values())
+
+    after = phase_counts(app_client)
+    # Three subrequests, each waiting for its scheduler slot once
+    assert {phase: after[phase] - before.get(phase, 0) for phase in phases} == {
+        "github_queue": 3, "github_repo": 1, "github_readme": 1, "github_commits": 1, "total": 1}
@@ -0,0 +1,104 @@
+"""
+RateLimitScheduler on its own: slots go out in priority order, bulk
+requests are paced once the spare budget runs low while interactive ones
+are not, and a cancelled acquire gives back its queue entry and its slot.
+"""
+
+import asyncio
+import time
+
+from github_scheduler import BULK, INTERACTIVE, RateLimitScheduler
+
+
+def test_priority_order():
+    async def run():
+        sched = RateLimitScheduler(bulk_reserve=0)
+        sched.remaining = 1
+        granted = []
+
+        async def request(name, priority):
+            await sched.acquire(priority)
+            granted.append(name)
+            await sched.release(None)
+
+        # The only slot is taken, so everything below queues behind it
+        await sched.acquire(INTERACTIVE)
+        tasks = []
+        for name, priority in [("bulk-1", BULK), ("interactive-1", INTERACTIVE),
+                               ("bulk-2", BULK), ("interactive-2", INTERACTIVE)]:
+            tasks.append(asyncio.create_task(request(name, priority)))
+            await asyncio.sleep(0)
+        assert sched.queue_depth() == {"interactive": 2, "bulk": 2}
+
+        await sched.release(None)
+        await asyncio.gather(*tasks)
+        return granted, sched
+
+    granted, sched = asyncio.run(run())
+    assert granted == ["interactive-1", "interactive-2", "bulk-1", "bulk-2"]
+    assert sched.inflight == 0
+
+
+def test_bulk_is_paced_and_interactive_is_not():
+    async def run():
+        sched = RateLimitScheduler(bulk_reserve=10, pace_below=200)
+        # 5 requests to spare for bulk work, 1s to the reset: one per 0.2s
+        sched.remaining = 15
+        sched.reset_at = time.time() + 1.0
+
+        async def timed(priority):
+            await sched.acquire(priority)
+            at = time.monotonic()
+            await sched.release(None)
+            return at
+
+        start = time.monotonic()
+        bulk = [await timed(BULK) for _ in range(3)]
+        interactive = await timed(INTERACTIVE)
+        return start, bulk, interactive
+
+    start, bulk, interactive = asyncio.run(run())
+    assert bulk[0] - start < 0.05
+    gaps = [b - a for a, b in zip(bulk, bulk[1:])]
+    assert all(gap > 0.1 for gap in gaps), gaps
+    assert interactive - bulk[-1] < 0.05
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        sched = RateLimitScheduler()
+        await sched.pause(10)
+        waiter = asyncio.create_task(sched.acquire(BULK))
+        await asyncio.sleep(0.01)
+        assert sched.queue_depth()["bulk"] == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return sched
+
+    sched = asyncio.run(run())
+    assert sched.queue_depth() == {"interactive": 0, "bulk": 0}
+    assert sched.inflight == 0
+
+
+def test_cancelled_after_grant_releases_the_slot():
+    async def run():
+        sched = RateLimitScheduler()
+        cond = asyncio.Condition()
+        sched._cond = cond
+
+        async with cond:
+            task = asyncio.create_task(sched.acquire(INTERACTIVE))
+            await asyncio.sleep(0)
+        # Queue behind the acquire for the lock: it is granted its slot,
+        # then waits for the lock again to wake the queue, and is
+        # cancelled there
+        async with cond:
+            assert sched.inflight == 1
+            task.cancel()
+        results = await asyncio.gather(task, return_exceptions=True)
+        return sched, results
+
+    sched, results = asyncio.run(run())
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert sched.inflight == 0
+    assert sched.queue_depth() == {"interactive": 0, "bulk": 0}
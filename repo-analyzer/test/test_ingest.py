@@ -0,0 +1,150 @@
+"""
+ingest.py against a real Postgres: the seed CSV loaded into an empty
+schema and again, then changed, stale and malformed rows. Skipped unless
+TEST_DATABASE_URL names a database the role can create schemas in.
+"""
+
+import csv
+import os
+import uuid
+
+import psycopg2
+import pytest
+
+from db import Database
+from ingest import DEFAULT_CSV, ingest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+# The tables ingest touches, as schema.prisma maps them
+SCHEMA_SQL = """
+CREATE TABLE repos (id SERIAL PRIMARY KEY, name TEXT NOT NULL, url TEXT NOT NULL UNIQUE, description TEXT);
+CREATE TABLE readmes (hash TEXT PRIMARY KEY, body TEXT NOT NULL,
+                      "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE analysis (
+  id SERIAL PRIMARY KEY,
+  "repoId" INTEGER NOT NULL REFERENCES repos(id) ON DELETE CASCADE,
+  stars INTEGER, forks INTEGER, watchers INTEGER, issues INTEGER,
+  language TEXT, commits INTEGER, "readmeHash" TEXT REFERENCES readmes(hash),
+  "repoCreatedAt" TIMESTAMP(3), "repoUpdatedAt" TIMESTAMP(3),
+  "cloneUrl" TEXT, "defaultBranch" TEXT,
+  "analyzedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX ON analysis ("repoId", "analyzedAt" DESC);
+"""
+
+
+@pytest.fixture
+def db():
+    schema = f"test_ingest_{uuid.uuid4().hex[:8]}"
+    admin = psycopg2.connect(TEST_DATABASE_URL)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}; SET search_path = {schema};" + SCHEMA_SQL)
+    database = Database(TEST_DATABASE_URL, schema, min_conns=1, max_conns=1)
+    try:
+        yield database
+    finally:
+        database.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+
+def query(db, sql, args=()):
+    conn = db.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(sql, args)
+            return cur.fetchall()
+    finally:
+        db.putconn(conn)
+
+
+def seed_rows():
+    with open(DEFAULT_CSV, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_seed_ingest_and_reingest(db):
+    rows = seed_rows()
+    slugs = {r["repo_slug"].strip() for r in rows if "/" in r["repo_slug"]}
+
+    first = ingest(db, DEFAULT_CSV, create_repos=True, quiet=True)
+    assert first["rows"] == len(rows)
+    assert first["reposCreated"] == len(slugs)
+    assert first["inserted"] == first["newRepos"] == len(slugs)
+    assert first["unmatchedSlugs"] == 0
+    assert query(db, "SELECT count(*), count(DISTINCT \"repoId\") FROM analysis")[0] == (len(slugs), len(slugs))
+    readmes = {r["readme_text"] for r in rows if r["readme_text"]}
+    assert first["readmesStored"] == len(readmes)
+    # README bodies round-trip through their hash
+    (xrp,) = [r for r in rows if r["repo_slug"] == "xrp-project/XRP"]
+    assert query(db, 'SELECT r.body FROM analysis a JOIN repos p ON p.id = a."repoId"'
+                     ' JOIN readmes r ON r.hash = a."readmeHash" WHERE p.url = %s',
+                 ("https://github.com/xrp-project/XRP",)) == [(xrp["readme_text"],)]
+
+    again = ingest(db, DEFAULT_CSV, quiet=True)
+    assert (again["inserted"], again["unchanged"], again["readmesStored"]) == (0, len(slugs), 0)
+    assert query(db, "SELECT count(*) FROM analysis")[0][0] == len(slugs)
+
+
+def test_changed_stale_and_malformed_rows(db, tmp_path):
+    rows = seed_rows()[:3]
+    ingest(db, write_csv(tmp_path / "base.csv", rows), create_repos=True, quiet=True)
+    before = dict(query(db, 'SELECT "repoId", id FROM analysis'))
+
+    changed, stale, malformed = [dict(r) for r in rows]
+    changed["stars"] = str(int(changed["stars"] or 0) + 10)
+    changed["updated_at"] = "2099-01-01T00:00:00Z"
+    stale["stars"] = "1"
+    stale["updated_at"] = "2001-01-01T00:00:00Z"
+    malformed["created_at"] = "2023-13-45"
+    malformed["forks"] = "many"
+
+    out = ingest(db, write_csv(tmp_path / "next.csv", [changed, stale, malformed]), quiet=True)
+    assert (out["inserted"], out["changed"], out["stale"], out["unchanged"]) == (2, 2, 1, 0)
+
+    latest = query(db, 'SELECT DISTINCT ON (a."repoId") p.url, a.id, a.stars, a.forks, a."repoCreatedAt"'
+                       ' FROM analysis a JOIN repos p ON p.id = a."repoId"'
+                       ' ORDER BY a."repoId", a."analyzedAt" DESC, a.id DESC')
+    by_url = {url: rest for url, *rest in latest}
+
+    def url(r):
+        return "https://github.com/" + r["repo_slug"].strip()
+
+    # Earlier analyses are kept as history, not overwritten
+    assert query(db, "SELECT count(*) FROM analysis")[0][0] == 5
+    assert set(before.values()) <= {i for (i,) in query(db, "SELECT id FROM analysis")}
+    assert by_url[url(changed)][1] == int(changed["stars"])
+    assert by_url[url(stale)][0] in before.values()
+    assert by_url[url(stale)][1] == int(rows[1]["stars"])
+    assert by_url[url(malformed)][2:] == [None, None]
+
+
+def test_skipped_rows_store_no_readmes(db, tmp_path):
+    rows = seed_rows()[:2]
+    ingest(db, write_csv(tmp_path / "base.csv", rows), create_repos=True, quiet=True)
+    readmes_before = query(db, "SELECT count(*) FROM readmes")[0][0]
+
+    stale, unmatched = dict(rows[1]), dict(rows[0])
+    stale["readme_text"] = "# stale README"
+    stale["updated_at"] = "2001-01-01T00:00:00Z"
+    unmatched["repo_slug"] = "nobody/not-in-repos"
+    unmatched["readme_text"] = "# unmatched README"
+
+    out = ingest(db, write_csv(tmp_path / "next.csv", [rows[0], stale, unmatched]), quiet=True)
+    assert (out["inserted"], out["unchanged"], out["stale"], out["unmatchedSlugs"]) == (0, 1, 1, 1)
+    assert out["readmesStored"] == 0
+    assert query(db, "SELECT count(*) FROM readmes")[0][0] == readmes_before
+    assert query(db, 'SELECT count(*) FROM readmes r'
+                     ' WHERE NOT EXISTS (SELECT 1 FROM analysis a WHERE a."readmeHash" = r.hash)')[0][0] == 0
@@ -0,0 +1,89 @@
+-- CreateEnum
+CREATE TYPE "CategoryEnum" AS ENUM ('CLOUD_NATIVE_NETWORKING', 'DEFENSIVE_SECURITY', 'DEVELOPER_TOOLING_FRAMEWORKS', 'EDUCATIONAL_DEMONSTRATION_RESOURCES', 'KERNEL_DATAPLANE_NETWORKING', 'OBSERVABILITY', 'OFFENSIVE_SECURITY', 'OPERATIONS_ORCHESTRATION_LIFECYCLE', 'PLATFORM_RUNTIME_ACCELERATION', 'RUNTIME_SECURITY');
+
+-- CreateTable
+CREATE TABLE "repos" (
+    "id" SERIAL NOT NULL,
+    "name" TEXT NOT NULL,
+    "url" TEXT NOT NULL,
+    "description" TEXT,
+    "category" "CategoryEnum",
+    "rationale" TEXT,
+    "suggestedNewClass" TEXT,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "repos_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateTable
+CREATE TABLE "analysis" (
+    "id" SERIAL NOT NULL,
+    "repoId" INTEGER NOT NULL,
+    "stars" INTEGER,
+    "forks" INTEGER,
+    "watchers" INTEGER,
+    "issues" INTEGER,
+    "language" TEXT,
+    "commits" INTEGER,
+    "readmeText" TEXT,
+    "repoCreatedAt" TIMESTAMP(3),
+    "repoUpdatedAt" TIMESTAMP(3),
+    "cloneUrl" TEXT,
+    "defaultBranch" TEXT,
+    "analyzedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "analysis_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateTable
+CREATE TABLE "overhead_tests" (
+    "id" SERIAL NOT NULL,
+    "repoId" INTEGER NOT NULL,
+    "runCount" BIGINT,
+    "totalRunTimeNs" BIGINT,
+    "avgTimePerRunNs" DOUBLE PRECISION,
+    "baselineCpuUsage" DOUBLE PRECISION,
+    "baselineLatencyMs" DOUBLE PRECISION,
+    "baselineThroughput" DOUBLE PRECISION,
+    "instrumentedCpuUsage" DOUBLE PRECISION,
+    "instrumentedLatencyMs" DOUBLE PRECISION,
+    "instrumentedThroughput" DOUBLE PRECISION,
+    "testedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "overhead_tests_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateTable
+CREATE TABLE "primitive_analysis" (
+    "id" SERIAL NOT NULL,
+    "repoId" INTEGER NOT NULL,
+    "totalPrograms" INTEGER,
+    "totalProgramTypes" INTEGER,
+    "totalHelpers" INTEGER,
+    "uniqueHelpers" INTEGER,
+    "totalMaps" INTEGER,
+    "uniqueMaps" INTEGER,
+    "totalAttachPoints" INTEGER,
+    "uniqueAttachPoints" INTEGER,
+    "mapTypes" JSONB,
+    "attachTypes" JSONB,
+    "helpers" JSONB,
+    "programSections" JSONB,
+    "programTypesInferred" JSONB,
+    "programTypesTokens" JSONB,
+    "analyzedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "primitive_analysis_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "repos_url_key" ON "repos"("url");
+
+-- AddForeignKey
+ALTER TABLE "analysis" ADD CONSTRAINT "analysis_repoId_fkey" FOREIGN KEY ("repoId") REFERENCES "repos"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "overhead_tests" ADD CONSTRAINT "overhead_tests_repoId_fkey" FOREIGN KEY ("repoId") REFERENCES "repos"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "primitive_analysis" ADD CONSTRAINT "primitive_analysis_repoId_fkey" FOREIGN KEY ("repoId") REFERENCES "repos"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,108 @@
+-- README bodies stored once per content hash, and compaction of analysis
+-- rows that repeat the previous analysis of the same repo. Same
+-- statements as db/migrations/20251201_dedup_analysis.sql; keep the two
+-- identical.
+--
+-- Irreversible: "readmeText" is dropped and duplicate rows are deleted.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS readmes (
+  hash TEXT PRIMARY KEY,
+  body TEXT NOT NULL,
+  "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE analysis ADD COLUMN IF NOT EXISTS "readmeHash" TEXT NULL;
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'analysis_readmeHash_fkey'
+                   AND connamespace = current_schema()::regnamespace) THEN
+    ALTER TABLE analysis ADD CONSTRAINT "analysis_readmeHash_fkey"
+      FOREIGN KEY ("readmeHash") REFERENCES readmes(hash) ON DELETE SET NULL ON UPDATE CASCADE;
+  END IF;
+END $$;
+
+-- Latest analysis per repo (what /repos and change detection read)
+CREATE INDEX IF NOT EXISTS "analysis_repoId_analyzedAt_idx" ON analysis ("repoId", "analyzedAt" DESC);
+
+-- Move README bodies out of analysis
+DO $$
+DECLARE
+  inline_bytes BIGINT;
+  stored_bytes BIGINT;
+BEGIN
+  IF EXISTS (SELECT 1 FROM information_schema.columns
+             WHERE table_schema = current_schema() AND table_name = 'analysis' AND column_name = 'readmeText') THEN
+    SELECT COALESCE(SUM(octet_length("readmeText")), 0) INTO inline_bytes FROM analysis;
+
+    INSERT INTO readmes(hash, body)
+    SELECT DISTINCT ON (hash) hash, body
+    FROM (SELECT encode(sha256(convert_to("readmeText", 'UTF8')), 'hex') AS hash, "readmeText" AS body
+          FROM analysis WHERE "readmeText" IS NOT NULL) t
+    ON CONFLICT (hash) DO NOTHING;
+
+    UPDATE analysis SET "readmeHash" = encode(sha256(convert_to("readmeText", 'UTF8')), 'hex')
+    WHERE "readmeText" IS NOT NULL;
+
+    ALTER TABLE analysis DROP COLUMN "readmeText";
+
+    SELECT COALESCE(SUM(octet_length(body)), 0) INTO stored_bytes FROM readmes;
+    RAISE NOTICE 'readmes: % bytes inline in analysis -> % bytes in readmes (% saved)',
+      inline_bytes, stored_bytes, inline_bytes - stored_bytes;
+  END IF;
+END $$;
+
+-- Compact runs of identical analyses: of each run of consecutive rows of
+-- a repo with the same content, the first row is kept and takes the
+-- run's last "analyzedAt" (what repo-analyzer now does instead of
+-- inserting a duplicate). A-B-A stays three rows.
+CREATE TEMP TABLE analysis_runs ON COMMIT DROP AS
+SELECT id, "repoId", "analyzedAt",
+       SUM(CASE WHEN rn = 1 OR content IS DISTINCT FROM prev THEN 1 ELSE 0 END)
+         OVER (PARTITION BY "repoId" ORDER BY "analyzedAt", id) AS run
+FROM (
+  SELECT id, "repoId", "analyzedAt", content,
+         ROW_NUMBER() OVER w AS rn,
+         LAG(content) OVER w AS prev
+  FROM (
+    SELECT id, "repoId", "analyzedAt",
+           ROW(stars, forks, watchers, issues, language, commits, "readmeHash",
+               "cloneUrl", "defaultBranch", "repoCreatedAt", "repoUpdatedAt") AS content
+    FROM analysis
+  ) a
+  WINDOW w AS (PARTITION BY "repoId" ORDER BY "analyzedAt", id)
+) c;
+
+CREATE TEMP TABLE analysis_keep ON COMMIT DROP AS
+SELECT DISTINCT ON ("repoId", run) id,
+       MAX("analyzedAt") OVER (PARTITION BY "repoId", run) AS last_at
+FROM analysis_runs
+ORDER BY "repoId", run, "analyzedAt", id;
+
+DO $$
+DECLARE
+  before_rows BIGINT;
+  before_bytes BIGINT;
+  removed BIGINT;
+  orphans BIGINT;
+BEGIN
+  SELECT COUNT(*) INTO before_rows FROM analysis;
+  before_bytes := pg_total_relation_size('analysis');
+
+  UPDATE analysis a SET "analyzedAt" = k.last_at
+  FROM analysis_keep k WHERE a.id = k.id AND a."analyzedAt" < k.last_at;
+
+  DELETE FROM analysis a WHERE NOT EXISTS (SELECT 1 FROM analysis_keep k WHERE k.id = a.id);
+  GET DIAGNOSTICS removed = ROW_COUNT;
+
+  DELETE FROM readmes r WHERE NOT EXISTS (SELECT 1 FROM analysis a WHERE a."readmeHash" = r.hash);
+  GET DIAGNOSTICS orphans = ROW_COUNT;
+
+  RAISE NOTICE 'analysis: % of % rows were duplicates and were removed; % unreferenced readmes removed',
+    removed, before_rows, orphans;
+  RAISE NOTICE 'analysis: % bytes on disk before compaction (run VACUUM FULL analysis to reclaim)',
+    before_bytes;
+END $$;
+
+COMMIT;
@@ -1,5 +1,6 @@
 import { PrismaClient, CategoryEnum } from "@prisma/client";
 import fs from "fs";
+import { createHash } from "crypto";
 import { parse } from "csv-parse";
 
 const prisma = new PrismaClient();
@@ -69,6 +70,19 @@ async function main() {
       },
     });
 
+    // README bodies are stored once per hash (same key as repo-analyzer)
+    const readmeText = r.readme_text || null;
+    const readmeHash = readmeText
+      ? createHash("sha256").update(readmeText, "utf8").digest("hex")
+      : null;
+    if (readmeText && readmeHash) {
+      await prisma.readme.upsert({
+        where: { hash: readmeHash },
+        update: {},
+        create: { hash: readmeHash, body: readmeText },
+      });
+    }
+
     await prisma.analysis.create({
       data: {
         repoId: repo.id,
@@ -78,7 +92,7 @@ async function main() {
         issues: parseInt(r.issues) || null,
         language: r.language || null,
         commits: parseInt(r.commits) || null,
-        readmeText: r.readme_text || null,
+        readmeHash,
         cloneUrl: url,
         defaultBranch: "main",
         analyzedAt: new Date(r.updated_at || Date.now()),
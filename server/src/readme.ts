@@ -0,0 +1,8 @@
+// READMEs are stored once per content hash (see the readmes table); API
+// responses keep the flat readmeText field the frontend reads.
+export function withReadmeText<T extends { readme?: { body: string } | null }>(
+  row: T
+): Omit<T, "readme"> & { readmeText: string | null } {
+  const { readme, ...rest } = row;
+  return { ...rest, readmeText: readme?.body ?? null };
+}
@@ -1,5 +1,6 @@
 import { FastifyInstance } from "fastify";
 import prisma from "../prisma";
+import { withReadmeText } from "../readme";
 
 function serializeBigInt(obj: any) {
   return JSON.parse(
@@ -13,15 +14,19 @@ export default async function (app: FastifyInstance) {
     const rows = await prisma.analysis.findMany({
       where: { repoId: id },
       orderBy: { analyzedAt: "desc" },
+      include: { readme: true },
     });
-    return reply.send(serializeBigInt(rows));
+    return reply.send(serializeBigInt(rows.map(withReadmeText)));
   });
 
   // Get a single analysis by id
   app.get("/analysis/:analysisId", async (request, reply) => {
     const analysisId = Number((request.params as any).analysisId);
-    const row = await prisma.analysis.findUnique({ where: { id: analysisId } });
+    const row = await prisma.analysis.findUnique({
+      where: { id: analysisId },
+      include: { readme: true },
+    });
     if (!row) return reply.code(404).send({ error: "Not found" });
-    return reply.send(serializeBigInt(row));
+    return reply.send(serializeBigInt(withReadmeText(row)));
   });
 }
@@ -1,5 +1,6 @@
 import { FastifyInstance } from "fastify";
 import prisma from "../prisma";
+import { withReadmeText } from "../readme";
 // Work around type-generation mismatch for PrimitiveAnalysis in tooling by aliasing as any
 const primitiveAnalysis = (prisma as any).primitiveAnalysis;
 
@@ -109,7 +110,8 @@ export default async function (app: FastifyInstance) {
         const res = await fetch(`${analyzerUrl}/analyze`, {
           method: "POST",
           headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ repoUrl: repo.url, repoId: repo.id }),
+          // bulk priority: single-repo analyses are scheduled ahead of these
+          body: JSON.stringify({ repoUrl: repo.url, repoId: repo.id, priority: "bulk" }),
         });
 
         const payload = await res.json().catch(() => ({}));
@@ -149,7 +151,24 @@ export default async function (app: FastifyInstance) {
           c === "UNCATEGORIZED" ? { category: null } : { category: c }
         );
       }
-      const repos = await prisma.repo.findMany({ where });
+      // Latest primitive analysis of every repo in the same query (no N+1)
+      const repos = await prisma.repo.findMany({
+        where,
+        select: {
+          category: true,
+          primitiveAnalyses: {
+            orderBy: { analyzedAt: "desc" },
+            take: 1,
+            select: {
+              totalHelpers: true,
+              totalMaps: true,
+              totalPrograms: true,
+              totalProgramTypes: true,
+              totalAttachPoints: true,
+            },
+          },
+        },
+      });
       const agg: Record<
         string,
         {
@@ -161,11 +180,8 @@ export default async function (app: FastifyInstance) {
           count: number;
         }
       > = {};
-      for (const r of repos) {
-        const latest = await primitiveAnalysis.findFirst({
-          where: { repoId: r.id },
-          orderBy: { analyzedAt: "desc" },
-        });
+      for (const r of repos as any[]) {
+        const latest = r.primitiveAnalyses?.[0];
         if (!latest) continue; // skip repos without primitive analysis
         const cat = r.category || "UNCATEGORIZED";
         const bucket = agg[cat] || {
@@ -392,10 +408,15 @@ export default async function (app: FastifyInstance) {
     const id = Number((request.params as any).id);
     const repo = await prisma.repo.findUnique({
       where: { id },
-      include: { analysis: true, overheadTests: true },
+      include: {
+        analysis: { include: { readme: true } },
+        overheadTests: true,
+      },
     });
     if (!repo) return reply.code(404).send({ error: "Not found" });
-    return reply.send(serializeBigInt(repo));
+    return reply.send(
+      serializeBigInt({ ...repo, analysis: repo.analysis.map(withReadmeText) })
+    );
   });
 
   // Primitive analysis list for a repo